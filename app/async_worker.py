@@ -0,0 +1,208 @@
+from __future__ import annotations
+import asyncio, signal, time
+from time import perf_counter
+from typing import Dict, List, Optional, Set, Tuple
+from pymongo.errors import PyMongoError
+from . import worker as sync_worker
+from .config import cfg
+from .connections import async_redis_client, redis_client
+from .logger import get_logger
+from .queue_client import AsyncQueueClient, AsyncThreadedQueue, QueueClient, make_queue
+from .rate_limiter import RateLimiter
+from .limit_policy import make_policy
+from .db import MongoDAO
+from .dead_letter import make_dlq
+from .autoscaler import make_autoscaler
+from .validator import load_model
+from .worker import (check_item, defer_rejected, make_metrics, register_dlq_gauges, register_gauges, retry_failed,
+                     write_ready_file)
+
+log = get_logger()
+
+class AsyncWorker:
+    """
+    asyncio engine: Redis via redis.asyncio, Mongo writes in threads.
+    Up to `concurrency` messages are in flight; popping pauses while that many are unfinished (backpressure).
+    """
+    def __init__(self, redis_url: str, queue_key: str, concurrency: Optional[int] = None,
+                 batch_size: Optional[int] = None, metrics=None, ready_file: Optional[str] = None):
+        self._created = perf_counter()
+        self.redis = async_redis_client(redis_url)
+        # scrapes, policy reloads, the DLQ and threaded queue calls run off the loop on the shared blocking pool
+        self.sync_redis = redis_client(redis_url)
+        if cfg.QUEUE_BACKEND == "list":
+            self.queue = AsyncQueueClient(self.redis, queue_key)
+            sync_queue = QueueClient(self.sync_redis, queue_key)
+        else:
+            # other backends keep their blocking client; calls run in threads
+            sync_queue = make_queue(self.sync_redis, queue_key)
+            self.queue = AsyncThreadedQueue(sync_queue)
+        self.dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
+        # per-customer limit overrides, reloaded in a background thread
+        self.policy = make_policy(self.sync_redis)
+        self.ratelimiter = RateLimiter(
+            self.redis, cfg.RATE_LIMIT_LIMIT, cfg.RATE_LIMIT_WINDOW_SEC,
+            algorithm=cfg.RATE_LIMIT_ALGORITHM,
+            local_cache_size=cfg.RATE_LIMIT_CACHE_SIZE,
+            local_cache_ttl_ms=cfg.RATE_LIMIT_CACHE_TTL_MS,
+            local_cache_accuracy_ms=cfg.RATE_LIMIT_CACHE_ACCURACY_MS,
+            policy=self.policy,
+        )
+        self.concurrency = max(1, concurrency or cfg.WORKER_CONCURRENCY)
+        self.batch_size = max(1, batch_size or cfg.WORKER_BATCH_SIZE)
+        self.inflight = 0
+        self.processed = 0  # lifetime message count (read by the supervisor)
+        self._stop: Optional[asyncio.Event] = None
+        self._room: Optional[asyncio.Condition] = None
+        self.metrics = metrics if metrics is not None else make_metrics()
+        register_gauges(self.metrics, sync_queue.depth, self.ratelimiter, self.dao, self)
+        self.metrics.gauge("ingest_inflight", "Messages popped but not yet finished", lambda: self.inflight)
+        # the autoscaler (if on) moves `concurrency`; a lower value pauses popping until enough tasks finish
+        self.autoscaler = make_autoscaler(self, "concurrency", sync_queue.depth, self.metrics)
+        # delay/dead-letter queue on a blocking client: deferrals run in threads, the mover in its own thread
+        self.sync_queue = sync_queue
+        self.dlq = make_dlq(self.sync_redis, queue_key)
+        if self.dlq is not None:
+            register_dlq_gauges(self.metrics, self.dlq)
+        self.ready = False
+        self.ready_file = cfg.WORKER_READY_FILE if ready_file is None else ready_file
+        self.startup_ms: Dict[str, float] = {}
+        self.first_message_ms: Optional[float] = None
+
+    async def startup(self) -> Dict[str, float]:
+        """Same steps as Worker.startup, with the async client and Mongo's ping in a thread."""
+        if self.ready:
+            return self.startup_ms
+        t0 = perf_counter()
+        await self.redis.ping()
+        t1 = perf_counter()
+        await asyncio.to_thread(self.dao.client.admin.command, "ping")
+        t2 = perf_counter()
+        if cfg.VALIDATOR_MODE == "full":
+            load_model()
+        t3 = perf_counter()
+        self.startup_ms = {"redis_ms": round((t1 - t0) * 1000, 1), "mongo_ms": round((t2 - t1) * 1000, 1),
+                           "validator_ms": round((t3 - t2) * 1000, 1),
+                           "since_init_ms": round((t3 - self._created) * 1000, 1)}
+        self.ready = True
+        write_ready_file(self.ready_file, True)
+        log.info("worker_ready", **self.startup_ms)
+        return self.startup_ms
+
+    async def handle(self, popped: List[Tuple[str, dict]]) -> List[bool]:
+        """Validate -> rate-limit -> insert for already popped messages; same logs/results as Worker.process_batch."""
+        m = self.metrics
+        results = [False] * len(popped)
+        valid = []
+        for i, (_, item) in enumerate(popped):
+            ok, payload = check_item(item, m)
+            if ok:
+                valid.append((i, item.get("customerId"), payload))
+
+        now_ms = int(time.time() * 1000)
+        t0 = perf_counter()
+        decisions = await self.ratelimiter.check_many_async([(customer_id, now_ms) for _, customer_id, _ in valid])
+        m.observe("rate_limit", perf_counter() - t0)
+
+        allowed = []
+        rejected = []
+        for (i, customer_id, payload), (ok, retry_at) in zip(valid, decisions):
+            if not ok:
+                log.error("rate_limited", status="error", customerId=customer_id, reason="Rate limit exceeded")
+                m.outcome("rate_limited")
+                rejected.append((popped[i][1], customer_id, retry_at))
+                continue
+            allowed.append((i, customer_id, payload))
+        if rejected and self.dlq is not None:
+            await asyncio.to_thread(defer_rejected, self.dlq, self.ratelimiter, m, rejected)
+
+        if allowed:
+            # pymongo is blocking; keep it off the event loop
+            t0 = perf_counter()
+            try:
+                ids = await asyncio.to_thread(self.dao.insert_many, [payload for _, _, payload in allowed])
+            except PyMongoError as e:
+                if self.dlq is None:
+                    raise
+                await asyncio.to_thread(retry_failed, self.dlq, m, [popped[i][1] for i, _, _ in allowed], e)
+                await self.queue.ack([token for token, _ in popped])
+                return results
+            m.observe("insert", perf_counter() - t0)
+            for (i, customer_id, _), _id in zip(allowed, ids):
+                log.info("ingested", status="success", customerId=customer_id, _id=_id)
+                results[i] = True
+            m.outcome("ingested", len(ids))
+        await self.queue.ack([token for token, _ in popped])
+        return results
+
+    async def _handle_and_release(self, popped: List[Tuple[str, dict]]) -> None:
+        try:
+            await self.handle(popped)
+        except Exception as e:
+            log.error("process_failed", status="error", reason=str(e), count=len(popped))
+        finally:
+            self.inflight -= len(popped)
+            self.processed += len(popped)
+            if self.first_message_ms is None:
+                self.first_message_ms = round((perf_counter() - self._created) * 1000, 1)
+                log.info("first_message", since_init_ms=self.first_message_ms)
+            async with self._room:
+                self._room.notify_all()
+
+    def _handle_signal(self, signum: int) -> None:
+        sync_worker.shutdown = True
+        self._stop.set()
+        log.info("signal_received", signum=signum)
+
+    def _stopping(self) -> bool:
+        return self._stop.is_set() or sync_worker.shutdown
+
+    async def run(self, max_messages: int = 0) -> None:
+        loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        self._room = asyncio.Condition()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._handle_signal, sig)
+
+        tasks: Set[asyncio.Task] = set()
+        popped_total = 0
+        await self.startup()
+        if self.dlq is not None:
+            self.dlq.start(self.sync_queue, cfg.DLQ_MOVE_INTERVAL_MS)
+        if self.autoscaler is not None:
+            self.autoscaler.start(cfg.AUTOSCALE_INTERVAL_MS)
+        try:
+            while not self._stopping():
+                async with self._room:
+                    await self._room.wait_for(lambda: self.inflight < self.concurrency)
+                n = max(1, min(self.batch_size, self.concurrency - self.inflight))  # concurrency may shrink meanwhile
+                if max_messages:
+                    n = min(n, max_messages - popped_total)
+                t0 = perf_counter()
+                popped = await self.queue.pop_many(n, timeout=cfg.WORKER_POLL_TIMEOUT_SEC)
+                self.metrics.observe("pop", perf_counter() - t0)
+                if not popped:
+                    continue  # timeout / idle
+                popped_total += len(popped)
+                self.inflight += len(popped)
+                task = asyncio.create_task(self._handle_and_release(popped))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                if max_messages and popped_total >= max_messages:
+                    break
+        finally:
+            self.ready = False
+            write_ready_file(self.ready_file, False)
+            if self.autoscaler is not None:
+                self.autoscaler.close()
+            # graceful drain: stop popping, let in-flight messages finish
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.remove_signal_handler(sig)
+            if self.dlq is not None:
+                self.dlq.close()
+            await self.queue.close()
+            await self.redis.aclose()
+            if self.policy is not None:
+                self.policy.close()
@@ -0,0 +1,146 @@
+"""
+Adaptive concurrency: one knob of the running engine follows queue depth and Mongo write latency (AIMD).
+
+    sync engine   knob = batch size    (starts at WORKER_BATCH_SIZE)
+    async engine  knob = concurrency   (starts at WORKER_CONCURRENCY)
+
+Every AUTOSCALE_INTERVAL_MS a thread reads the queue depth (list length, stream lag, fair backlog) and the mean
+`insert` stage latency since the previous tick, then:
+
+- insert latency above AUTOSCALE_LATENCY_TARGET_MS: multiply by AUTOSCALE_DECREASE ("backoff"), then hold one tick
+  so the next sample reflects the new setting. Mongo is shared by every worker, so the controller backs off first.
+- else depth above AUTOSCALE_DEPTH_HIGH: add AUTOSCALE_STEP ("increase")
+- else depth at or below AUTOSCALE_DEPTH_LOW: subtract AUTOSCALE_STEP ("decrease"; idle, give resources back)
+- else keep the value ("hold")
+
+The value always stays within [AUTOSCALE_MIN, AUTOSCALE_MAX]. A batch's insert is one call, so in the sync engine
+the batch grows until a bulk write takes about the latency target.
+"""
+from __future__ import annotations
+import threading
+from collections import Counter
+from typing import Any, Callable, Optional, Tuple
+from .config import cfg
+from .logger import get_logger
+
+log = get_logger()
+
+ACTIONS = ("increase", "decrease", "backoff", "hold")
+
+class AIMDController:
+    """The decision rule alone, without I/O, so it can be driven tick by tick."""
+    def __init__(self, value: int, lo: int, hi: int, step: int = 8, decrease: float = 0.5,
+                 latency_target_ms: float = 100.0, depth_high: int = 1000, depth_low: int = 0):
+        self.lo = max(1, lo)
+        self.hi = max(self.lo, hi)
+        self.step = max(1, step)
+        self.decrease = min(max(decrease, 0.0), 1.0)
+        self.latency_target_ms = latency_target_ms
+        self.depth_high = depth_high
+        self.depth_low = depth_low
+        self.value = self.clamp(value)
+        self._cooldown = 0
+
+    def clamp(self, value: int) -> int:
+        return min(self.hi, max(self.lo, int(value)))
+
+    def decide(self, depth: int, latency_ms: Optional[float]) -> Tuple[int, str]:
+        """New value and the action taken; latency_ms is None when nothing was written since the last tick."""
+        if self._cooldown:
+            self._cooldown -= 1
+            return self.value, "hold"
+        if latency_ms is not None and latency_ms > self.latency_target_ms:
+            self.value = self.clamp(self.value * self.decrease)
+            self._cooldown = 1
+            return self.value, "backoff"
+        if depth > self.depth_high:
+            new, action = self.clamp(self.value + self.step), "increase"
+        elif depth <= self.depth_low:
+            new, action = self.clamp(self.value - self.step), "decrease"
+        else:
+            return self.value, "hold"
+        if new == self.value:
+            return self.value, "hold"  # at a bound
+        self.value = new
+        return new, action
+
+class Autoscaler:
+    """
+    Applies an AIMDController to `engine.<attr>` from a background thread. The engines read the attribute on every
+    loop iteration, so a change takes effect at the next pop.
+    """
+    def __init__(self, controller: AIMDController, engine: Any, attr: str, depth: Callable[[], int], metrics):
+        self.controller = controller
+        self.engine = engine
+        self.attr = attr
+        self.depth = depth
+        self.metrics = metrics
+        self.last_depth = 0
+        self.last_latency_ms = 0.0
+        self.actions: Counter = Counter()
+        self._totals = metrics.stage_totals("insert")
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def tick(self) -> str:
+        depth = int(self.depth())
+        total, calls = self.metrics.stage_totals("insert")
+        prev_total, prev_calls = self._totals
+        self._totals = (total, calls)
+        latency_ms = (total - prev_total) / (calls - prev_calls) * 1000.0 if calls > prev_calls else None
+        old = self.controller.value
+        new, action = self.controller.decide(depth, latency_ms)
+        self.actions[action] += 1
+        self.last_depth = depth
+        if latency_ms is not None:
+            self.last_latency_ms = latency_ms
+        if new != old:
+            setattr(self.engine, self.attr, new)
+            log.info("autoscale", knob=self.attr, old=old, new=new, action=action, depth=depth,
+                     insert_ms=None if latency_ms is None else round(latency_ms, 2))
+        return action
+
+    def register_gauges(self) -> None:
+        m = self.metrics
+        m.gauge("ingest_autoscale_value", f"Current {self.attr} chosen by the autoscaler",
+                lambda: self.controller.value)
+        for action in ACTIONS:
+            m.counter(f"ingest_autoscale_{action}_ticks_total", f"Autoscaler ticks that chose {action}",
+                      lambda action=action: self.actions[action])
+        m.gauge("ingest_autoscale_depth", "Queue depth at the last autoscaler tick", lambda: self.last_depth)
+        m.gauge("ingest_autoscale_insert_ms", "Mean insert latency (ms) in the last tick that wrote",
+                lambda: self.last_latency_ms)
+
+    def start(self, interval_ms: int) -> None:
+        # start from what the engine runs with now (run() may have overridden the configured value)
+        self.controller.value = self.controller.clamp(getattr(self.engine, self.attr))
+        setattr(self.engine, self.attr, self.controller.value)
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(interval_ms / 1000.0,),
+                                            name="autoscaler", daemon=True)
+            self._thread.start()
+
+    def _loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.tick()
+            except Exception as e:
+                log.warning("autoscale_failed", error=str(e))
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+def make_autoscaler(engine: Any, attr: str, depth: Callable[[], int], metrics) -> Optional[Autoscaler]:
+    """Autoscaler from config for `engine.<attr>`, with its gauges registered; None when AUTOSCALE_ENABLED is off."""
+    if not cfg.AUTOSCALE_ENABLED:
+        return None
+    controller = AIMDController(getattr(engine, attr), cfg.AUTOSCALE_MIN, cfg.AUTOSCALE_MAX, step=cfg.AUTOSCALE_STEP,
+                                decrease=cfg.AUTOSCALE_DECREASE, latency_target_ms=cfg.AUTOSCALE_LATENCY_TARGET_MS,
+                                depth_high=cfg.AUTOSCALE_DEPTH_HIGH, depth_low=cfg.AUTOSCALE_DEPTH_LOW)
+    scaler = Autoscaler(controller, engine, attr, depth, metrics)
+    scaler.register_gauges()
+    return scaler
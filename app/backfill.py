@@ -0,0 +1,211 @@
+"""
+Offline backfill: ingest a JSONL file (optionally gzip) straight into Mongo, bypassing the Redis queue.
+
+    python -m app.backfill customers.jsonl.gz [--checkpoint PATH] [--batch-size N] [--processes N] [--rate-limit]
+
+- Streams the file in chunks of --batch-size lines; at most 2 chunks per process are in flight, so memory is bounded
+  whatever the file size.
+- Validation (same validator as the worker, VALIDATOR_MODE) runs in a process pool; --processes 0 validates inline.
+- Valid records go through MongoDAO.insert_many: unordered bulk writes with the deterministic _id, so a rerun only
+  counts duplicates.
+- --rate-limit applies the per-customer limiter (and limit policy) at backfill time; off by default.
+- After each chunk is written, the byte offset after it (uncompressed, for gzip) is saved to the checkpoint
+  (default <file>.checkpoint). A rerun resumes there; a crash replays at most the chunks in flight, which the
+  idempotent writes absorb. Appending to the file and rerunning ingests only the new lines.
+- Logs backfill_progress (records/sec, offset, % of the file) every BACKFILL_REPORT_SEC.
+"""
+from __future__ import annotations
+import argparse, gzip, json, os, time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+from .config import cfg
+from .connections import redis_client
+from .db import MongoDAO
+from .fast_validator import validate_record_fast
+from .limit_policy import make_policy
+from .logger import get_logger
+from .rate_limiter import RateLimiter
+from .validator import validate_record
+
+log = get_logger()
+# chosen here rather than imported from .worker, so pool processes do not import the whole worker stack
+_validate = validate_record_fast if cfg.VALIDATOR_MODE == "fast" else validate_record
+
+def validate_lines(lines: List[bytes]) -> List[Tuple[str, Dict[str, Any]]]:
+    """("ok" | "parse_error" | "invalid", payload) per non-blank line. Runs in pool processes."""
+    out = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+            if not isinstance(item, dict):
+                raise ValueError("not an object")
+        except ValueError:
+            out.append(("parse_error", {"raw": line[:200].decode("utf-8", "replace")}))
+            continue
+        ok, payload = _validate(item)
+        out.append(("ok" if ok else "invalid", payload))
+    return out
+
+def _open(path: str) -> Tuple[BinaryIO, BinaryIO]:
+    """(line reader, raw file); the raw file's position tracks progress through a compressed file."""
+    raw = open(path, "rb")
+    if raw.read(2) == b"\x1f\x8b":
+        raw.seek(0)
+        return gzip.GzipFile(fileobj=raw, mode="rb"), raw
+    raw.seek(0)
+    return raw, raw
+
+def read_chunks(f: BinaryIO, batch_size: int) -> Iterator[Tuple[List[bytes], int]]:
+    """(lines, offset after them); offsets are positions in the (uncompressed) stream."""
+    lines: List[bytes] = []
+    offset = f.tell()
+    for line in iter(f.readline, b""):
+        if not line.endswith(b"\n") and not _complete(line):
+            break  # a line still being written: leave it (and its bytes) for the next run
+        lines.append(line)
+        offset += len(line)
+        if len(lines) >= batch_size:
+            yield lines, offset
+            lines = []
+    if lines:
+        yield lines, offset
+
+def _complete(line: bytes) -> bool:
+    try:
+        json.loads(line)
+        return True
+    except ValueError:
+        return False
+
+def load_checkpoint(path: str) -> int:
+    try:
+        with open(path) as f:
+            return int(json.load(f).get("offset", 0))
+    except FileNotFoundError:
+        return 0
+
+def save_checkpoint(path: str, offset: int, stats: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(stats, offset=offset, updated=time.time()), f)
+    os.replace(tmp, path)  # atomic: a crash never leaves a torn checkpoint
+
+class Backfill:
+    def __init__(self, dao: MongoDAO, ratelimiter: Optional[RateLimiter] = None, batch_size: int = 1000,
+                 processes: int = 0, report_sec: float = 5.0):
+        self.dao = dao
+        self.ratelimiter = ratelimiter
+        self.batch_size = max(1, batch_size)
+        self.processes = max(0, processes)
+        self.report_sec = report_sec
+        self.stats = {"records": 0, "ingested": 0, "invalid": 0, "parse_error": 0, "rate_limited": 0}
+
+    def _write(self, results: List[Tuple[str, Dict[str, Any]]]) -> None:
+        valid = []
+        for status, payload in results:
+            self.stats["records"] += 1
+            if status == "parse_error":
+                log.error("parse_error", status="error", reason="Invalid JSON", raw=payload["raw"])
+                self.stats["parse_error"] += 1
+            elif status == "invalid":
+                log.error("validation_failed", **payload)
+                self.stats["invalid"] += 1
+            else:
+                valid.append(payload)
+        if valid and self.ratelimiter is not None:
+            now_ms = int(time.time() * 1000)
+            decisions = self.ratelimiter.allow_many([(p["customerId"], now_ms) for p in valid])
+            for p, ok in zip(valid, decisions):
+                if not ok:
+                    log.error("rate_limited", status="error", customerId=p["customerId"], reason="Rate limit exceeded")
+            self.stats["rate_limited"] += decisions.count(False)
+            valid = [p for p, ok in zip(valid, decisions) if ok]
+        if valid:
+            self.dao.insert_many(valid)
+            self.stats["ingested"] += len(valid)
+
+    def run(self, path: str, checkpoint: Optional[str] = None) -> Dict[str, Any]:
+        checkpoint = checkpoint or f"{path}.checkpoint"
+        size = os.path.getsize(path)
+        f, raw = _open(path)
+        start = load_checkpoint(checkpoint)
+        if f is raw and start > size:
+            log.warning("backfill_checkpoint_reset", path=path, offset=start, size=size)  # file was replaced
+            start = 0
+        f.seek(start)  # gzip: decompresses up to the offset
+        log.info("backfill_start", path=path, offset=start, size=size, processes=self.processes,
+                 batch_size=self.batch_size, rate_limit=self.ratelimiter is not None)
+
+        t0 = last_report = time.perf_counter()
+        offset = start
+        pool = ProcessPoolExecutor(self.processes) if self.processes else None
+        inflight: Deque[Tuple[Future, int]] = deque()
+        try:
+            for lines, end in read_chunks(f, self.batch_size):
+                if pool is None:
+                    self._write(validate_lines(lines))
+                    offset = end
+                else:
+                    inflight.append((pool.submit(validate_lines, lines), end))
+                    if len(inflight) < 2 * self.processes:
+                        continue
+                    fut, offset = inflight.popleft()
+                    self._write(fut.result())  # written in file order, so the offset only moves forward
+                save_checkpoint(checkpoint, offset, self.stats)
+                if time.perf_counter() - last_report >= self.report_sec:
+                    last_report = time.perf_counter()
+                    self._report(t0, offset, raw.tell(), size)
+            while inflight:
+                fut, offset = inflight.popleft()
+                self._write(fut.result())
+                save_checkpoint(checkpoint, offset, self.stats)
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+            f.close()
+            raw.close()
+        elapsed = time.perf_counter() - t0
+        out = dict(self.stats, duplicates=self.dao.duplicates, offset=offset, seconds=round(elapsed, 3),
+                   records_per_sec=round(self.stats["records"] / elapsed, 1) if elapsed else 0.0)
+        log.info("backfill_done", path=path, **out)
+        return out
+
+    def _report(self, t0: float, offset: int, position: int, size: int) -> None:
+        elapsed = time.perf_counter() - t0
+        log.info("backfill_progress", records=self.stats["records"], ingested=self.stats["ingested"],
+                 records_per_sec=round(self.stats["records"] / elapsed, 1) if elapsed else 0.0,
+                 offset=offset, pct=round(position / size * 100.0, 1) if size else 100.0)
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("path")
+    ap.add_argument("--checkpoint", default=None, help="default: <path>.checkpoint")
+    ap.add_argument("--batch-size", type=int, default=cfg.BACKFILL_BATCH_SIZE)
+    ap.add_argument("--processes", type=int, default=cfg.BACKFILL_PROCESSES or os.cpu_count() or 1,
+                    help="validation processes; 0 = validate inline")
+    ap.add_argument("--rate-limit", action=argparse.BooleanOptionalAction, default=cfg.BACKFILL_RATE_LIMIT)
+    args = ap.parse_args(argv)
+
+    dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
+    ratelimiter = None
+    if args.rate_limit:
+        redis = redis_client(cfg.REDIS_URL)
+        ratelimiter = RateLimiter(redis, cfg.RATE_LIMIT_LIMIT, cfg.RATE_LIMIT_WINDOW_SEC,
+                                  algorithm=cfg.RATE_LIMIT_ALGORITHM, local_cache_size=cfg.RATE_LIMIT_CACHE_SIZE,
+                                  local_cache_ttl_ms=cfg.RATE_LIMIT_CACHE_TTL_MS,
+                                  local_cache_accuracy_ms=cfg.RATE_LIMIT_CACHE_ACCURACY_MS,
+                                  policy=make_policy(redis))
+    backfill = Backfill(dao, ratelimiter, batch_size=args.batch_size, processes=args.processes,
+                        report_sec=cfg.BACKFILL_REPORT_SEC)
+    try:
+        return backfill.run(args.path, args.checkpoint)
+    finally:
+        if ratelimiter is not None and ratelimiter.policy is not None:
+            ratelimiter.policy.close()
+
+if __name__ == "__main__":
+    main()
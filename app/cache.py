@@ -0,0 +1,51 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Small in-process LRU with per-entry TTL. Not thread-safe; one per worker loop.
+    hits/misses count get() outcomes; get(count=False) leaves them to a caller that decides what a hit is.
+    """
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self.maxsize = int(maxsize)
+        self.ttl_sec = float(ttl_sec)
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None, count: bool = True) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += count
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += count
+            return default
+        self._data.move_to_end(key)
+        self.hits += count
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: Optional[float] = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else ttl_sec
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
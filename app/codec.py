@@ -0,0 +1,95 @@
+"""
+Wire formats for queue messages. Writers use QUEUE_CODEC; readers sniff every message, so a queue holding a mix of
+formats (e.g. during a rollout) drains safely.
+
+  json     plain JSON, no header (the original format; stdlib encoder)
+  orjson   plain JSON, no header, via orjson (optional dependency; falls back to json)
+  msgpack  0x01 + msgpack map (optional dependency)
+  compact  0x02 + JSON array [customerId, name, email, createdAt] (+ {other fields} when present), via orjson if
+           installed; drops the repeated keys (~45 bytes/record)
+
+A JSON document starts with "{" (or whitespace), never with a byte below 0x09, so the first byte tells them apart.
+Anything undecodable (including msgpack without the package) becomes the __parse_error__ item the worker logs.
+"""
+from __future__ import annotations
+import json
+from typing import Any, Callable, Dict, Optional
+from .config import cfg
+
+try:  # optional: several times faster than the stdlib for both directions
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # optional: binary format
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+CODECS = ("json", "orjson", "msgpack", "compact")
+
+MSGPACK = 0x01
+COMPACT = 0x02
+
+# compact: positional order of the record fields
+FIELDS = ("customerId", "name", "email", "createdAt")
+
+_json_loads: Callable[[bytes], Any] = orjson.loads if orjson is not None else json.loads
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj).encode("utf-8")
+
+_fast_dumps: Callable[[Any], bytes] = orjson.dumps if orjson is not None else _json_dumps
+
+def _encode_msgpack(item: Dict[str, Any]) -> bytes:
+    return b"\x01" + msgpack.packb(item, use_bin_type=True)
+
+def _encode_compact(item: Dict[str, Any]) -> bytes:
+    row = [item.get(f) for f in FIELDS]
+    extra = {k: v for k, v in item.items() if k not in FIELDS}
+    if extra:
+        row.append(extra)
+    return b"\x02" + _fast_dumps(row)
+
+def _decode_compact(body: bytes) -> Dict[str, Any]:
+    row = _json_loads(body)
+    item = {f: v for f, v in zip(FIELDS, row) if v is not None}
+    if len(row) > len(FIELDS):
+        item.update(row[len(FIELDS)])
+    return item
+
+def get_encoder(name: Optional[str] = None) -> Callable[[Dict[str, Any]], bytes]:
+    name = name or cfg.QUEUE_CODEC
+    if name not in CODECS:
+        raise ValueError(f"unknown queue codec {name!r}; expected one of {CODECS}")
+    if name == "json":
+        return _json_dumps
+    if name == "orjson":
+        return _fast_dumps
+    if name == "msgpack":
+        if msgpack is None:
+            raise ValueError("queue codec 'msgpack' needs the msgpack package (pip install msgpack)")
+        return _encode_msgpack
+    return _encode_compact
+
+def decode(raw: bytes) -> Dict[str, Any]:
+    """Any supported format -> dict; undecodable payloads -> {"__raw__": ..., "__parse_error__": True}."""
+    try:
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        head = raw[0] if raw else None
+        if head == COMPACT:
+            item = _decode_compact(raw[1:])
+        elif head == MSGPACK:
+            item = msgpack.unpackb(raw[1:], raw=False)
+        else:
+            item = _json_loads(raw)
+        if not isinstance(item, dict):
+            raise ValueError("not an object")
+        return item
+    except Exception:
+        # poison pill protection or corrupted payload
+        return {"__raw__": raw.decode("utf-8", errors="replace"), "__parse_error__": True}
+
+# the configured writer; readers always use decode()
+encode = get_encoder()
@@ -17,27 +17,138 @@ def getenv_float(name: str, default: float) -> float:
     except Exception:
         return default
 
+def getenv_bool(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
 @dataclass(frozen=True)
 class Config:
     LOG_LEVEL: str = getenv_str("LOG_LEVEL", "INFO")
+    LOG_MODE: str = getenv_str("LOG_MODE", "sync")  # sync | async (bounded queue + writer thread)
+    LOG_SAMPLE: str = getenv_str("LOG_SAMPLE", "")  # e.g. "ingested=10": keep 1 in 10; errors always kept
+    LOG_QUEUE_SIZE: int = getenv_int("LOG_QUEUE_SIZE", 10000)  # async: lines buffered before dropping
+    LOG_BATCH_SIZE: int = getenv_int("LOG_BATCH_SIZE", 256)  # async: max lines per write
 
     REDIS_URL: str = getenv_str("REDIS_URL", "redis://localhost:6379/0")
+    # shared per-process pool (see app/connections.py)
+    REDIS_MAX_CONNECTIONS: int = getenv_int("REDIS_MAX_CONNECTIONS", 64)
+    REDIS_POOL_TIMEOUT_SEC: int = getenv_int("REDIS_POOL_TIMEOUT_SEC", 20)  # wait for a free pooled connection
+    REDIS_CONNECT_TIMEOUT_SEC: float = getenv_float("REDIS_CONNECT_TIMEOUT_SEC", 5.0)
+    REDIS_HEALTH_CHECK_INTERVAL_SEC: int = getenv_int("REDIS_HEALTH_CHECK_INTERVAL_SEC", 30)  # PING idle connections
     QUEUE_KEY: str = getenv_str("QUEUE_KEY", "ingest:queue")
+    QUEUE_BACKEND: str = getenv_str("QUEUE_BACKEND", "list")  # list | reliable | streams | fair
+    QUEUE_VISIBILITY_TIMEOUT_SEC: int = getenv_int("QUEUE_VISIBILITY_TIMEOUT_SEC", 60)
+    QUEUE_STREAM_GROUP: str = getenv_str("QUEUE_STREAM_GROUP", "ingest-workers")
+    QUEUE_STREAM_SHARDS: int = getenv_int("QUEUE_STREAM_SHARDS", 1)
+    QUEUE_FAIR_WEIGHTS: str = getenv_str("QUEUE_FAIR_WEIGHTS", "")  # fair: "vip=4,bulk=0.5"; others weigh 1
+    QUEUE_FAIR_QUANTUM: int = getenv_int("QUEUE_FAIR_QUANTUM", 10)  # fair: records per turn at weight 1
+    QUEUE_STREAM_MAXLEN: int = getenv_int("QUEUE_STREAM_MAXLEN", 1000000)  # approximate trim; 0 = never trim
+    QUEUE_CODEC: str = getenv_str("QUEUE_CODEC", "json")  # writers: json | orjson | msgpack | compact; readers take any
 
     RATE_LIMIT_LIMIT: int = getenv_int("RATE_LIMIT_LIMIT", 5)
     RATE_LIMIT_WINDOW_SEC: int = getenv_int("RATE_LIMIT_WINDOW_SEC", 60)
+    RATE_LIMIT_ALGORITHM: str = getenv_str("RATE_LIMIT_ALGORITHM", "zset")  # zset | counter
+    # local cache of blocked customers; 0 = disabled
+    RATE_LIMIT_CACHE_SIZE: int = getenv_int("RATE_LIMIT_CACHE_SIZE", 0)
+    RATE_LIMIT_CACHE_TTL_MS: int = getenv_int("RATE_LIMIT_CACHE_TTL_MS", 1000)
+    RATE_LIMIT_CACHE_ACCURACY_MS: int = getenv_int("RATE_LIMIT_CACHE_ACCURACY_MS", 0)
+    # per-customer / per-tier overrides (see app/limit_policy.py)
+    RATE_LIMIT_POLICY: str = getenv_str("RATE_LIMIT_POLICY", "none")  # none | redis | file
+    RATE_LIMIT_POLICY_KEY: str = getenv_str("RATE_LIMIT_POLICY_KEY", "limits:policy")  # redis hash
+    RATE_LIMIT_POLICY_FILE: str = getenv_str("RATE_LIMIT_POLICY_FILE", "")  # JSON
+    RATE_LIMIT_POLICY_REFRESH_MS: int = getenv_int("RATE_LIMIT_POLICY_REFRESH_MS", 5000)  # version check interval
+    RATE_LIMIT_POLICY_TTL_SEC: int = getenv_int("RATE_LIMIT_POLICY_TTL_SEC", 300)  # full reload at least this often
 
     MONGO_URI: str = getenv_str("MONGO_URI", "mongodb://localhost:27017")
     MONGO_DB: str = getenv_str("MONGO_DB", "ingestion")
     MONGO_COLLECTION: str = getenv_str("MONGO_COLLECTION", "customers")
+    MONGO_MAX_POOL_SIZE: int = getenv_int("MONGO_MAX_POOL_SIZE", 100)
+    MONGO_MIN_POOL_SIZE: int = getenv_int("MONGO_MIN_POOL_SIZE", 0)  # connections opened ahead of need
+    MONGO_CONNECT_TIMEOUT_MS: int = getenv_int("MONGO_CONNECT_TIMEOUT_MS", 5000)
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = getenv_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 10000)
+    MONGO_ENSURE_INDEXES: bool = getenv_bool("MONGO_ENSURE_INDEXES", True)  # off: indexes are managed elsewhere
+    MONGO_ID_FORMAT: str = getenv_str("MONGO_ID_FORMAT", "hex")  # hex | binary (16-byte BLAKE2b)
+    MONGO_INDEX_LAYOUT: str = getenv_str("MONGO_INDEX_LAYOUT", "customer")  # customer | compound (customerId, createdAt)
+    # time partitioning: {MONGO_COLLECTION}_YYYYMM (monthly) / _YYYYMMDD (daily); none = single collection
+    MONGO_PARTITION: str = getenv_str("MONGO_PARTITION", "none")  # none | monthly | daily
+    MONGO_PARTITION_FIELD: str = getenv_str("MONGO_PARTITION_FIELD", "createdAt")  # createdAt | ingestedAt
+    MONGO_RETENTION_PARTITIONS: int = getenv_int("MONGO_RETENTION_PARTITIONS", 0)  # periods kept; 0 = keep all
+    MONGO_RETENTION_ACTION: str = getenv_str("MONGO_RETENTION_ACTION", "drop")  # drop | archive (rename)
+    MONGO_WRITE_MODE: str = getenv_str("MONGO_WRITE_MODE", "insert")  # insert | upsert
+    # recently written _ids skipped locally; 0 = disabled
+    MONGO_SEEN_CACHE_SIZE: int = getenv_int("MONGO_SEEN_CACHE_SIZE", 0)
+    MONGO_SEEN_CACHE_TTL_SEC: int = getenv_int("MONGO_SEEN_CACHE_TTL_SEC", 3600)
+    MONGO_WRITE_CONCERN: str = getenv_str("MONGO_WRITE_CONCERN", "")  # "" = default | majority | <n>
+    MONGO_WRITE_JOURNAL: bool = getenv_bool("MONGO_WRITE_JOURNAL", False)
+    # write-behind buffer (sync engine); 0 = write-through
+    MONGO_BUFFER_DOCS: int = getenv_int("MONGO_BUFFER_DOCS", 0)
+    MONGO_BUFFER_MAX_AGE_MS: int = getenv_int("MONGO_BUFFER_MAX_AGE_MS", 200)
+    MONGO_BUFFER_MAX_BYTES: int = getenv_int("MONGO_BUFFER_MAX_BYTES", 8 << 20)
+
+    # delay / dead-letter queue ({QUEUE_KEY}:delay ZSET, {QUEUE_KEY}:dead list); off = rejects are dropped
+    DLQ_ENABLED: bool = getenv_bool("DLQ_ENABLED", False)
+    DLQ_MAX_ATTEMPTS: int = getenv_int("DLQ_MAX_ATTEMPTS", 10)  # retries before a record goes to the dead list
+    DLQ_BACKOFF_BASE_MS: int = getenv_int("DLQ_BACKOFF_BASE_MS", 1000)  # write failures: base * 2^(attempt-1)
+    DLQ_BACKOFF_MAX_MS: int = getenv_int("DLQ_BACKOFF_MAX_MS", 300000)
+    DLQ_MOVE_INTERVAL_MS: int = getenv_int("DLQ_MOVE_INTERVAL_MS", 500)  # mover tick
+    DLQ_MOVE_BATCH: int = getenv_int("DLQ_MOVE_BATCH", 500)  # due entries per round trip
 
     WORKER_POLL_TIMEOUT_SEC: int = getenv_int("WORKER_POLL_TIMEOUT_SEC", 5)
     WORKER_MAX_MESSAGES: int = getenv_int("WORKER_MAX_MESSAGES", 0)
+    WORKER_BATCH_SIZE: int = getenv_int("WORKER_BATCH_SIZE", 1)
+    WORKER_ENGINE: str = getenv_str("WORKER_ENGINE", "sync")  # sync | async
+    WORKER_CONCURRENCY: int = getenv_int("WORKER_CONCURRENCY", 64)  # async: max in-flight messages
+    WORKER_READY_FILE: str = getenv_str("WORKER_READY_FILE", "")  # touched when ready, removed on shutdown
+
+    # adaptive batch size (sync) / concurrency (async), see app/autoscaler.py
+    AUTOSCALE_ENABLED: bool = getenv_bool("AUTOSCALE_ENABLED", False)
+    AUTOSCALE_INTERVAL_MS: int = getenv_int("AUTOSCALE_INTERVAL_MS", 1000)  # controller tick
+    AUTOSCALE_MIN: int = getenv_int("AUTOSCALE_MIN", 1)
+    AUTOSCALE_MAX: int = getenv_int("AUTOSCALE_MAX", 256)
+    AUTOSCALE_STEP: int = getenv_int("AUTOSCALE_STEP", 8)  # additive increase / idle decrease per tick
+    AUTOSCALE_DECREASE: float = getenv_float("AUTOSCALE_DECREASE", 0.5)  # multiplicative backoff on slow writes
+    AUTOSCALE_LATENCY_TARGET_MS: float = getenv_float("AUTOSCALE_LATENCY_TARGET_MS", 100.0)  # mean insert call
+    AUTOSCALE_DEPTH_HIGH: int = getenv_int("AUTOSCALE_DEPTH_HIGH", 1000)  # backlog above this: grow
+    AUTOSCALE_DEPTH_LOW: int = getenv_int("AUTOSCALE_DEPTH_LOW", 0)  # backlog at or below this: shrink
+
+    VALIDATOR_MODE: str = getenv_str("VALIDATOR_MODE", "fast")  # fast | full
+    VALIDATOR_EMAIL_CACHE_SIZE: int = getenv_int("VALIDATOR_EMAIL_CACHE_SIZE", 65536)
+
+    # offline backfill (python -m app.backfill)
+    BACKFILL_BATCH_SIZE: int = getenv_int("BACKFILL_BATCH_SIZE", 1000)  # lines per chunk / bulk write
+    BACKFILL_PROCESSES: int = getenv_int("BACKFILL_PROCESSES", 0)  # validation processes; 0 = os.cpu_count()
+    BACKFILL_RATE_LIMIT: bool = getenv_bool("BACKFILL_RATE_LIMIT", False)
+    BACKFILL_REPORT_SEC: int = getenv_int("BACKFILL_REPORT_SEC", 5)
+
+    # columnar export (python -m app.exporter), needs requirements-export.txt
+    EXPORT_DIR: str = getenv_str("EXPORT_DIR", "export")
+    EXPORT_FORMAT: str = getenv_str("EXPORT_FORMAT", "parquet")  # parquet | arrow
+    EXPORT_BATCH_SIZE: int = getenv_int("EXPORT_BATCH_SIZE", 50000)  # rows per cursor batch / row group
+    EXPORT_WINDOW_SEC: int = getenv_int("EXPORT_WINDOW_SEC", 3600)  # max ingestedAt span per file
+    EXPORT_LAG_SEC: int = getenv_int("EXPORT_LAG_SEC", 60)  # stay this far behind now (in-flight writes, skew)
+    EXPORT_CHECKPOINT: str = getenv_str("EXPORT_CHECKPOINT", "")  # "" = <EXPORT_DIR>/_checkpoint.json
+    EXPORT_COMPRESSION: str = getenv_str("EXPORT_COMPRESSION", "zstd")  # zstd | lz4 | snappy (parquet) | none
+    EXPORT_ENSURE_INDEX: bool = getenv_bool("EXPORT_ENSURE_INDEX", True)  # ingestedAt index on every partition
+    EXPORT_INTERVAL_SEC: int = getenv_int("EXPORT_INTERVAL_SEC", 60)  # between passes without --once
+
+    # metrics (Prometheus text format on http://METRICS_ADDR:METRICS_PORT/metrics)
+    METRICS_ENABLED: bool = getenv_bool("METRICS_ENABLED", False)
+    METRICS_ADDR: str = getenv_str("METRICS_ADDR", "0.0.0.0")
+    METRICS_PORT: int = getenv_int("METRICS_PORT", 9100)
+
+    # supervisor (python -m app.supervisor)
+    SUPERVISOR_PROCESSES: int = getenv_int("SUPERVISOR_PROCESSES", 0)  # 0 = os.cpu_count()
+    SUPERVISOR_STATS_INTERVAL_SEC: int = getenv_int("SUPERVISOR_STATS_INTERVAL_SEC", 10)
 
     # generator
     GEN_CUSTOMERS: str = getenv_str("GEN_CUSTOMERS", "1,2,3")
     GEN_RPM: int = getenv_int("GEN_RPM", 5)
     GEN_JITTER_MS: int = getenv_int("GEN_JITTER_MS", 300)
     GEN_INVALID_RATE: float = getenv_float("GEN_INVALID_RATE", 0.05)
+    # "noisy neighbor" scenario: these customers emit GEN_NOISY_RPM instead of GEN_RPM
+    GEN_NOISY_CUSTOMERS: str = getenv_str("GEN_NOISY_CUSTOMERS", "")
+    GEN_NOISY_RPM: int = getenv_int("GEN_NOISY_RPM", 6000)
 
 cfg = Config()
@@ -0,0 +1,61 @@
+"""
+Shared, tuned Redis/Mongo clients.
+
+One blocking Redis pool and one MongoClient per URL per process: the worker, limit policy, DLQ mover, metrics scrapes
+and async-engine threads all draw from the same pools instead of each opening their own. Clients are keyed by pid, so
+a forked child (supervisor) builds fresh pools instead of using the parent's sockets.
+
+- Redis: BlockingConnectionPool capped at REDIS_MAX_CONNECTIONS (a caller waits up to REDIS_POOL_TIMEOUT_SEC for a
+  free connection instead of failing), TCP keepalive, REDIS_HEALTH_CHECK_INTERVAL_SEC PING on idle connections.
+- Mongo: MONGO_MAX_POOL_SIZE / MONGO_MIN_POOL_SIZE, connect and server selection timeouts (the driver's default
+  server selection wait is 30 s, which hides a bad URI for that long at startup).
+"""
+from __future__ import annotations
+import os, threading
+from typing import Dict, Optional, Tuple
+from pymongo import MongoClient
+from redis import BlockingConnectionPool, Redis
+from redis.asyncio import BlockingConnectionPool as AsyncBlockingConnectionPool, Redis as AsyncRedis
+from .config import cfg
+
+_lock = threading.Lock()
+_redis: Dict[Tuple[int, str], Redis] = {}
+_mongo: Dict[Tuple[int, str], MongoClient] = {}
+
+def _redis_options() -> dict:
+    return {
+        "max_connections": cfg.REDIS_MAX_CONNECTIONS,
+        "timeout": cfg.REDIS_POOL_TIMEOUT_SEC,
+        "socket_keepalive": True,
+        "socket_connect_timeout": cfg.REDIS_CONNECT_TIMEOUT_SEC,
+        "health_check_interval": cfg.REDIS_HEALTH_CHECK_INTERVAL_SEC,
+    }
+
+def redis_client(url: Optional[str] = None) -> Redis:
+    """This process's shared blocking client for `url` (default REDIS_URL); bytes responses."""
+    key = (os.getpid(), url or cfg.REDIS_URL)
+    with _lock:
+        client = _redis.get(key)
+        if client is None:
+            pool = BlockingConnectionPool.from_url(key[1], decode_responses=False, **_redis_options())
+            client = _redis[key] = Redis(connection_pool=pool)
+        return client
+
+def async_redis_client(url: Optional[str] = None) -> AsyncRedis:
+    """A new redis.asyncio client with the same tuning; not shared, its connections belong to one event loop."""
+    pool = AsyncBlockingConnectionPool.from_url(url or cfg.REDIS_URL, decode_responses=False, **_redis_options())
+    return AsyncRedis(connection_pool=pool)
+
+def mongo_client(uri: Optional[str] = None) -> MongoClient:
+    """This process's shared MongoClient for `uri` (default MONGO_URI). Connects in the background."""
+    key = (os.getpid(), uri or cfg.MONGO_URI)
+    with _lock:
+        client = _mongo.get(key)
+        if client is None:
+            client = _mongo[key] = MongoClient(
+                key[1], appname="ingestion-worker",
+                maxPoolSize=cfg.MONGO_MAX_POOL_SIZE, minPoolSize=cfg.MONGO_MIN_POOL_SIZE,
+                connectTimeoutMS=cfg.MONGO_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=cfg.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            )
+        return client
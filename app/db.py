@@ -1,24 +1,254 @@
 from __future__ import annotations
-from typing import Dict, Any
-import hashlib
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import DuplicateKeyError
+from typing import Dict, Any, Callable, Iterator, List, Optional, Tuple
+import hashlib, threading, time
+from datetime import datetime, timedelta, timezone
+from bson.binary import Binary
+from dateutil.parser import isoparse
+from pymongo import MongoClient, ASCENDING, UpdateOne, WriteConcern
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError
+from .cache import TTLCache
 from .config import cfg
+from .connections import mongo_client
 from .logger import get_logger
-from .models import CustomerRecord
 
 log = get_logger()
 
+def write_concern_from_config() -> Optional[WriteConcern]:
+    # MONGO_WRITE_CONCERN: "" = driver/server default, "majority", or a node count; w=0 hides duplicate errors
+    w = cfg.MONGO_WRITE_CONCERN.strip()
+    if not w and not cfg.MONGO_WRITE_JOURNAL:
+        return None
+    kwargs: Dict[str, Any] = {}
+    if w:
+        kwargs["w"] = int(w) if w.isdigit() else w
+    if cfg.MONGO_WRITE_JOURNAL:
+        kwargs["j"] = True
+    return WriteConcern(**kwargs)
+
+WRITE_MODES = ("insert", "upsert")
+ID_FORMATS = ("hex", "binary")
+INDEX_LAYOUTS = ("customer", "compound")
+PARTITIONS = ("none", "monthly", "daily")
+PARTITION_FIELDS = ("createdAt", "ingestedAt")
+RETENTION_ACTIONS = ("drop", "archive")
+ARCHIVE_PREFIX = "archive_"
+
+def _id_key(payload: Dict[str, Any]) -> bytes:
+    return f"{payload.get('customerId','')}|{payload.get('email','')}|{payload.get('createdAt','')}".encode("utf-8")
+
+def binary_id(payload: Dict[str, Any]) -> Binary:
+    # 16-byte BLAKE2b of (customerId|email|createdAt): 18 bytes in BSON vs 69 for the hex string
+    return Binary(hashlib.blake2b(_id_key(payload), digest_size=16).digest())
+
+def format_id(_id: Any) -> str:
+    """_id as it appears in logs and return values: binary ids as 32 hex chars, legacy ids unchanged."""
+    return _id.hex() if isinstance(_id, bytes) else _id
+
+def parse_id(value: str) -> Any:
+    """Inverse of format_id: 32 hex chars -> binary _id; anything else (64-char legacy hex, non-hex) as is."""
+    if len(value) == 32:
+        try:
+            return Binary(bytes.fromhex(value))
+        except ValueError:
+            pass  # not one of ours: looked up as given, which finds nothing rather than raising
+    return value
+
 class MongoDAO:
-    def __init__(self, uri: str, db: str, collection: str):
-        self.client = MongoClient(uri, appname="ingestion-worker")
-        self.col = self.client[db][collection]
-        self._ensure_indexes()
+    """
+    write_mode "insert": insert_one/insert_many, duplicates surface as E11000 errors.
+    write_mode "upsert": update_one/bulk_write with $setOnInsert + upsert; a duplicate is a match, not an error.
+    seen_cache_size > 0 keeps recently written _ids locally and skips them before any round trip.
+    id_format "hex" stores sha256 hex strings as _id; "binary" stores a 16-byte BLAKE2b digest (see app.migrate_ids).
+    partition "monthly"/"daily" routes each record to `{collection}_YYYYMM[DD]` by partition_field (UTC); a record
+    whose partition time cannot be parsed goes to `{collection}` itself.
+    """
+    def __init__(self, uri: str, db: str, collection: str, client: Optional[MongoClient] = None,
+                 write_mode: Optional[str] = None, seen_cache_size: Optional[int] = None,
+                 id_format: Optional[str] = None, index_layout: Optional[str] = None,
+                 partition: Optional[str] = None, partition_field: Optional[str] = None,
+                 ensure_indexes: Optional[bool] = None):
+        self.write_mode = write_mode or cfg.MONGO_WRITE_MODE
+        if self.write_mode not in WRITE_MODES:
+            raise ValueError(f"unknown write mode {self.write_mode!r}; expected one of {WRITE_MODES}")
+        self.id_format = id_format or cfg.MONGO_ID_FORMAT
+        if self.id_format not in ID_FORMATS:
+            raise ValueError(f"unknown id format {self.id_format!r}; expected one of {ID_FORMATS}")
+        self.make_id = binary_id if self.id_format == "binary" else self.deterministic_id
+        self.index_layout = index_layout or cfg.MONGO_INDEX_LAYOUT
+        if self.index_layout not in INDEX_LAYOUTS:
+            raise ValueError(f"unknown index layout {self.index_layout!r}; expected one of {INDEX_LAYOUTS}")
+        self.partition = partition or cfg.MONGO_PARTITION
+        if self.partition not in PARTITIONS:
+            raise ValueError(f"unknown partition {self.partition!r}; expected one of {PARTITIONS}")
+        self.partition_field = partition_field or cfg.MONGO_PARTITION_FIELD
+        if self.partition_field not in PARTITION_FIELDS:
+            raise ValueError(f"unknown partition field {self.partition_field!r}; expected one of {PARTITION_FIELDS}")
+        size = cfg.MONGO_SEEN_CACHE_SIZE if seen_cache_size is None else seen_cache_size
+        self.seen = TTLCache(size, cfg.MONGO_SEEN_CACHE_TTL_SEC) if size > 0 else None
+        self._seen_lock = threading.Lock()  # insert_many may run from several threads (async engine, bulk writer)
+        self.ensure_indexes = cfg.MONGO_ENSURE_INDEXES if ensure_indexes is None else ensure_indexes
+        self.client = client if client is not None else mongo_client(uri)
+        self.db = self.client[db]
+        self.collection = collection
+        self._wc = write_concern_from_config()
+        self.col = self._open(collection)
+        self.duplicates = 0  # duplicates seen (idempotent replays), whichever way they were detected
+        # partition name -> collection handle with indexes ensured; routing never asks the server
+        self._partitions: Dict[str, Collection] = {}
+        self._partitions_lock = threading.Lock()
+        self._ensure_indexes(self.col)
+
+    def _open(self, name: str) -> Collection:
+        col = self.db[name]
+        return col.with_options(write_concern=self._wc) if self._wc is not None else col
 
-    def _ensure_indexes(self):
+    def _ensure_indexes(self, col: Collection):
         # strong idempotency via deterministic _id
         # or alternatively unique compound index
-        self.col.create_index([("customerId", ASCENDING)], name="idx_customerId")
+        if not self.ensure_indexes:
+            return
+        if self.index_layout == "compound":
+            # serves customerId lookups (prefix) and per-customer createdAt ranges/sorts with one index
+            keys, name = [("customerId", ASCENDING), ("createdAt", ASCENDING)], "idx_customerId_createdAt"
+        else:
+            keys, name = [("customerId", ASCENDING)], "idx_customerId"
+        # listIndexes is a cheap read; createIndexes is a write command (collection lock, write concern wait) even
+        # when the index exists, and every worker start or restart used to pay for it
+        if name in col.index_information():
+            return
+        col.create_index(keys, name=name)
+        log.info("index_created", collection=col.name, index=name)
+
+    # --- partition routing ---
+
+    def partition_name(self, when: datetime) -> str:
+        fmt = "%Y%m" if self.partition == "monthly" else "%Y%m%d"
+        return f"{self.collection}_{when.strftime(fmt)}"
+
+    def _partition_time(self, doc: Dict[str, Any]) -> Optional[datetime]:
+        value = doc.get(self.partition_field)
+        if isinstance(value, datetime):
+            return value
+        # the validator's parser (CustomerRecord uses isoparse), so every accepted createdAt routes, "T24:00" and
+        # "+0530" included; offsets are normalised so a record always lands in the same UTC period
+        try:
+            dt = isoparse(value)
+            if dt.tzinfo is not None:
+                dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+        except (TypeError, ValueError, OverflowError):
+            return None
+        return dt
+
+    def _partition_for(self, doc: Dict[str, Any]) -> str:
+        when = self._partition_time(doc)
+        if when is None:
+            # unvalidated input (direct DAO use): a fixed place, so replays still dedupe and find_record finds it
+            log.warning("partition_fallback", field=self.partition_field, value=str(doc.get(self.partition_field)),
+                        collection=self.collection)
+            return self.collection
+        return self.partition_name(when)
+
+    def _with_fallback(self, names: List[str]) -> List[str]:
+        """Partition names plus the base collection holding records routed by _partition_for's fallback."""
+        return names if self.partition == "none" else [self.collection] + names
+
+    def _route(self, doc: Dict[str, Any]) -> Collection:
+        if self.partition == "none":
+            return self.col
+        name = self._partition_for(doc)
+        if name == self.collection:
+            return self.col
+        col = self._partitions.get(name)
+        if col is None:
+            with self._partitions_lock:
+                col = self._partitions.get(name)
+                if col is None:
+                    col = self._open(name)
+                    self._ensure_indexes(col)  # once per partition per process
+                    self._partitions[name] = col
+        return col
+
+    def partitions(self) -> List[str]:
+        """Existing partition names, oldest first (archived ones excluded)."""
+        if self.partition == "none":
+            return [self.collection]
+        digits = 6 if self.partition == "monthly" else 8
+        pattern = f"^{self.collection}_\\d{{{digits}}}$"
+        return sorted(self.db.list_collection_names(filter={"name": {"$regex": pattern}}))
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, start: Optional[datetime] = None,
+             end: Optional[datetime] = None, limit: int = 0) -> Iterator[Dict[str, Any]]:
+        """Fan a query out over the partitions overlapping [start, end] (naive UTC), newest partition first."""
+        names = self.partitions()
+        if self.partition != "none":
+            lo = self.partition_name(start) if start else None
+            hi = self.partition_name(end) if end else None
+            names = [n for n in names if (lo is None or n >= lo) and (hi is None or n <= hi)]
+            if start is None and end is None:
+                names = self._with_fallback(names)  # searched last
+        returned = 0
+        for name in reversed(names):
+            for doc in self.db[name].find(filter or {}, limit=(limit - returned) if limit else 0):
+                yield doc
+                returned += 1
+            if limit and returned >= limit:
+                return
+
+    # --- incremental reads by ingestedAt (app.exporter) ---
+
+    def ensure_ingested_index(self) -> None:
+        """ingestedAt index on every partition, for watermark scans (one more index entry per insert)."""
+        for name in self._with_fallback(self.partitions()):
+            col = self.db[name]
+            if "idx_ingestedAt" not in col.index_information():
+                col.create_index([("ingestedAt", ASCENDING)], name="idx_ingestedAt")
+                log.info("index_created", collection=name, index="idx_ingestedAt")
+
+    def first_ingested_at(self) -> Optional[datetime]:
+        """Oldest ingestedAt over all partitions, or None when nothing is stored."""
+        firsts = []
+        for name in self._with_fallback(self.partitions()):
+            doc = self.db[name].find_one({"ingestedAt": {"$ne": None}}, {"ingestedAt": 1}, sort=[("ingestedAt", 1)])
+            if doc is not None:
+                firsts.append(doc["ingestedAt"])
+        return min(firsts) if firsts else None
+
+    def find_ingested(self, start: datetime, end: datetime, batch_size: int = 10000,
+                      projection: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Documents with start <= ingestedAt < end (naive UTC) from every partition, streamed in driver batches."""
+        for name in self._with_fallback(self.partitions()):
+            yield from self.db[name].find({"ingestedAt": {"$gte": start, "$lt": end}}, projection,
+                                          batch_size=batch_size)
+
+    def apply_retention(self, keep: Optional[int] = None, action: Optional[str] = None,
+                        now: Optional[datetime] = None) -> List[str]:
+        """
+        Drop (or rename to archive_<name>) partitions older than the newest `keep` periods, counting the current one.
+        Both are metadata operations; no documents are read. Returns the affected partition names.
+        """
+        keep = cfg.MONGO_RETENTION_PARTITIONS if keep is None else keep
+        action = action or cfg.MONGO_RETENTION_ACTION
+        if action not in RETENTION_ACTIONS:
+            raise ValueError(f"unknown retention action {action!r}; expected one of {RETENTION_ACTIONS}")
+        if self.partition == "none" or keep <= 0:
+            return []
+        now = now or datetime.utcnow()
+        if self.partition == "monthly":
+            months = now.year * 12 + now.month - 1 - (keep - 1)
+            cutoff = self.partition_name(datetime(months // 12, months % 12 + 1, 1))
+        else:
+            cutoff = self.partition_name(now - timedelta(days=keep - 1))
+        expired = [name for name in self.partitions() if name < cutoff]
+        for name in expired:
+            if action == "drop":
+                self.db.drop_collection(name)
+            else:
+                self.db[name].rename(ARCHIVE_PREFIX + name)
+            with self._partitions_lock:
+                self._partitions.pop(name, None)
+            log.info("partition_retired", partition=name, action=action)
+        return expired
 
     @staticmethod
     def deterministic_id(payload: Dict[str, Any]) -> str:
@@ -26,15 +256,212 @@ class MongoDAO:
         key = f"{payload.get('customerId','')}|{payload.get('email','')}|{payload.get('createdAt','')}"
         return hashlib.sha256(key.encode("utf-8")).hexdigest()
 
+    def find_by_id(self, value: str) -> Optional[Dict[str, Any]]:
+        """Look up by a logged/returned id; works for binary ids and legacy hex ids (all partitions)."""
+        return next(self.find({"_id": parse_id(value)}, limit=1), None)
+
+    def find_record(self, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Look up the stored copy of a record whether it was written with a hex or a binary _id."""
+        query = {"_id": {"$in": [binary_id(payload), self.deterministic_id(payload)]}}
+        if self.partition != "none" and self.partition_field == "createdAt":
+            return self.db[self._partition_for(payload)].find_one(query)
+        return next(self.find(query, limit=1), None)
+
+    def _dup(self, doc: Dict[str, Any]) -> None:
+        # Idempotent insert; treat as success but log duplicate
+        self.duplicates += 1
+        log.warning("duplicate_insert", _id=format_id(doc["_id"]), customerId=doc.get("customerId"))
+
+    def _seen_before(self, _id: str) -> bool:
+        if self.seen is None:
+            return False
+        with self._seen_lock:
+            return self.seen.get(_id) is not None
+
+    def _remember(self, ids: List[str]) -> None:
+        if self.seen is not None:
+            with self._seen_lock:
+                for _id in ids:
+                    self.seen.set(_id, True)
+
     def insert_record(self, record: Dict[str, Any]) -> str:
         # validate already done; convert fields
         doc = record.copy()
-        doc["_id"] = self.deterministic_id(doc)
+        doc["_id"] = self.make_id(doc)
         doc["ingestedAt"] = __import__("datetime").datetime.utcnow()
+        if self._seen_before(doc["_id"]):
+            self._dup(doc)
+            return format_id(doc["_id"])
+        col = self._route(doc)
+        if self.write_mode == "upsert":
+            res = col.update_one({"_id": doc["_id"]}, {"$setOnInsert": _without_id(doc)}, upsert=True)
+            if res.upserted_id is None:
+                self._dup(doc)
+            self._remember([doc["_id"]])
+            return format_id(doc["_id"])
         try:
-            self.col.insert_one(doc)
-            return doc["_id"]
+            col.insert_one(doc)
         except DuplicateKeyError:
-            # Idempotent insert; treat as success but log duplicate
-            log.warning("duplicate_insert", _id=doc["_id"], customerId=doc.get("customerId"))
-            return doc["_id"]
+            self._dup(doc)
+        self._remember([doc["_id"]])
+        return format_id(doc["_id"])
+
+    def insert_many(self, records: List[Dict[str, Any]]) -> List[str]:
+        # batched variant of insert_record: one unordered insert_many/bulk_write round trip
+        ingested_at = datetime.utcnow()
+        docs = []
+        for record in records:
+            doc = record.copy()
+            doc["_id"] = self.make_id(doc)
+            doc["ingestedAt"] = ingested_at
+            docs.append(doc)
+        ids = [format_id(doc["_id"]) for doc in docs]
+        pending = []
+        for doc in docs:
+            if self._seen_before(doc["_id"]):
+                self._dup(doc)
+            else:
+                pending.append(doc)
+        if not pending:
+            return ids
+        if self.partition == "none":
+            self._write_many(self.col, pending)
+        else:
+            groups: Dict[int, Tuple[Collection, List[Dict[str, Any]]]] = {}
+            for doc in pending:
+                col = self._route(doc)
+                groups.setdefault(id(col), (col, []))[1].append(doc)
+            for col, group in groups.values():  # one round trip per partition touched
+                self._write_many(col, group)
+        self._remember([doc["_id"] for doc in pending])
+        return ids
+
+    def _write_many(self, col: Collection, pending: List[Dict[str, Any]]) -> None:
+        try:
+            if self.write_mode == "upsert":
+                res = col.bulk_write(
+                    [UpdateOne({"_id": doc["_id"]}, {"$setOnInsert": _without_id(doc)}, upsert=True) for doc in pending],
+                    ordered=False,
+                )
+                # compare as strings: binary ids come back as plain bytes, which never equal Binary
+                inserted = {format_id(_id) for _id in res.upserted_ids.values()}
+                for doc in pending:
+                    if format_id(doc["_id"]) in inserted:
+                        inserted.discard(format_id(doc["_id"]))  # a repeat within the batch matched this one
+                    else:
+                        self._dup(doc)
+            else:
+                col.insert_many(pending, ordered=False)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            for err in errors:
+                if err.get("code") == 11000:  # insert mode, or two upserts racing on one _id
+                    self._dup(pending[err["index"]])
+            # anything other than duplicates is a real failure, same as insert_record
+            if any(err.get("code") != 11000 for err in errors) or e.details.get("writeConcernErrors"):
+                raise
+
+def _without_id(doc: Dict[str, Any]) -> Dict[str, Any]:
+    # upserts take _id from the filter; repeating it in $setOnInsert is redundant
+    return {k: v for k, v in doc.items() if k != "_id"}
+
+def _approx_size(record: Dict[str, Any]) -> int:
+    # cheap stand-in for the BSON size; only used to bound the buffer
+    return 64 + sum(len(k) + len(str(v)) for k, v in record.items())
+
+class BulkMongoWriter:
+    """
+    Write-behind buffer in front of MongoDAO.insert_many (unordered; duplicates handled per document there).
+    Flushes when max_docs or max_bytes is reached (in the caller's thread, which is the backpressure),
+    when the oldest buffered record is max_age_ms old (background thread), and on flush()/close().
+    on_flush(contexts, ids, seconds) runs after every successful write with the add() contexts in order.
+    on_error(contexts, error) takes over a write that failed with a PyMongoError (e.g. to retry the records later).
+    Without it, or if it raises, a failed background flush is re-raised by the next add/flush/close.
+    """
+    def __init__(self, dao: MongoDAO, max_docs: int = 500, max_age_ms: int = 200, max_bytes: int = 8 << 20,
+                 on_flush: Optional[Callable[[List[Any], List[str], float], None]] = None,
+                 on_error: Optional[Callable[[List[Any], Exception], None]] = None):
+        self.dao = dao
+        self.max_docs = max(1, max_docs)
+        self.max_age = max(0.001, max_age_ms / 1000.0)
+        self.max_bytes = max(1, max_bytes)
+        self.on_flush = on_flush
+        self.on_error = on_error
+        self.flushes = 0
+        self._buf: List[Tuple[Dict[str, Any], Any]] = []
+        self._bytes = 0
+        self._oldest = 0.0
+        self._lock = threading.Lock()        # guards the buffer
+        self._flush_lock = threading.Lock()  # one write at a time, in add() order
+        self._error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def add(self, record: Dict[str, Any], ctx: Any = None) -> None:
+        self._raise_pending()
+        size = _approx_size(record)
+        with self._lock:
+            if not self._buf:
+                self._oldest = time.monotonic()
+            self._buf.append((record, ctx))
+            self._bytes += size
+            full = len(self._buf) >= self.max_docs or self._bytes >= self.max_bytes
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._age_flusher, name="mongo-bulk-writer", daemon=True)
+            self._thread.start()
+        if full:
+            self.flush()
+
+    def flush(self) -> int:
+        self._raise_pending()
+        return self._flush()
+
+    def _flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._buf, self._bytes = self._buf, [], 0
+            if not batch:
+                return 0
+            t0 = time.perf_counter()
+            try:
+                ids = self.dao.insert_many([record for record, _ in batch])
+            except PyMongoError as e:
+                if self.on_error is None:
+                    raise
+                self.on_error([ctx for _, ctx in batch], e)
+                return 0
+            self.flushes += 1
+            if self.on_flush is not None:
+                self.on_flush([ctx for _, ctx in batch], ids, time.perf_counter() - t0)
+            return len(ids)
+
+    def _age_flusher(self) -> None:
+        tick = max(0.001, self.max_age / 4)
+        while not self._stop.wait(tick):
+            with self._lock:
+                due = bool(self._buf) and time.monotonic() - self._oldest >= self.max_age
+            if not due:
+                continue
+            try:
+                self._flush()
+            except Exception as e:
+                log.error("bulk_flush_failed", status="error", reason=str(e))
+                self._error = e
+
+    def _raise_pending(self) -> None:
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise err
+
+    def close(self) -> None:
+        """Stop the age flusher and write everything still buffered."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._stop.clear()
+        self.flush()
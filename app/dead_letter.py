@@ -0,0 +1,209 @@
+"""
+Delay / dead-letter queue for records the worker could not ingest yet.
+
+    {QUEUE_KEY}:delay  ZSET of entries scored by when they are due (ms)
+    {QUEUE_KEY}:dead   list of entries that used up DLQ_MAX_ATTEMPTS
+
+- Rate-limited records are scored by the time the customer's window frees up (the limiter's retry_at). Several
+  records of one customer are spaced window/limit apart, so they do not all come back at once just to be rejected again.
+- Records whose Mongo write failed get exponential backoff: DLQ_BACKOFF_BASE_MS * 2^(attempt-1), capped at
+  DLQ_BACKOFF_MAX_MS, with jitter.
+- The attempt number travels with the record (field "_attempt", ignored by validation).
+- A mover thread claims due entries in batches of DLQ_MOVE_BATCH every DLQ_MOVE_INTERVAL_MS and pushes them back onto
+  the main queue with one push_many. A claim leases entries instead of removing them, so a crash between claim and push
+  re-delivers them after the lease, and two movers never push the same entry.
+
+    python -m app.dead_letter stats
+    python -m app.dead_letter requeue-dead [--count N]
+"""
+from __future__ import annotations
+import argparse, itertools, json, os, random, threading, time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from redis import Redis
+from .cache import TTLCache
+from .config import cfg
+from .logger import get_logger
+from .queue_client import make_queue
+
+log = get_logger()
+
+ATTEMPT_FIELD = "_attempt"
+
+# Lease up to ARGV[2] due entries: push their score to now + lease so no other mover sees them as due.
+CLAIM_DUE_LUA = """
+-- KEYS[1] = delay zset
+-- ARGV[1] = now_ms, ARGV[2] = max entries, ARGV[3] = lease_ms
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[2]))
+local leased_to = tonumber(ARGV[1]) + tonumber(ARGV[3])
+for _, member in ipairs(due) do
+  redis.call('ZADD', KEYS[1], leased_to, member)
+end
+return due
+"""
+
+class DeadLetterQueue:
+    def __init__(self, redis: Redis, queue_key: str, max_attempts: int = 10, backoff_base_ms: int = 1000,
+                 backoff_max_ms: int = 300000, move_batch: int = 500, lease_ms: int = 30000,
+                 spacing_cache_size: int = 10000):
+        self.redis = redis
+        self.delay_key = f"{queue_key}:delay"
+        self.dead_key = f"{queue_key}:dead"
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base_ms = max(1, backoff_base_ms)
+        self.backoff_max_ms = max(self.backoff_base_ms, backoff_max_ms)
+        self.move_batch = max(1, move_batch)
+        self.lease_ms = lease_ms
+        self._claim = redis.register_script(CLAIM_DUE_LUA)
+        # entries must be unique members even for identical records
+        self._prefix = os.urandom(4).hex()
+        self._seq = itertools.count()
+        # customerId -> next free retry slot (ms) handed out by this process
+        self._next_slot = TTLCache(spacing_cache_size, 3600)
+        self._slot_lock = threading.Lock()  # the async engine defers from worker threads
+        self.delayed = 0
+        self.dead = 0
+        self.moved = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def backoff_ms(self, attempt: int) -> int:
+        """Equal jitter: half the exponential delay, plus a random share of the other half."""
+        delay = min(self.backoff_max_ms, self.backoff_base_ms * 2 ** max(0, attempt - 1))
+        return int(delay / 2 + random.uniform(0, delay / 2))
+
+    def _schedule(self, entries: Sequence[Tuple[dict, int]], reason: str) -> Tuple[int, int]:
+        """ZADD (item, due_ms) entries, or move them to the dead list past max_attempts; returns (delayed, dead)."""
+        if not entries:
+            return 0, 0
+        pipe = self.redis.pipeline(transaction=False)
+        delayed = dead = 0
+        for item, due_ms in entries:
+            item = dict(item)
+            attempt = int(item.get(ATTEMPT_FIELD) or 0) + 1
+            item[ATTEMPT_FIELD] = attempt
+            entry = json.dumps({"id": f"{self._prefix}:{next(self._seq)}", "reason": reason, "item": item})
+            if attempt > self.max_attempts:
+                pipe.rpush(self.dead_key, entry)
+                dead += 1
+                log.error("dead_lettered", status="error", customerId=item.get("customerId"), reason=reason,
+                          attempts=attempt - 1)
+            else:
+                pipe.zadd(self.delay_key, {entry: due_ms})
+                delayed += 1
+        pipe.execute()
+        self.delayed += delayed
+        self.dead += dead
+        return delayed, dead
+
+    def defer_rate_limited(self, rejected: Sequence[Tuple[dict, str, int]],
+                           limits: Callable[[str], Tuple[int, int]], now_ms: Optional[int] = None) -> Tuple[int, int]:
+        """
+        rejected: (item, customer_id, retry_at_ms). Each customer's records are due from its retry_at on,
+        window/limit apart, continuing after the slots already handed out.
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        entries = []
+        with self._slot_lock:
+            for item, customer_id, retry_at_ms in rejected:
+                limit, window_ms = limits(customer_id)
+                spacing = max(1, window_ms // max(1, limit))
+                due = max(retry_at_ms, now_ms + spacing, self._next_slot.get(customer_id, 0))
+                self._next_slot.set(customer_id, due + spacing, ttl_sec=max(1.0, (due + spacing - now_ms) / 1000.0))
+                entries.append((item, due))
+        return self._schedule(entries, "rate_limited")
+
+    def retry_failed(self, items: Sequence[dict], reason: str, now_ms: Optional[int] = None) -> Tuple[int, int]:
+        """Schedule records whose write failed, with exponential backoff by attempt."""
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        return self._schedule(
+            [(item, now_ms + self.backoff_ms(int(item.get(ATTEMPT_FIELD) or 0) + 1)) for item in items], reason
+        )
+
+    def move_due(self, queue, now_ms: Optional[int] = None) -> int:
+        """Push every due entry back onto `queue`, a batch per round trip; returns how many moved."""
+        moved = 0
+        while True:
+            now = now_ms if now_ms is not None else int(time.time() * 1000)
+            claimed = self._claim(keys=[self.delay_key], args=[now, self.move_batch, self.lease_ms])
+            if not claimed:
+                break
+            queue.push_many([json.loads(entry)["item"] for entry in claimed])
+            self.redis.zrem(self.delay_key, *claimed)
+            moved += len(claimed)
+            if len(claimed) < self.move_batch:
+                break
+        if moved:
+            self.moved += moved
+            log.info("dlq_moved", count=moved)
+        return moved
+
+    def requeue_dead(self, queue, count: int = 0) -> int:
+        """Push dead entries back onto `queue` with a fresh attempt count (count=0: all)."""
+        moved = 0
+        while not count or moved < count:
+            n = min(self.move_batch, count - moved) if count else self.move_batch
+            raws = self.redis.lpop(self.dead_key, n)
+            if not raws:
+                break
+            items = []
+            for raw in raws:
+                item = json.loads(raw)["item"]
+                item.pop(ATTEMPT_FIELD, None)
+                items.append(item)
+            queue.push_many(items)
+            moved += len(items)
+        return moved
+
+    def depth(self) -> Dict[str, int]:
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.zcard(self.delay_key)
+        pipe.llen(self.dead_key)
+        delayed, dead = pipe.execute()
+        return {"delayed": int(delayed), "dead": int(dead)}
+
+    def start(self, queue, interval_ms: int) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._mover, args=(queue, interval_ms / 1000.0),
+                                            name="dlq-mover", daemon=True)
+            self._thread.start()
+
+    def _mover(self, queue, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.move_due(queue)
+            except Exception as e:
+                log.warning("dlq_move_failed", error=str(e))
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+def make_dlq(redis: Redis, queue_key: str) -> Optional[DeadLetterQueue]:
+    """DeadLetterQueue from config, or None when DLQ_ENABLED is off."""
+    if not cfg.DLQ_ENABLED:
+        return None
+    return DeadLetterQueue(redis, queue_key, max_attempts=cfg.DLQ_MAX_ATTEMPTS,
+                           backoff_base_ms=cfg.DLQ_BACKOFF_BASE_MS, backoff_max_ms=cfg.DLQ_BACKOFF_MAX_MS,
+                           move_batch=cfg.DLQ_MOVE_BATCH)
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats")
+    p = sub.add_parser("requeue-dead")
+    p.add_argument("--count", type=int, default=0, help="0 = all")
+    args = ap.parse_args(argv)
+
+    redis = Redis.from_url(cfg.REDIS_URL, decode_responses=False)
+    dlq = DeadLetterQueue(redis, cfg.QUEUE_KEY, move_batch=cfg.DLQ_MOVE_BATCH)
+    if args.cmd == "requeue-dead":
+        out = {"requeued": dlq.requeue_dead(make_queue(redis, cfg.QUEUE_KEY), args.count)}
+    else:
+        out = dlq.depth()
+    print(json.dumps(out))
+    return out
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Incremental columnar export of ingested records (Parquet or Arrow IPC) for analytics.
+
+    python -m app.exporter [--once] [--out DIR] [--format parquet|arrow] [--checkpoint PATH]
+
+- Follows an `ingestedAt` watermark: each pass exports the half-open window [watermark, hi) from every partition
+  (MongoDAO.find_ingested), with hi at most EXPORT_WINDOW_SEC after the watermark, never past UTC midnight and
+  never later than now - EXPORT_LAG_SEC. The lag covers batches whose ingestedAt (set before the bulk write) is
+  still in flight, and clock skew between worker hosts.
+- Documents are streamed with a cursor batch of EXPORT_BATCH_SIZE and written one record batch (Parquet row group)
+  at a time, so memory is bounded by one batch whatever the window holds.
+- Files: <dir>/date=YYYY-MM-DD/part-HHMMSSmmm.<parquet|arrow>, named after the window start. They are written to
+  a .tmp file and renamed, so readers never see a partial file; a rerun after a crash rewrites the same name.
+- After each window the watermark is saved atomically to the checkpoint (default <dir>/_checkpoint.json), so a
+  restart resumes there. Empty windows only advance the watermark.
+- createdAt is stored as timestamp[us, UTC]: strings are cast in one Arrow compute pass (strings without a zone are
+  taken as UTC); a batch that does not cast is parsed per value like the validator, unparseable values become null.
+- Needs pyarrow (pip install -r requirements-export.txt).
+"""
+from __future__ import annotations
+import argparse, json, os, signal, threading, time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from dateutil.parser import isoparse
+from .config import cfg
+from .db import MongoDAO, format_id
+from .logger import get_logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pc = ipc = pq = None
+
+log = get_logger()
+
+EXPORT_FORMATS = ("parquet", "arrow")
+FIELDS = ("_id", "customerId", "name", "email", "createdAt", "ingestedAt")
+_ZONE = r"(Z|[+-]\d\d:?\d\d)$"
+
+def schema() -> "pa.Schema":
+    ts = pa.timestamp("us", tz="UTC")
+    return pa.schema([("_id", pa.string()), ("customerId", pa.string()), ("name", pa.string()),
+                      ("email", pa.string()), ("createdAt", ts), ("ingestedAt", ts)])
+
+def to_timestamps(values: List[Any]) -> "pa.Array":
+    """createdAt values (ISO strings or datetimes) as timestamp[us, UTC]; vectorized for strings."""
+    ts = pa.timestamp("us", tz="UTC")
+    if not any(isinstance(v, str) for v in values):
+        return pa.array(values, type=ts)  # datetimes (naive = UTC) or all null
+    arr = pa.array([v if isinstance(v, str) or v is None else v.isoformat() for v in values], type=pa.string())
+    zoned = pc.if_else(pc.match_substring_regex(arr, _ZONE), arr, pc.binary_join_element_wise(arr, "Z", ""))
+    try:
+        return pc.cast(zoned, ts)
+    except pa.ArrowInvalid:
+        return pa.array([_parse(v) for v in arr.to_pylist()], type=ts)
+
+def _parse(value: Optional[str]) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        parsed = isoparse(value)
+    except (ValueError, OverflowError):
+        return None
+    return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed
+
+def to_batch(docs: List[Dict[str, Any]]) -> "pa.RecordBatch":
+    columns = [pa.array([format_id(d["_id"]) for d in docs], type=pa.string())]
+    columns += [pa.array([d.get(f) for d in docs], type=pa.string()) for f in ("customerId", "name", "email")]
+    columns.append(to_timestamps([d.get("createdAt") for d in docs]))
+    columns.append(pa.array([d.get("ingestedAt") for d in docs], type=pa.timestamp("us", tz="UTC")))
+    return pa.RecordBatch.from_arrays(columns, schema=schema())
+
+def _chunks(docs: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for doc in docs:
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def load_checkpoint(path: str) -> Optional[datetime]:
+    try:
+        with open(path) as f:
+            value = json.load(f).get("watermark")
+    except FileNotFoundError:
+        return None
+    return datetime.fromisoformat(value) if value else None
+
+def save_checkpoint(path: str, watermark: datetime, stats: Dict[str, Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(dict(stats, watermark=watermark.isoformat(), updated=time.time()), f)
+    os.replace(tmp, path)  # atomic: a crash never leaves a torn checkpoint
+
+class Exporter:
+    def __init__(self, dao: MongoDAO, out_dir: str, fmt: str = "parquet", batch_size: int = 50000,
+                 window_sec: int = 3600, lag_sec: int = 60, checkpoint: Optional[str] = None,
+                 compression: str = "zstd", ensure_index: bool = True):
+        if pa is None:
+            raise RuntimeError("the exporter needs pyarrow: pip install -r requirements-export.txt")
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"unknown EXPORT_FORMAT {fmt!r}; expected one of {EXPORT_FORMATS}")
+        self.dao = dao
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.batch_size = max(1, batch_size)
+        self.window = timedelta(seconds=max(1, window_sec))
+        self.lag = timedelta(seconds=max(0, lag_sec))
+        self.checkpoint = checkpoint or os.path.join(out_dir, "_checkpoint.json")
+        self.compression = None if compression in ("", "none") else compression
+        self.ensure_index = ensure_index
+        self.stats = {"windows": 0, "files": 0, "rows": 0}
+        self._stop = threading.Event()
+
+    def run_once(self, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Export every complete window up to now - lag; returns this pass's counts and the new watermark."""
+        if self.ensure_index:
+            self.dao.ensure_ingested_index()
+        os.makedirs(self.out_dir, exist_ok=True)
+        limit = (now or datetime.now(timezone.utc).replace(tzinfo=None)) - self.lag
+        lo = load_checkpoint(self.checkpoint) or self.dao.first_ingested_at()
+        before = dict(self.stats)
+        t0 = time.perf_counter()
+        while lo is not None and lo < limit and not self._stop.is_set():
+            midnight = datetime.combine(lo.date() + timedelta(days=1), datetime.min.time())
+            hi = min(lo + self.window, midnight, limit)
+            self._export(lo, hi)
+            save_checkpoint(self.checkpoint, hi, self.stats)
+            lo = hi
+        out = {k: self.stats[k] - before[k] for k in self.stats}
+        out.update(watermark=lo.isoformat() if lo else None, seconds=round(time.perf_counter() - t0, 3))
+        log.info("export_pass", **out)
+        return out
+
+    def _export(self, lo: datetime, hi: datetime) -> None:
+        part = os.path.join(self.out_dir, f"date={lo:%Y-%m-%d}")
+        path = os.path.join(part, f"part-{lo:%H%M%S}{lo.microsecond // 1000:03d}.{self.fmt}")
+        tmp = f"{path}.tmp"
+        writer = None
+        rows = 0
+        try:
+            docs = self.dao.find_ingested(lo, hi, batch_size=self.batch_size, projection=list(FIELDS))
+            for chunk in _chunks(docs, self.batch_size):
+                if writer is None:
+                    os.makedirs(part, exist_ok=True)
+                    writer = self._writer(tmp)
+                writer.write_batch(to_batch(chunk))
+                rows += len(chunk)
+        finally:
+            if writer is not None:
+                writer.close()
+        self.stats["windows"] += 1
+        if writer is None:
+            return
+        os.replace(tmp, path)
+        self.stats["files"] += 1
+        self.stats["rows"] += rows
+        log.info("export_file", path=path, rows=rows, start=lo.isoformat(), end=hi.isoformat())
+
+    def _writer(self, path: str):
+        if self.fmt == "parquet":
+            return pq.ParquetWriter(path, schema(), compression=self.compression or "none")
+        return ipc.new_file(path, schema(), options=ipc.IpcWriteOptions(compression=self.compression))
+
+    def run(self, interval_sec: float) -> None:
+        """run_once every interval_sec until close()."""
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                log.warning("export_failed", error=str(e))
+            self._stop.wait(interval_sec)
+
+    def close(self) -> None:
+        self._stop.set()
+
+def main(argv: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--once", action="store_true", help="one pass, then exit")
+    ap.add_argument("--out", default=cfg.EXPORT_DIR)
+    ap.add_argument("--format", choices=EXPORT_FORMATS, default=cfg.EXPORT_FORMAT)
+    ap.add_argument("--checkpoint", default=cfg.EXPORT_CHECKPOINT or None, help="default: <out>/_checkpoint.json")
+    args = ap.parse_args(argv)
+
+    dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
+    exporter = Exporter(dao, args.out, args.format, batch_size=cfg.EXPORT_BATCH_SIZE,
+                        window_sec=cfg.EXPORT_WINDOW_SEC, lag_sec=cfg.EXPORT_LAG_SEC, checkpoint=args.checkpoint,
+                        compression=cfg.EXPORT_COMPRESSION, ensure_index=cfg.EXPORT_ENSURE_INDEX)
+    if args.once:
+        return exporter.run_once()
+    signal.signal(signal.SIGTERM, lambda *_: exporter.close())
+    try:
+        exporter.run(cfg.EXPORT_INTERVAL_SEC)
+    except KeyboardInterrupt:
+        exporter.close()
+    return None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from redis import Redis
+from .codec import encode
+from .logger import get_logger
+from .queue_client import decode_item
+
+log = get_logger()
+
+# Pop up to ARGV[1] items from one customer's list; drop the customer from the active set once it is empty.
+POP_CUSTOMER_LUA = """
+-- KEYS[1] = customer list, KEYS[2] = active set
+-- ARGV[1] = count, ARGV[2] = customer id
+local out = redis.call('LPOP', KEYS[1], ARGV[1])
+if redis.call('LLEN', KEYS[1]) == 0 then
+  redis.call('SREM', KEYS[2], ARGV[2])
+end
+return out or {}
+"""
+
+# records popped (and rejected) per turn for a customer the rate limiter already knows is over its limit
+REJECT_CHUNK = 100
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """"vip=4,bulk=0.5" -> {"vip": 4.0, "bulk": 0.5}; bad entries are ignored."""
+    weights = {}
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        try:
+            if name.strip() and float(w) > 0:
+                weights[name.strip()] = float(w)
+        except ValueError:
+            continue
+    return weights
+
+class FairQueueClient:
+    """
+    One list per customer ({key}:c:{customerId}) plus a set of customers with pending items ({key}:active).
+    pop_many() runs deficit round robin over the active customers: each turn a customer earns
+    quantum * weight records and one pipelined round trip pops every customer's share.
+    With a ratelimiter, customers it already knows are blocked (local blocked cache) are not scheduled normally:
+    their records are popped in chunks and handed to on_reject without validation or a Lua limiter call.
+    At-most-once, like the list backend; ack() is a no-op.
+    """
+    def __init__(self, redis: Redis, key: str, weights: Optional[Dict[str, float]] = None, quantum: int = 10,
+                 ratelimiter=None, on_reject: Optional[Callable[[str, List[dict]], None]] = None,
+                 refresh_ms: int = 200, idle_sleep_ms: int = 20):
+        self.redis = redis
+        self.key = key
+        self.active_key = f"{key}:active"
+        self.weights = weights or {}
+        self.quantum = max(1, quantum)
+        self.ratelimiter = ratelimiter
+        self.on_reject = on_reject
+        self.refresh = refresh_ms / 1000.0
+        self.idle_sleep = idle_sleep_ms / 1000.0
+        self._pop = redis.register_script(POP_CUSTOMER_LUA)
+        self._ring: Deque[str] = deque()
+        self._deficit: Dict[str, float] = {}
+        self._refreshed = 0.0
+
+    def sub_key(self, customer_id: str) -> str:
+        return f"{self.key}:c:{customer_id}"
+
+    def push(self, item: dict) -> None:
+        self.push_many([item])
+
+    def push_many(self, items) -> None:
+        if not items:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for item in items:
+            cid = str(item.get("customerId", ""))
+            # RPUSH before SADD: a concurrent pop that empties the list can only remove the customer before the SADD
+            pipe.rpush(self.sub_key(cid), encode(item))
+            pipe.sadd(self.active_key, cid)
+        pipe.execute()
+
+    def pop(self, timeout: int) -> Optional[Tuple[str, dict]]:
+        res = self.pop_many(1, timeout)
+        return res[0] if res else None
+
+    def pop_many(self, count: int, timeout: int) -> List[Tuple[str, dict]]:
+        deadline = time.monotonic() + timeout
+        while True:
+            out, progressed = self._schedule(max(1, int(count)))
+            # popped-and-rejected also returns (empty), so the caller's loop sees progress instead of blocking
+            if out or progressed or time.monotonic() >= deadline:
+                return out
+            # no server-side blocking pop spans a changing set of lists; poll the active set
+            time.sleep(min(self.idle_sleep, max(0.0, deadline - time.monotonic())))
+
+    def _refresh(self) -> None:
+        active = {m.decode() if isinstance(m, bytes) else m for m in self.redis.smembers(self.active_key)}
+        # keep the current rotation order; newcomers join at the back
+        self._ring = deque(c for c in self._ring if c in active)
+        known = set(self._ring)
+        self._ring.extend(sorted(active - known))
+        for cid in list(self._deficit):
+            if cid not in active:
+                del self._deficit[cid]
+        self._refreshed = time.monotonic()
+
+    def _schedule(self, count: int) -> Tuple[List[Tuple[str, dict]], bool]:
+        """DRR rounds until `count` records are popped or a round pops none; also reports whether anything was popped."""
+        if not self._ring or time.monotonic() - self._refreshed >= self.refresh:
+            self._refresh()
+        out: List[Tuple[str, dict]] = []
+        progressed = False
+        while self._ring and len(out) < count:
+            now_ms = int(time.time() * 1000)
+            turns: List[Tuple[str, int, bool]] = []
+            budget = count - len(out)
+            for cid in self._ring:
+                if budget <= 0:
+                    break
+                if self.ratelimiter is not None and self.ratelimiter.is_blocked(cid, now_ms):
+                    turns.append((cid, REJECT_CHUNK, True))
+                    continue
+                deficit = self._deficit.get(cid, 0.0)
+                if deficit < 1:  # a new turn; a customer cut short by `budget` keeps spending its last quantum
+                    deficit += self.quantum * self.weights.get(cid, 1.0)
+                    self._deficit[cid] = deficit
+                n = min(int(deficit), budget)
+                if n > 0:
+                    turns.append((cid, n, False))
+                    budget -= n
+            if not turns:
+                continue  # weights below 1/quantum: keep accumulating deficit
+            pipe = self.redis.pipeline(transaction=False)
+            for cid, n, _ in turns:
+                self._pop(keys=[self.sub_key(cid), self.active_key], args=[n, cid], client=pipe)
+            results = pipe.execute()
+
+            before = len(out)
+            for (cid, n, rejected), raws in zip(turns, results):
+                progressed = progressed or bool(raws)
+                if rejected:
+                    if raws and self.on_reject is not None:
+                        self.on_reject(cid, [decode_item(raw) for raw in raws])
+                else:
+                    self._deficit[cid] -= len(raws)
+                    sub = self.sub_key(cid)
+                    out.extend((sub, decode_item(raw)) for raw in raws)
+                # emptied customers leave and forfeit the unused deficit; finished turns go to the back
+                if len(raws) < n:
+                    self._ring.remove(cid)
+                    self._deficit.pop(cid, None)
+                elif rejected or self._deficit.get(cid, 0.0) < 1:
+                    self._ring.remove(cid)
+                    self._ring.append(cid)
+            if len(out) == before:
+                break  # only rejections this round; let the caller decide whether to poll again
+        return out, progressed
+
+    def ack(self, tokens) -> None:
+        pass
+
+    def depth(self) -> int:
+        members = self.redis.smembers(self.active_key)
+        if not members:
+            return 0
+        pipe = self.redis.pipeline(transaction=False)
+        for m in members:
+            pipe.llen(self.sub_key(m.decode() if isinstance(m, bytes) else m))
+        return int(sum(pipe.execute()))
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,65 @@
+from __future__ import annotations
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from email_validator import SPECIAL_USE_DOMAIN_NAMES
+from .config import cfg
+from .validator import validate_record
+
+# Fast path for the common case: plain ASCII dot-atom emails and strict ISO-8601 timestamps.
+# It only ever *accepts*; anything it is not sure about (non-ASCII, punycode, odd lengths,
+# every invalid record) goes to validate_record, so results and error reasons match the
+# full CustomerRecord path exactly.
+
+_ATEXT = r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]"
+_LABEL = r"[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?"
+_EMAIL_RE = re.compile(
+    rf"({_ATEXT}+(?:\.{_ATEXT}+)*)@((?:{_LABEL}\.)+([A-Za-z]{{1,63}}))"
+)
+# "ab--" labels are reserved for IDNA/punycode; let email-validator judge those
+_RESERVED_LABEL_RE = re.compile(r"(?:^|\.)..--")
+_SPECIAL_USE = frozenset(SPECIAL_USE_DOMAIN_NAMES)
+
+_ISO_RE = re.compile(
+    r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)?"
+)
+
+@lru_cache(maxsize=cfg.VALIDATOR_EMAIL_CACHE_SIZE)
+def fast_email(email: str) -> Optional[str]:
+    """Normalized email if the fast path can vouch for it, else None (=> use email-validator)."""
+    if len(email) > 254:
+        return None
+    m = _EMAIL_RE.fullmatch(email)
+    if m is None:
+        return None
+    local, domain, tld = m.groups()
+    if len(local) > 64 or len(domain) > 253:
+        return None
+    domain = domain.lower()
+    if tld.lower() in _SPECIAL_USE or _RESERVED_LABEL_RE.search(domain):
+        return None
+    return f"{local}@{domain}"
+
+def fast_iso(value: str) -> bool:
+    if _ISO_RE.fullmatch(value) is None:
+        return False
+    try:
+        datetime.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+def validate_record_fast(raw: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
+    """Same contract and results as validate_record, without building a CustomerRecord for the common case."""
+    customer_id = raw.get("customerId")
+    name = raw.get("name")
+    email = raw.get("email")
+    created_at = raw.get("createdAt")
+    if (type(customer_id) is str and customer_id
+            and type(name) is str and name.strip()
+            and type(email) is str and type(created_at) is str):
+        normalized = fast_email(email)
+        if normalized is not None and fast_iso(created_at):
+            return True, {"customerId": customer_id, "name": name, "email": normalized, "createdAt": created_at}
+    return validate_record(raw)
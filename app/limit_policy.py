@@ -0,0 +1,222 @@
+"""
+Per-customer rate-limit overrides (tiers), kept in an in-process snapshot that the limiter reads on every decision.
+
+A policy maps customers to a tier or an inline limit; tiers map to "limit/window_sec" (or just "limit", which keeps
+RATE_LIMIT_WINDOW_SEC). Customers that are not listed use RATE_LIMIT_LIMIT / RATE_LIMIT_WINDOW_SEC.
+
+  redis  (RATE_LIMIT_POLICY=redis): one hash at RATE_LIMIT_POLICY_KEY
+           version -> int, bumped on every change (the CLI below does it)
+           tier:<name> -> "1000/60"
+           customer:<id> -> "<tier>" | "20/60"
+  file   (RATE_LIMIT_POLICY=file): JSON at RATE_LIMIT_POLICY_FILE
+           {"version": 3, "tiers": {"gold": "1000/60"}, "customers": {"42": "gold", "7": "20/60"}}
+           (without "version" the file's mtime is used)
+
+A background thread checks the version every RATE_LIMIT_POLICY_REFRESH_MS and reloads only when it changed (and at
+least every RATE_LIMIT_POLICY_TTL_SEC). A failed check keeps the last good snapshot; so does a missing policy file.
+
+    python -m app.limit_policy show
+    python -m app.limit_policy set-tier gold 1000/60
+    python -m app.limit_policy assign 42 gold        # or: assign 7 20/60
+    python -m app.limit_policy unassign 42
+"""
+from __future__ import annotations
+import argparse, json, os, threading, time
+from typing import Any, Dict, List, Optional, Tuple
+from redis import Redis
+from .config import cfg
+from .logger import get_logger
+
+log = get_logger()
+
+POLICY_SOURCES = ("none", "redis", "file")
+
+# (limit, window_ms); window_ms None = the limiter's default window
+Limits = Tuple[int, Optional[int]]
+
+def parse_limits(spec: str) -> Limits:
+    """"1000/60" -> (1000, 60000); "1000" -> (1000, None)."""
+    limit, sep, window = str(spec).strip().partition("/")
+    if int(limit) < 0 or (sep and float(window) <= 0):
+        raise ValueError(f"bad limit spec {spec!r}; expected <limit>[/<window_sec>]")
+    return int(limit), (int(float(window) * 1000) if sep else None)
+
+def resolve(tiers: Dict[str, str], customers: Dict[str, str]) -> Dict[str, Limits]:
+    """Flatten tier references into customer -> (limit, window_ms); bad entries are logged and skipped."""
+    parsed: Dict[str, Limits] = {}
+    for name, spec in tiers.items():
+        try:
+            parsed[name] = parse_limits(spec)
+        except ValueError:
+            log.warning("limit_policy_bad_entry", tier=name, value=spec)
+    out: Dict[str, Limits] = {}
+    for customer_id, ref in customers.items():
+        ref = str(ref).strip()
+        if ref in parsed:
+            out[str(customer_id)] = parsed[ref]
+            continue
+        try:
+            out[str(customer_id)] = parse_limits(ref)
+        except ValueError:
+            log.warning("limit_policy_bad_entry", customerId=customer_id, value=ref)
+    return out
+
+def _text(v: Any) -> str:
+    return v.decode() if isinstance(v, bytes) else str(v)
+
+class LimitPolicy:
+    """
+    Snapshot of per-customer overrides. get() is a single dict lookup (no I/O); the snapshot is swapped whole by
+    reload(), so readers never see a half-loaded policy.
+    """
+    def __init__(self, source: str = "redis", redis: Optional[Redis] = None, key: str = "limits:policy",
+                 path: str = "", refresh_ms: int = 5000, ttl_sec: float = 300):
+        if source not in POLICY_SOURCES or source == "none":
+            raise ValueError(f"unknown limit policy source {source!r}; expected one of {POLICY_SOURCES[1:]}")
+        if source == "redis" and redis is None:
+            raise ValueError("limit policy source 'redis' needs a Redis client")
+        self.source = source
+        self.redis = redis
+        self.key = key
+        self.path = path
+        self.refresh = refresh_ms / 1000.0
+        self.ttl = float(ttl_sec)
+        self.version: Optional[str] = None
+        self.reloads = 0
+        self._limits: Dict[str, Limits] = {}
+        self._seen: Optional[str] = None  # last probed version (file: mtime)
+        self._loaded_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, customer_id: str) -> Optional[Limits]:
+        return self._limits.get(customer_id)
+
+    def __len__(self) -> int:
+        return len(self._limits)
+
+    def snapshot(self) -> Dict[str, Limits]:
+        return dict(self._limits)
+
+    def _read_version(self) -> Optional[str]:
+        if self.source == "redis":
+            v = self.redis.hget(self.key, "version")
+            return _text(v) if v is not None else None
+        try:
+            return f"mtime:{os.stat(self.path).st_mtime_ns}"
+        except FileNotFoundError:
+            return None
+
+    def _load(self) -> Tuple[Optional[str], Dict[str, Limits]]:
+        tiers: Dict[str, str] = {}
+        customers: Dict[str, str] = {}
+        if self.source == "redis":
+            raw = {_text(k): _text(v) for k, v in self.redis.hgetall(self.key).items()}
+            version = raw.pop("version", None)
+            for field, value in raw.items():
+                kind, _, name = field.partition(":")
+                if kind == "tier":
+                    tiers[name] = value
+                elif kind == "customer":
+                    customers[name] = value
+            return version, resolve(tiers, customers)
+        version = self._read_version()
+        # a missing file is a failed reload (FileNotFoundError), not an empty policy: a rename or a
+        # non-atomic deploy must not drop every override
+        with open(self.path, "rb") as f:
+            doc = json.load(f)
+        if "version" in doc:
+            version = str(doc["version"])
+        return version, resolve(doc.get("tiers") or {}, doc.get("customers") or {})
+
+    def reload(self, force: bool = False) -> bool:
+        """Reload if the source's version changed (or the snapshot outlived its TTL); True if the snapshot changed."""
+        # cheap probe first: HGET version / stat(); the whole policy is only read when that moved
+        seen = self._read_version()
+        if not force and seen == self._seen and time.monotonic() - self._loaded_at < self.ttl:
+            return False
+        version, limits = self._load()
+        self._seen = seen
+        self._loaded_at = time.monotonic()
+        if version == self.version and limits == self._limits:
+            return False
+        self._limits, self.version = limits, version
+        self.reloads += 1
+        log.info("limit_policy_loaded", source=self.source, version=version, customers=len(limits))
+        return True
+
+    def start(self) -> "LimitPolicy":
+        """Load once (errors propagate at startup), then keep reloading in a daemon thread."""
+        self.reload(force=True)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._refresher, name="limit-policy", daemon=True)
+            self._thread.start()
+        return self
+
+    def _refresher(self) -> None:
+        while not self._stop.wait(self.refresh):
+            try:
+                self.reload()
+            except Exception as e:
+                log.warning("limit_policy_reload_failed", source=self.source, error=str(e), version=self.version)
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+def make_policy(redis: Optional[Redis]) -> Optional[LimitPolicy]:
+    """Started policy from config, or None when RATE_LIMIT_POLICY=none."""
+    source = cfg.RATE_LIMIT_POLICY
+    if source == "none":
+        return None
+    if source not in POLICY_SOURCES:
+        raise ValueError(f"unknown limit policy source {source!r}; expected one of {POLICY_SOURCES}")
+    return LimitPolicy(source, redis=redis, key=cfg.RATE_LIMIT_POLICY_KEY, path=cfg.RATE_LIMIT_POLICY_FILE,
+                       refresh_ms=cfg.RATE_LIMIT_POLICY_REFRESH_MS, ttl_sec=cfg.RATE_LIMIT_POLICY_TTL_SEC).start()
+
+def _edit(redis: Redis, key: str, field: str, value: Optional[str]) -> int:
+    """Change one field and bump the version in one transaction; returns the new version."""
+    pipe = redis.pipeline(transaction=True)
+    if value is None:
+        pipe.hdel(key, field)
+    else:
+        pipe.hset(key, field, value)
+    pipe.hincrby(key, "version", 1)
+    return int(pipe.execute()[-1])
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--key", default=cfg.RATE_LIMIT_POLICY_KEY)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("show")
+    p = sub.add_parser("set-tier")
+    p.add_argument("tier")
+    p.add_argument("limits", help="<limit>[/<window_sec>]")
+    p = sub.add_parser("assign")
+    p.add_argument("customer_id")
+    p.add_argument("tier_or_limits")
+    p = sub.add_parser("unassign")
+    p.add_argument("customer_id")
+    args = ap.parse_args(argv)
+
+    redis = Redis.from_url(cfg.REDIS_URL, decode_responses=False)
+    if args.cmd == "set-tier":
+        parse_limits(args.limits)
+        version = _edit(redis, args.key, f"tier:{args.tier}", args.limits)
+    elif args.cmd == "assign":
+        version = _edit(redis, args.key, f"customer:{args.customer_id}", args.tier_or_limits)
+    elif args.cmd == "unassign":
+        version = _edit(redis, args.key, f"customer:{args.customer_id}", None)
+    else:
+        policy = LimitPolicy("redis", redis=redis, key=args.key)
+        policy.reload(force=True)
+        out = {"version": policy.version, "customers": {c: list(l) for c, l in policy.snapshot().items()}}
+        print(json.dumps(out, indent=2, sort_keys=True))
+        return out
+    log.info("limit_policy_updated", key=args.key, cmd=args.cmd, version=version)
+    return {"version": version}
+
+if __name__ == "__main__":
+    main()
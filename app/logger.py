@@ -1,8 +1,14 @@
 # app/logger.py
-import logging
+import atexit, json, logging, os, queue, sys, threading
+from typing import Dict, Optional
 import structlog
 from .config import cfg
 
+try:  # optional: ~5-10x faster than the stdlib encoder
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
 _LEVELS = {
     "CRITICAL": logging.CRITICAL,
     "ERROR": logging.ERROR,
@@ -12,20 +18,183 @@ _LEVELS = {
     "NOTSET": logging.NOTSET,
 }
 
-def get_logger():
+_configured = False
+_writer: Optional["_BackgroundWriter"] = None
+
+def parse_sample(spec: str) -> Dict[str, int]:
+    """"ingested=10,duplicate_insert=100" -> {"ingested": 10, "duplicate_insert": 100}; bad entries are ignored."""
+    rates = {}
+    for part in spec.split(","):
+        name, _, n = part.partition("=")
+        try:
+            if name.strip() and int(n) > 1:
+                rates[name.strip()] = int(n)
+        except ValueError:
+            continue
+    return rates
+
+class _Sampler:
+    """Keep 1 in N of the configured events; warnings and errors always pass."""
+    def __init__(self, rates: Dict[str, int]):
+        self.rates = rates
+        self.seen: Dict[str, int] = {}
+
+    def __call__(self, logger, method_name, event_dict):
+        n = self.rates.get(event_dict.get("event"))
+        if n is None or method_name in ("warning", "error", "critical", "exception"):
+            return event_dict
+        seen = self.seen.get(event_dict["event"], 0)
+        self.seen[event_dict["event"]] = seen + 1
+        if seen % n:
+            raise structlog.DropEvent
+        event_dict["sample_rate"] = n  # each kept line stands for n events
+        return event_dict
+
+def _serializer():
+    if orjson is None:
+        return json.dumps
+    return lambda obj, **kw: orjson.dumps(obj, default=kw.get("default")).decode()
+
+class _BackgroundWriter:
+    """
+    Bounded queue drained by one daemon thread that writes lines to stdout in batches.
+    When the queue is full lines are dropped (and counted) rather than blocking the worker.
+    """
+    def __init__(self, maxsize: int, batch: int):
+        self.maxsize = maxsize
+        self.batch = batch
+        self._start()
+
+    def _start(self):
+        self.q: "queue.Queue[Optional[str]]" = queue.Queue(self.maxsize)
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, line: str) -> None:
+        try:
+            self.q.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        q = self.q
+        while True:
+            lines = [q.get()]
+            while len(lines) < self.batch:
+                try:
+                    lines.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            out = [line for line in lines if line is not None]
+            if self.dropped:
+                out.append(json.dumps({"event": "log_dropped", "level": "warning", "count": self.dropped}))
+                self.dropped = 0
+            if out:
+                sys.stdout.write("\n".join(out) + "\n")  # resolved per write so redirects apply
+                sys.stdout.flush()
+            for _ in lines:
+                q.task_done()
+            if stop:
+                return
+
+    def flush(self) -> None:
+        if self.thread.is_alive():
+            self.q.join()
+
+    def close(self) -> None:
+        if self.thread.is_alive():
+            self.q.put(None)
+            self.thread.join(timeout=5)
+
+    def after_fork(self) -> None:
+        # the writer thread does not survive fork(); children get a fresh queue and thread
+        self._start()
+
+class _StdoutLogger:
+    """
+    structlog logger writing each line with one write() call. print() issues the message and the newline
+    separately when stdout is unbuffered (PYTHONUNBUFFERED), so lines from processes sharing the stream
+    (supervisor children) could merge. Reentrant: signal handlers log from the thread they interrupt.
+    """
+    _lock = threading.RLock()
+
+    def msg(self, message: str) -> None:
+        with self._lock:
+            sys.stdout.write(message + "\n")
+            sys.stdout.flush()
+
+    log = debug = info = warning = warn = error = critical = exception = fatal = failure = msg
+
+class _QueueLogger:
+    """structlog logger whose output goes to the background writer."""
+    def __init__(self, writer: _BackgroundWriter):
+        self._put = writer.put
+
+    def msg(self, message: str) -> None:
+        self._put(message)
+
+    log = debug = info = warning = warn = error = critical = exception = fatal = failure = msg
+
+def configure(mode: Optional[str] = None, sample: Optional[str] = None, force: bool = False) -> None:
+    """Configure structlog once per process; later calls are no-ops unless force=True."""
+    global _configured, _writer
+    if _configured and not force:
+        return
+    mode = mode or cfg.LOG_MODE
     min_level = _LEVELS.get(cfg.LOG_LEVEL.upper(), logging.INFO)
 
     # Optional: also set stdlib root logger to the same level so 3rd-party libs match
     logging.basicConfig(level=min_level)
 
+    processors = []
+    rates = parse_sample(cfg.LOG_SAMPLE if sample is None else sample)
+    if rates:
+        processors.append(_Sampler(rates))
+    processors += [
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso", utc=True),
+        structlog.processors.JSONRenderer(serializer=_serializer()),
+    ]
+
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+    if mode == "async":
+        _writer = _BackgroundWriter(cfg.LOG_QUEUE_SIZE, cfg.LOG_BATCH_SIZE)
+        shared = _QueueLogger(_writer)
+        logger_factory = lambda *args: shared
+    elif mode == "sync":
+        shared = _StdoutLogger()
+        logger_factory = lambda *args: shared
+    else:
+        raise ValueError(f"unknown LOG_MODE {mode!r}")
+
     structlog.configure(
-        processors=[
-            structlog.processors.add_log_level,
-            structlog.processors.TimeStamper(fmt="iso", utc=True),
-            structlog.processors.JSONRenderer(),
-        ],
+        processors=processors,
         # filter at the wrapper level using stdlib numeric level
         wrapper_class=structlog.make_filtering_bound_logger(min_level),
-        logger_factory=structlog.PrintLoggerFactory(),  # print to stdout
+        logger_factory=logger_factory,
     )
+    _configured = True
+
+def flush() -> None:
+    """Block until queued log lines are written (no-op in sync mode)."""
+    if _writer is not None:
+        _writer.flush()
+
+def _after_fork_in_child() -> None:
+    if _writer is not None:
+        _writer.after_fork()
+
+def _close_at_exit() -> None:
+    if _writer is not None:
+        _writer.close()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(_close_at_exit)
+
+def get_logger():
+    configure()
     return structlog.get_logger()
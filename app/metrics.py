@@ -0,0 +1,236 @@
+from __future__ import annotations
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Minimal Prometheus-style metrics: fixed-bucket histograms, counters and gauges rendered in the
+# text exposition format. Counter and histogram children take a small lock per update: besides the
+# worker loop / event loop, the bulk writer's age-flush thread and the async engine's to_thread calls
+# record too, and an unlocked += can lose updates. The lock is uncontended almost always.
+
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0) -> None:
+        with self._lock:
+            self.value += n
+
+class Counter:
+    """Counter incremented in place, or read from a callback over a running total at scrape time."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), fn: Optional[Callable[[], float]] = None):
+        self.name, self.help, self.labelnames, self.fn = name, help, tuple(labelnames), fn
+        self._children: Dict[Tuple[str, ...], _CounterChild] = {}
+
+    def labels(self, *values: str) -> _CounterChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _CounterChild()
+        return child
+
+    def inc(self, n: float = 1.0) -> None:
+        self.labels().inc(n)
+
+    def render(self) -> List[str]:
+        if self.fn is not None:
+            try:
+                return [f"{self.name} {self.fn()}"]
+            except Exception:
+                return []
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {c.value}" for k, c in self._children.items()]
+
+class Gauge:
+    """Gauge whose value is set directly or read from a callback at scrape time (zero per-message cost)."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Optional[Callable[[], float]] = None):
+        self.name, self.help, self.fn = name, help, fn
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> List[str]:
+        value = self.value
+        if self.fn is not None:
+            try:
+                value = self.fn()
+            except Exception:
+                return []  # e.g. Redis unreachable during scrape; skip the sample
+        return [f"{self.name} {value}"]
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        """(counts, sum, count) from one moment, so a scrape never sees count out of step with the buckets."""
+        with self._lock:
+            return list(self.counts), self.sum, self.count
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = _HistogramChild(self.buckets)
+        return child
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def render(self) -> List[str]:
+        lines = []
+        for k, c in list(self._children.items()):
+            counts, total, count = c.snapshot()
+            cumulative = 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], counts):
+                cumulative += n
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {total}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {count}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = (),
+                fn: Optional[Callable[[], float]] = None) -> Counter:
+        return self.register(Counter(name, help, labelnames, fn))
+
+    def gauge(self, name: str, help: str, fn: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, help, fn))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.append(f"# HELP {m.name} {m.help}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+def start_http_server(registry: Registry, port: int, addr: str = "0.0.0.0",
+                      ready: Optional[Callable[[], bool]] = None) -> ThreadingHTTPServer:
+    """Serve GET /metrics, and GET /ready (200 once ready() is true, else 503), from a daemon thread."""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            if path == "/ready" and ready is not None:
+                ok = ready()
+                body = b"ready\n" if ok else b"not ready\n"
+                self.send_response(200 if ok else 503)
+                self.send_header("Content-Type", "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            if path != "/metrics":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):  # keep stdout for structured logs only
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+OUTCOMES = ("ingested", "validation_failed", "parse_error", "rate_limited", "deferred", "retry_scheduled",
+            "dead_lettered")
+STAGES = ("pop", "validate", "rate_limit", "insert")
+
+class WorkerMetrics:
+    """The worker's instruments, with children resolved up front so the hot path is a method call."""
+    def __init__(self, registry: Optional[Registry] = None):
+        self.registry = registry or Registry()
+        records = self.registry.counter("ingest_records_total", "Messages handled, by outcome", ["outcome"])
+        stage = self.registry.histogram("ingest_stage_seconds", "Time per stage call (pop wait, validation, "
+                                        "rate-limit Lua call, Mongo write)", ["stage"])
+        self._outcomes = {name: records.labels(name) for name in OUTCOMES}
+        self._stages = {name: stage.labels(name) for name in STAGES}
+
+    def outcome(self, name: str, n: int = 1) -> None:
+        self._outcomes[name].inc(n)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        self._stages[stage].observe(seconds)
+
+    def stage_totals(self, stage: str) -> Tuple[float, int]:
+        """(seconds, calls) observed for `stage` so far; deltas between two reads give a windowed mean."""
+        _, seconds, calls = self._stages[stage].snapshot()
+        return seconds, calls
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        self.registry.gauge(name, help, fn)
+
+    def counter(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        self.registry.counter(name, help, fn=fn)
+
+class NullMetrics:
+    """Drop-in for WorkerMetrics when METRICS_ENABLED is off."""
+    registry = None
+
+    def outcome(self, name: str, n: int = 1) -> None:
+        pass
+
+    def observe(self, stage: str, seconds: float) -> None:
+        pass
+
+    def stage_totals(self, stage: str) -> Tuple[float, int]:
+        return 0.0, 0
+
+    def gauge(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        pass
+
+    def counter(self, name: str, help: str, fn: Callable[[], float]) -> None:
+        pass
@@ -0,0 +1,51 @@
+"""
+Move documents with legacy hex-string _ids to binary _ids (MONGO_ID_FORMAT=binary).
+
+Each batch inserts the binary-id copies, ignoring copies that already exist, then deletes the hex originals.
+Re-running after an interruption is safe. Until it finishes, a replay of a not-yet-migrated record is written
+again under its binary id; run it right after switching the workers to binary ids.
+
+    python -m app.migrate_ids [--batch-size 1000] [--drop-legacy-index]
+"""
+from __future__ import annotations
+import argparse
+from typing import List, Optional
+from pymongo.errors import BulkWriteError
+from .config import cfg
+from .db import MongoDAO, binary_id
+from .logger import get_logger
+
+log = get_logger()
+
+def migrate(dao: MongoDAO, batch_size: int = 1000, drop_legacy_index: bool = False) -> int:
+    moved = 0
+    while True:
+        docs = list(dao.col.find({"_id": {"$type": "string"}}).limit(batch_size))
+        if not docs:
+            break
+        try:
+            dao.col.insert_many([dict(doc, _id=binary_id(doc)) for doc in docs], ordered=False)
+        except BulkWriteError as e:
+            # copies left by an interrupted run are fine; anything else stops before deleting originals
+            if any(err.get("code") != 11000 for err in e.details.get("writeErrors", [])):
+                raise
+        dao.col.delete_many({"_id": {"$in": [doc["_id"] for doc in docs]}})
+        moved += len(docs)
+        log.info("ids_migrated", batch=len(docs), total=moved)
+    if drop_legacy_index and "idx_customerId" in dao.col.index_information():
+        dao.col.drop_index("idx_customerId")
+        log.info("index_dropped", index="idx_customerId")
+    return moved
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--drop-legacy-index", action="store_true",
+                    help="drop idx_customerId once idx_customerId_createdAt covers it")
+    args = ap.parse_args(argv)
+    dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION, id_format="binary",
+                   index_layout="compound" if args.drop_legacy_index else None)
+    return migrate(dao, args.batch_size, args.drop_legacy_index)
+
+if __name__ == "__main__":
+    main()
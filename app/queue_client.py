@@ -1,24 +1,119 @@
 from __future__ import annotations
-import json
-from typing import Optional, Tuple
+import asyncio
+from typing import Any, List, Optional, Tuple
 from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from .codec import decode as decode_item, encode
 from .config import cfg
 
 class QueueClient:
+    """
+    Plain list queue (at-most-once). pop()/pop_many() return (key, item); ack() is a no-op
+    so workers can treat every backend the same way.
+    """
     def __init__(self, redis: Redis, key: str):
         self.redis = redis
         self.key = key
 
     def push(self, item: dict) -> None:
-        self.redis.rpush(self.key, json.dumps(item))
+        self.redis.rpush(self.key, encode(item))
 
     def pop(self, timeout: int) -> Optional[Tuple[str, dict]]:
         res = self.redis.blpop(self.key, timeout=timeout)
         if not res:
             return None
         _, raw = res
-        try:
-            return self.key, json.loads(raw.decode("utf-8"))
-        except Exception:
-            # poison pill protection or corrupted payload
-            return self.key, {"__raw__": raw.decode("utf-8"), "__parse_error__": True}
+        return self.key, decode_item(raw)
+
+    def pop_many(self, count: int, timeout: int) -> List[Tuple[str, dict]]:
+        # BLMPOP (Redis >= 7) blocks like BLPOP but drains up to `count` items in one round trip
+        res = self.redis.blmpop(timeout, 1, self.key, direction="LEFT", count=max(1, int(count)))
+        if not res:
+            return []
+        _, raws = res
+        return [(self.key, decode_item(raw)) for raw in raws]
+
+    def push_many(self, items) -> None:
+        if items:
+            self.redis.rpush(self.key, *[encode(item) for item in items])
+
+    def ack(self, tokens) -> None:
+        pass
+
+    def depth(self) -> int:
+        return int(self.redis.llen(self.key))
+
+    def close(self) -> None:
+        pass
+
+class AsyncQueueClient:
+    """QueueClient for the asyncio engine (redis.asyncio)."""
+    def __init__(self, redis: AsyncRedis, key: str):
+        self.redis = redis
+        self.key = key
+
+    async def push(self, item: dict) -> None:
+        await self.redis.rpush(self.key, encode(item))
+
+    async def depth(self) -> int:
+        return int(await self.redis.llen(self.key))
+
+    async def pop_many(self, count: int, timeout: int) -> List[Tuple[str, dict]]:
+        res = await self.redis.blmpop(timeout, 1, self.key, direction="LEFT", count=max(1, int(count)))
+        if not res:
+            return []
+        _, raws = res
+        return [(self.key, decode_item(raw)) for raw in raws]
+
+    async def ack(self, tokens) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+class AsyncThreadedQueue:
+    """Runs a blocking queue client's calls in threads, for the asyncio engine."""
+    def __init__(self, queue):
+        self.queue = queue
+        self.key = queue.key
+
+    async def push(self, item: dict) -> None:
+        await asyncio.to_thread(self.queue.push, item)
+
+    async def pop_many(self, count: int, timeout: int) -> List[Tuple[Any, dict]]:
+        return await asyncio.to_thread(self.queue.pop_many, count, timeout)
+
+    async def ack(self, tokens) -> None:
+        await asyncio.to_thread(self.queue.ack, tokens)
+
+    async def depth(self) -> int:
+        return await asyncio.to_thread(self.queue.depth)
+
+    async def close(self) -> None:
+        self.queue.close()
+
+def make_queue(redis: Redis, key: str, backend: Optional[str] = None, ratelimiter=None, on_reject=None):
+    """
+    Build the queue client selected by QUEUE_BACKEND (list | reliable | streams | fair).
+    All of them offer push/push_many/pop/pop_many/ack/depth/close.
+    ratelimiter/on_reject are only used by the fair backend (pre-pop rate-limit check).
+    """
+    backend = backend or cfg.QUEUE_BACKEND
+    if backend == "list":
+        return QueueClient(redis, key)
+    if backend == "reliable":
+        from .reliable_queue import ReliableQueueClient
+        return ReliableQueueClient(redis, key, visibility_timeout_sec=cfg.QUEUE_VISIBILITY_TIMEOUT_SEC)
+    if backend == "streams":
+        from .stream_queue import StreamQueueClient
+        return StreamQueueClient(
+            redis, key, group=cfg.QUEUE_STREAM_GROUP, shards=cfg.QUEUE_STREAM_SHARDS,
+            visibility_timeout_sec=cfg.QUEUE_VISIBILITY_TIMEOUT_SEC, maxlen=cfg.QUEUE_STREAM_MAXLEN,
+        )
+    if backend == "fair":
+        from .fair_queue import FairQueueClient, parse_weights
+        return FairQueueClient(
+            redis, key, weights=parse_weights(cfg.QUEUE_FAIR_WEIGHTS), quantum=cfg.QUEUE_FAIR_QUANTUM,
+            ratelimiter=ratelimiter, on_reject=on_reject,
+        )
+    raise ValueError(f"unknown queue backend: {backend!r}")
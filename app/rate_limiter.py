@@ -1,7 +1,14 @@
 from __future__ import annotations
+import itertools
+import os
 import time
+from collections import defaultdict
 from redis import Redis
-from typing import Optional
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
+from redis.cluster import RedisCluster
+from redis.crc import key_slot
+from typing import Dict, List, Optional, Sequence, Tuple
+from .cache import TTLCache
 
 # Atomic sliding-window limiter using Redis ZSET + EXPIRE via Lua.
 RATE_LIMIT_LUA = """
@@ -9,41 +16,380 @@ RATE_LIMIT_LUA = """
 -- ARGV[1] = now_ms
 -- ARGV[2] = window_ms
 -- ARGV[3] = limit
+-- ARGV[4] = member (optional; unique per request so same-ms requests don't collide)
 -- Steps:
 -- 1) Remove timestamps outside window
 -- 2) Count remaining
--- 3) If < limit: add now_ms, set expire, return 1 else return 0
+-- 3) If < limit: add now_ms, set expire, return {1, 0}
+--    else return {0, retry_at_ms} (earliest time a slot frees up)
 local key       = KEYS[1]
 local now_ms    = tonumber(ARGV[1])
 local window_ms = tonumber(ARGV[2])
 local limit     = tonumber(ARGV[3])
+local member    = ARGV[4] or tostring(now_ms)
 
 redis.call('ZREMRANGEBYSCORE', key, 0, now_ms - window_ms)
 local count = redis.call('ZCARD', key)
 if count < limit then
-  redis.call('ZADD', key, now_ms, tostring(now_ms))
+  redis.call('ZADD', key, now_ms, member)
   -- expire a bit beyond window to avoid leaks
   redis.call('PEXPIRE', key, window_ms + 2000)
-  return 1
+  return {1, 0}
 else
-  return 0
+  -- a slot frees once the (count - limit + 1)th oldest entry leaves the window
+  local oldest = redis.call('ZRANGE', key, count - limit, count - limit, 'WITHSCORES')
+  if oldest[2] == nil then
+    return {0, now_ms + window_ms}
+  end
+  return {0, tonumber(oldest[2]) + window_ms}
 end
 """
 
+# Same sliding-window rules as RATE_LIMIT_LUA, for many keys in one atomic call.
+# Each key carries its own limit/window (per-customer policy overrides).
+RATE_LIMIT_MANY_LUA = """
+-- KEYS[1..k] = zset keys (distinct)
+-- ARGV[1] = member prefix (unique per call)
+-- ARGV[2] = k
+-- ARGV[3..2+2k] = (limit, window_ms) pairs, one per key
+-- ARGV[3+2k..] = (key_index, now_ms) pairs, one per request, in arrival order
+-- Returns {decisions, retry_at}: one 1/0 and one retry_at_ms (0 when allowed) per request.
+local prefix = ARGV[1]
+local k      = tonumber(ARGV[2])
+
+local counts = {}
+local pruned_at = {}
+local last_ms = {}
+local out = {}
+local retry = {}
+local n = 0
+for i = 3 + 2 * k, #ARGV, 2 do
+  local idx       = tonumber(ARGV[i])
+  local now_ms    = tonumber(ARGV[i + 1])
+  local key       = KEYS[idx]
+  local limit     = tonumber(ARGV[1 + 2 * idx])
+  local window_ms = tonumber(ARGV[2 + 2 * idx])
+  -- prune/count once per key per distinct timestamp
+  if pruned_at[idx] ~= now_ms then
+    redis.call('ZREMRANGEBYSCORE', key, 0, now_ms - window_ms)
+    counts[idx] = redis.call('ZCARD', key)
+    pruned_at[idx] = now_ms
+  end
+  n = n + 1
+  if counts[idx] < limit then
+    redis.call('ZADD', key, now_ms, prefix .. ':' .. n)
+    counts[idx] = counts[idx] + 1
+    if (last_ms[idx] or 0) < now_ms then
+      last_ms[idx] = now_ms
+    end
+    out[n] = 1
+    retry[n] = 0
+  else
+    out[n] = 0
+    local r = counts[idx] - limit
+    local oldest = redis.call('ZRANGE', key, r, r, 'WITHSCORES')
+    if oldest[2] == nil then
+      retry[n] = now_ms + window_ms
+    else
+      retry[n] = tonumber(oldest[2]) + window_ms
+    end
+  end
+end
+-- expire a bit beyond window to avoid leaks
+for idx, _ in pairs(last_ms) do
+  redis.call('PEXPIRE', KEYS[idx], tonumber(ARGV[2 + 2 * idx]) + 2000)
+end
+return {out, retry}
+"""
+
+# Sliding-window *counter*: O(1) memory per customer.
+# Each key is a small hash {w: current window index, c: count in window w, p: count in window w-1,
+# m: window_ms the index is counted in}.
+# The previous window's count is weighted by how much of it still overlaps the sliding window:
+#   estimate = p * (1 - elapsed_fraction_of_w) + c
+# Same ARGV layout as RATE_LIMIT_MANY_LUA (ARGV[1] is unused).
+SLIDING_COUNTER_MANY_LUA = """
+-- KEYS[1..k] = hash keys (distinct)
+-- ARGV[1] = unused
+-- ARGV[2] = k
+-- ARGV[3..2+2k] = (limit, window_ms) pairs, one per key
+-- ARGV[3+2k..] = (key_index, now_ms) pairs, one per request, in arrival order
+-- Returns {decisions, retry_at}: one 1/0 and one retry_at_ms (0 when allowed) per request.
+local k = tonumber(ARGV[2])
+
+local state = {}
+local out = {}
+local retry = {}
+local n = 0
+for i = 3 + 2 * k, #ARGV, 2 do
+  local idx       = tonumber(ARGV[i])
+  local now_ms    = tonumber(ARGV[i + 1])
+  local limit     = tonumber(ARGV[1 + 2 * idx])
+  local window_ms = tonumber(ARGV[2 + 2 * idx])
+  local st = state[idx]
+  if not st then
+    local h = redis.call('HMGET', KEYS[idx], 'w', 'c', 'p', 'm')
+    st = {w = tonumber(h[1]), c = tonumber(h[2]) or 0, p = tonumber(h[3]) or 0, m = tonumber(h[4]) or window_ms}
+    state[idx] = st
+    if st.w ~= nil and st.m ~= window_ms then
+      -- the customer's window changed: restart the index, carrying the last count over as the previous
+      -- window while it is recent (approximate for one window, then exact again)
+      if now_ms < (st.w + 1) * st.m + window_ms then
+        st.p = st.c
+      else
+        st.p = 0
+      end
+      st.c = 0
+      st.w = math.floor(now_ms / window_ms)
+    end
+    st.m = window_ms
+  end
+  local win = math.floor(now_ms / window_ms)
+  if st.w == nil then
+    st.w = win
+  elseif win == st.w + 1 then
+    st.p = st.c
+    st.c = 0
+    st.w = win
+  elseif win > st.w + 1 then
+    st.p = 0
+    st.c = 0
+    st.w = win
+  end
+  -- a request older than the stored window (clock skew) counts against the stored window
+  local elapsed = (now_ms - st.w * window_ms) / window_ms
+  if elapsed < 0 then elapsed = 0 end
+  if elapsed > 1 then elapsed = 1 end
+  n = n + 1
+  if st.p * (1 - elapsed) + st.c < limit then
+    st.c = st.c + 1
+    out[n] = 1
+    retry[n] = 0
+  else
+    out[n] = 0
+    local window_end = (st.w + 1) * window_ms
+    if st.c >= limit or st.p == 0 then
+      -- lower bound: nothing can free up before the current window ends
+      retry[n] = window_end
+    else
+      -- previous window's weight decays enough once elapsed > 1 - (limit - c) / p
+      retry[n] = math.floor(st.w * window_ms + window_ms * (1 - (limit - st.c) / st.p))
+    end
+  end
+end
+for idx, st in pairs(state) do
+  redis.call('HSET', KEYS[idx], 'w', st.w, 'c', st.c, 'p', st.p, 'm', st.m)
+  -- the previous window is still read during the current one
+  redis.call('PEXPIRE', KEYS[idx], 2 * st.m + 2000)
+end
+return {out, retry}
+"""
+
+ALGORITHMS = ("zset", "counter")
+
 class RateLimiter:
-    def __init__(self, redis: Redis, limit: int, window_sec: int, prefix: str = "rate"):
+    def __init__(
+        self,
+        redis: Redis,
+        limit: int,
+        window_sec: int,
+        prefix: str = "rate",
+        algorithm: str = "zset",
+        local_cache_size: int = 0,
+        local_cache_ttl_ms: int = 1000,
+        local_cache_accuracy_ms: int = 0,
+        policy=None,
+    ):
+        """
+        algorithm:
+          "zset"    -> exact sliding log (one ZSET member per allowed request)
+          "counter" -> approximate sliding-window counter (O(1) memory per customer)
+        local_cache_size > 0 enables an in-process LRU of blocked customers:
+          once the script reports a full window, further requests for that customer are
+          rejected locally until the reported free-up time minus local_cache_accuracy_ms
+          (slack for clock skew between workers). Entries live at most local_cache_ttl_ms,
+          which bounds how stale a local rejection can be (e.g. after a limit change).
+        policy: optional LimitPolicy of per-customer (limit, window) overrides; `limit`/`window_sec` apply to
+          everyone else. The effective values travel in the same script call. When the policy's version changes
+          the local blocked cache is cleared, so a raised limit takes effect at once.
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown rate limit algorithm: {algorithm!r}")
         self.redis = redis
         self.limit = int(limit)
         self.window_ms = int(window_sec * 1000)
         self.prefix = prefix
+        self.algorithm = algorithm
         self._lua = self.redis.register_script(RATE_LIMIT_LUA)
+        self._lua_many = self.redis.register_script(
+            RATE_LIMIT_MANY_LUA if algorithm == "zset" else SLIDING_COUNTER_MANY_LUA
+        )
+        # on Redis Cluster a script may only touch keys of one hash slot
+        self.cluster = isinstance(self.redis, (RedisCluster, AsyncRedisCluster))
+        # ZSET members must be unique per request, across processes too
+        self._member_prefix = os.urandom(4).hex()
+        self._seq = itertools.count()
+        self.local_cache_accuracy_ms = int(local_cache_accuracy_ms)
+        self.local_cache: Optional[TTLCache] = (
+            TTLCache(local_cache_size, local_cache_ttl_ms / 1000.0) if local_cache_size > 0 else None
+        )
+        self.policy = policy
+        self._policy_version = policy.version if policy is not None else None
 
     def key(self, customer_id: str) -> str:
+        if self.algorithm == "counter":
+            # different Redis type; keep it apart from ZSET keys during a switch-over
+            return f"{self.prefix}:swc:{customer_id}"
         return f"{self.prefix}:{customer_id}"
 
+    def limits(self, customer_id: str) -> Tuple[int, int]:
+        """Effective (limit, window_ms) for a customer: its policy override, else the limiter's defaults."""
+        override = self.policy.get(customer_id) if self.policy is not None else None
+        if override is None:
+            return self.limit, self.window_ms
+        limit, window_ms = override
+        return limit, window_ms if window_ms is not None else self.window_ms
+
+    def _check_policy(self) -> None:
+        # blocks were decided under the old limits
+        if self.policy is not None and self.policy.version != self._policy_version:
+            self._policy_version = self.policy.version
+            if self.local_cache is not None:
+                self.local_cache.clear()
+
+    def _member(self, now_ms: int) -> str:
+        return f"{now_ms}:{self._member_prefix}:{next(self._seq)}"
+
+    def _blocked_until(self, customer_id: str, now_ms: int) -> int:
+        """Cached free-up time (ms) if the local cache knows this customer is blocked at now_ms, else 0."""
+        if self.local_cache is None:
+            return 0
+        blocked_until = self.local_cache.get(customer_id, count=False)
+        # a hit is a local rejection; an entry whose block has passed goes to Redis like no entry
+        if blocked_until is not None and now_ms < blocked_until:
+            self.local_cache.hits += 1
+            return blocked_until
+        self.local_cache.misses += 1
+        return 0
+
+    def _blocked_locally(self, customer_id: str, now_ms: int) -> bool:
+        return self._blocked_until(customer_id, now_ms) > 0
+
+    def is_blocked(self, customer_id: str, now_ms: Optional[int] = None) -> bool:
+        """True if the local cache already knows this customer is over its limit (no Redis call)."""
+        return self._blocked_locally(customer_id, now_ms if now_ms is not None else int(time.time() * 1000))
+
+    def blocked_until(self, customer_id: str, now_ms: Optional[int] = None) -> int:
+        """is_blocked with the cached free-up time (ms); 0 when not known to be blocked."""
+        return self._blocked_until(customer_id, now_ms if now_ms is not None else int(time.time() * 1000))
+
+    def _remember(self, customer_id: str, allowed: bool, retry_at_ms: int) -> None:
+        if self.local_cache is None:
+            return
+        if allowed:
+            self.local_cache.pop(customer_id)
+        else:
+            self.local_cache.set(customer_id, retry_at_ms - self.local_cache_accuracy_ms)
+
+    def cache_stats(self) -> Dict[str, int]:
+        if self.local_cache is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return self.local_cache.stats()
+
     def allow(self, customer_id: str, now_ms: Optional[int] = None) -> bool:
+        return self.check(customer_id, now_ms)[0]
+
+    def check(self, customer_id: str, now_ms: Optional[int] = None) -> Tuple[bool, int]:
+        """allow() plus retry_at_ms: when a slot frees up for a rejected request (0 when allowed or unknown)."""
         if not customer_id:
-            return False
+            return False, 0
         now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
-        res = self._lua(keys=[self.key(customer_id)], args=[now_ms, self.window_ms, self.limit])
-        return bool(int(res))
+        if self.algorithm == "counter":
+            return self.check_many([(customer_id, now_ms)])[0]
+        self._check_policy()
+        blocked_until = self._blocked_until(customer_id, now_ms)
+        if blocked_until:
+            return False, blocked_until
+        limit, window_ms = self.limits(customer_id)
+        allowed, retry_at_ms = self._lua(
+            keys=[self.key(customer_id)], args=[now_ms, window_ms, limit, self._member(now_ms)]
+        )
+        self._remember(customer_id, bool(int(allowed)), int(retry_at_ms))
+        return bool(int(allowed)), int(retry_at_ms)
+
+    def allow_many(self, requests: Sequence[Tuple[str, Optional[int]]]) -> List[bool]:
+        """
+        Decide a batch of (customer_id, now_ms) requests in one EVALSHA
+        (one per hash slot on Redis Cluster). Decisions are applied in the given (arrival) order.
+        """
+        return [allowed for allowed, _ in self.check_many(requests)]
+
+    def check_many(self, requests: Sequence[Tuple[str, Optional[int]]]) -> List[Tuple[bool, int]]:
+        """allow_many with (allowed, retry_at_ms) per request."""
+        requests, results, calls = self._plan(requests)
+        for keys, args, positions in calls:
+            self._apply(requests, results, positions, self._lua_many(keys=keys, args=args))
+        return results
+
+    async def allow_many_async(self, requests: Sequence[Tuple[str, Optional[int]]]) -> List[bool]:
+        """allow_many for a limiter built on a redis.asyncio client."""
+        return [allowed for allowed, _ in await self.check_many_async(requests)]
+
+    async def check_many_async(self, requests: Sequence[Tuple[str, Optional[int]]]) -> List[Tuple[bool, int]]:
+        requests, results, calls = self._plan(requests)
+        for keys, args, positions in calls:
+            self._apply(requests, results, positions, await self._lua_many(keys=keys, args=args))
+        return results
+
+    def _plan(self, requests: Sequence[Tuple[str, Optional[int]]]):
+        """
+        Split a batch into script calls: returns (requests with now_ms filled in, results, calls)
+        where calls is a list of (keys, args, request positions).
+        """
+        self._check_policy()
+        default_now = int(time.time() * 1000)
+        requests = [(customer_id, now_ms if now_ms is not None else default_now) for customer_id, now_ms in requests]
+        results: List[Tuple[bool, int]] = [(False, 0)] * len(requests)
+
+        # group request positions by key, keeping arrival order;
+        # customers known to be blocked are rejected without a round trip
+        by_key: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        limits: Dict[str, Tuple[int, int]] = {}
+        for i, (customer_id, now_ms) in enumerate(requests):
+            if not customer_id:
+                continue
+            blocked_until = self._blocked_until(customer_id, now_ms)
+            if blocked_until:
+                results[i] = (False, blocked_until)
+                continue
+            key = self.key(customer_id)
+            if key not in limits:
+                limits[key] = self.limits(customer_id)
+            by_key[key].append((i, now_ms))
+        if not by_key:
+            return requests, results, []
+
+        if self.cluster:
+            groups: Dict[int, List[str]] = defaultdict(list)
+            for key in by_key:
+                groups[key_slot(key.encode("utf-8"))].append(key)
+            key_groups = list(groups.values())
+        else:
+            key_groups = [list(by_key)]
+
+        calls = []
+        for keys in key_groups:
+            ordered = sorted((i, idx, now_ms) for idx, key in enumerate(keys, start=1) for i, now_ms in by_key[key])
+            args: List = [self._member(ordered[0][2]), len(keys)]
+            for key in keys:
+                args.extend(limits[key])
+            for _, idx, now_ms in ordered:
+                args.extend((idx, now_ms))
+            calls.append((keys, args, [i for i, _, _ in ordered]))
+        return requests, results, calls
+
+    def _apply(self, requests, results: List[Tuple[bool, int]], positions: List[int], res) -> None:
+        decisions, retry_at = res
+        for i, allowed, retry_at_ms in zip(positions, decisions, retry_at):
+            results[i] = (bool(int(allowed)), int(retry_at_ms))
+            self._remember(requests[i][0], results[i][0], results[i][1])
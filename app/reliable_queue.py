@@ -0,0 +1,190 @@
+from __future__ import annotations
+import os, socket, threading, time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+from redis import Redis
+from .codec import encode
+from .logger import get_logger
+from .queue_client import decode_item
+
+log = get_logger()
+
+# Move up to ARGV[1] items queue -> processing list and refresh the consumer heartbeat, atomically.
+MOVE_MANY_LUA = """
+-- KEYS[1] = queue, KEYS[2] = processing list, KEYS[3] = heartbeat key
+-- ARGV[1] = count, ARGV[2] = visibility_ms
+local out = {}
+for i = 1, tonumber(ARGV[1]) do
+  local v = redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT')
+  if not v then break end
+  out[#out + 1] = v
+end
+redis.call('SET', KEYS[3], '1', 'PX', ARGV[2])
+return out
+"""
+
+# Hand a dead consumer's processing list back to the head of the queue (original order).
+RECLAIM_CONSUMER_LUA = """
+-- KEYS[1] = processing list, KEYS[2] = queue, KEYS[3] = heartbeat key, KEYS[4] = consumers set
+-- ARGV[1] = consumer id
+if redis.call('EXISTS', KEYS[3]) == 1 then
+  return -1  -- came back to life
+end
+local n = 0
+while redis.call('RPOPLPUSH', KEYS[1], KEYS[2]) do
+  n = n + 1
+end
+redis.call('SREM', KEYS[4], ARGV[1])
+return n
+"""
+
+# Put specific in-flight entries back at the head of the queue.
+REQUEUE_LUA = """
+-- KEYS[1] = processing list, KEYS[2] = queue
+-- ARGV = raw entries
+local n = 0
+for i = 1, #ARGV do
+  if redis.call('LREM', KEYS[1], 1, ARGV[i]) == 1 then
+    redis.call('LPUSH', KEYS[2], ARGV[i])
+    n = n + 1
+  end
+end
+return n
+"""
+
+class ReliableQueueClient:
+    """
+    At-least-once list queue. Popped entries are moved into a per-consumer processing list
+    and only removed by ack() (after the Mongo write). A background reclaimer:
+      - refreshes this consumer's heartbeat,
+      - re-queues this consumer's entries left unacked longer than the visibility timeout,
+      - re-queues the whole processing list of consumers whose heartbeat expired (crashed workers).
+    pop()/pop_many() return (token, item); the token is the raw entry to pass to ack().
+    """
+    def __init__(self, redis: Redis, key: str, visibility_timeout_sec: float = 60,
+                 consumer_id: Optional[str] = None):
+        self.redis = redis
+        self.key = key
+        self.visibility_ms = max(1, int(visibility_timeout_sec * 1000))
+        self.consumer_id = consumer_id or f"{socket.gethostname()}:{os.getpid()}:{os.urandom(3).hex()}"
+        self.consumers_key = f"{key}:consumers"
+        self.processing_key = self.processing_key_for(self.consumer_id)
+        self.heartbeat_key = self.heartbeat_key_for(self.consumer_id)
+        self._move_many = self.redis.register_script(MOVE_MANY_LUA)
+        self._reclaim_consumer = self.redis.register_script(RECLAIM_CONSUMER_LUA)
+        self._requeue = self.redis.register_script(REQUEUE_LUA)
+        # raw -> pop times (monotonic) of unacked entries held by this consumer
+        self._inflight: Dict[bytes, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reclaimer: Optional[threading.Thread] = None
+
+    def processing_key_for(self, consumer_id: str) -> str:
+        return f"{self.key}:processing:{consumer_id}"
+
+    def heartbeat_key_for(self, consumer_id: str) -> str:
+        return f"{self.key}:processing:{consumer_id}:hb"
+
+    def push(self, item: dict) -> None:
+        self.redis.rpush(self.key, encode(item))
+
+    def push_many(self, items: Sequence[dict]) -> None:
+        if items:
+            self.redis.rpush(self.key, *[encode(item) for item in items])
+
+    def depth(self) -> int:
+        return int(self.redis.llen(self.key))
+
+    def _track(self, raws: Sequence[bytes]) -> List[Tuple[bytes, dict]]:
+        if self._reclaimer is None:
+            self._register()
+        now = time.monotonic()
+        with self._lock:
+            for raw in raws:
+                self._inflight[raw].append(now)
+        return [(raw, decode_item(raw)) for raw in raws]
+
+    def pop(self, timeout: int) -> Optional[Tuple[bytes, dict]]:
+        popped = self.pop_many(1, timeout)
+        return popped[0] if popped else None
+
+    def pop_many(self, count: int, timeout: int) -> List[Tuple[bytes, dict]]:
+        # non-blocking batch move first; only block (BLMOVE) when the queue is empty
+        raws = self._move_many(keys=[self.key, self.processing_key, self.heartbeat_key],
+                               args=[max(1, int(count)), self.visibility_ms])
+        if not raws:
+            raw = self.redis.blmove(self.key, self.processing_key, timeout, "LEFT", "RIGHT")
+            raws = [raw] if raw is not None else []
+        return self._track(raws)
+
+    def ack(self, tokens: Sequence[bytes]) -> None:
+        """Remove handled entries from the processing list in one round trip."""
+        if not tokens:
+            return
+        pipe = self.redis.pipeline(transaction=False)
+        for raw in tokens:
+            pipe.lrem(self.processing_key, 1, raw)
+        pipe.execute()
+        with self._lock:
+            for raw in tokens:
+                times = self._inflight.get(raw)
+                if times:
+                    times.pop(0)
+                    if not times:
+                        del self._inflight[raw]
+
+    def _register(self) -> None:
+        self.redis.pipeline(transaction=False).sadd(self.consumers_key, self.consumer_id) \
+            .set(self.heartbeat_key, "1", px=self.visibility_ms).execute()
+        self._reclaimer = threading.Thread(target=self._reclaim_loop, name="queue-reclaimer", daemon=True)
+        self._reclaimer.start()
+
+    def _reclaim_loop(self) -> None:
+        interval = max(0.5, self.visibility_ms / 1000.0 / 3)
+        stop = self._stop
+        while not stop.wait(interval):
+            try:
+                self.reclaim_stale()
+            except Exception as e:
+                log.error("reclaim_failed", reason=str(e))
+
+    def reclaim_stale(self) -> int:
+        """One reclaimer pass; returns how many entries were re-queued."""
+        self.redis.set(self.heartbeat_key, "1", px=self.visibility_ms)
+        requeued = 0
+
+        # our own entries that were never acked (e.g. a failed Mongo write)
+        cutoff = time.monotonic() - self.visibility_ms / 1000.0
+        stale: List[bytes] = []
+        with self._lock:
+            for raw, times in list(self._inflight.items()):
+                while times and times[0] <= cutoff:
+                    times.pop(0)
+                    stale.append(raw)
+                if not times:
+                    del self._inflight[raw]
+        if stale:
+            requeued += int(self._requeue(keys=[self.processing_key, self.key], args=stale))
+
+        # consumers that stopped heart-beating
+        for member in self.redis.smembers(self.consumers_key):
+            consumer_id = member.decode("utf-8") if isinstance(member, bytes) else member
+            if consumer_id == self.consumer_id:
+                continue
+            n = int(self._reclaim_consumer(
+                keys=[self.processing_key_for(consumer_id), self.key,
+                      self.heartbeat_key_for(consumer_id), self.consumers_key],
+                args=[consumer_id],
+            ))
+            if n > 0:
+                requeued += n
+                log.warning("reclaimed_inflight", consumer=consumer_id, count=n)
+        if stale:
+            log.warning("requeued_stale", consumer=self.consumer_id, count=len(stale))
+        return requeued
+
+    def close(self) -> None:
+        """Stop the reclaimer. Unacked entries stay in the processing list and are reclaimed later."""
+        self._stop.set()
+        self._stop = threading.Event()
+        self._reclaimer = None
@@ -0,0 +1,29 @@
+"""
+Retire old time partitions (MONGO_PARTITION=monthly|daily): drop them, or rename them to archive_<name>.
+
+    python -m app.retention [--keep N] [--action drop|archive]
+
+Defaults come from MONGO_RETENTION_PARTITIONS / MONGO_RETENTION_ACTION. Meant for cron; safe to run repeatedly.
+"""
+from __future__ import annotations
+import argparse
+from typing import List, Optional
+from .config import cfg
+from .db import RETENTION_ACTIONS, MongoDAO
+from .logger import get_logger
+
+log = get_logger()
+
+def main(argv: Optional[List[str]] = None) -> List[str]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--keep", type=int, default=cfg.MONGO_RETENTION_PARTITIONS,
+                    help="periods to keep, including the current one; 0 = keep all")
+    ap.add_argument("--action", choices=RETENTION_ACTIONS, default=cfg.MONGO_RETENTION_ACTION)
+    args = ap.parse_args(argv)
+    dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
+    retired = dao.apply_retention(keep=args.keep, action=args.action)
+    log.info("retention_done", partitions=len(retired), action=args.action)
+    return retired
+
+if __name__ == "__main__":
+    main()
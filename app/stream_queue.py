@@ -0,0 +1,141 @@
+from __future__ import annotations
+import os, socket, time, zlib
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+from redis import Redis
+from redis.exceptions import ResponseError
+from .codec import encode
+from .logger import get_logger
+from .queue_client import decode_item
+
+log = get_logger()
+
+Token = Tuple[bytes, bytes]  # (stream key, entry id)
+
+class StreamQueueClient:
+    """
+    Redis Streams queue with a consumer group (at-least-once).
+    Records are sharded over `shards` stream keys by customerId hash, read with
+    XREADGROUP COUNT/BLOCK and acknowledged with XACK after the Mongo write.
+    Entries pending longer than the visibility timeout are taken over with XAUTOCLAIM.
+    pop()/pop_many() return (token, item); pass the tokens to ack().
+    """
+    FIELD = b"d"
+    CLAIM_COUNT = 100  # XAUTOCLAIM COUNT; Redis examines at most 10x this many pending entries per call
+    CLAIM_SCANS = 10  # XAUTOCLAIM calls per stream per claim tick, so a huge pending list cannot stall pops
+
+    def __init__(self, redis: Redis, key: str, group: str = "ingest-workers", shards: int = 1,
+                 visibility_timeout_sec: float = 60, maxlen: int = 0, consumer: Optional[str] = None):
+        self.redis = redis
+        self.key = key
+        self.group = group
+        self.shards = max(1, int(shards))
+        self.stream_keys = [f"{key}:stream:{i}" for i in range(self.shards)]
+        self.visibility_ms = max(1, int(visibility_timeout_sec * 1000))
+        self.maxlen = int(maxlen)
+        self.consumer = consumer or f"{socket.gethostname()}:{os.getpid()}"
+        # XREADGROUP COUNT applies per stream; delivered-but-not-yet-returned entries wait here
+        self._buffer: Deque[Tuple[Token, dict]] = deque()
+        self._groups_ready = False
+        self._last_claim = 0.0
+        # XAUTOCLAIM cursor per stream: a pass resumes where the last tick stopped and restarts after "0-0"
+        self._claim_cursor: Dict[str, str] = {}
+
+    def stream_for(self, customer_id: Optional[str]) -> str:
+        return self.stream_keys[zlib.crc32(str(customer_id or "").encode("utf-8")) % self.shards]
+
+    def ensure_groups(self) -> None:
+        if self._groups_ready:
+            return
+        for stream in self.stream_keys:
+            try:
+                # "0": a new group also consumes entries already in the stream
+                self.redis.xgroup_create(stream, self.group, id="0", mkstream=True)
+            except ResponseError as e:
+                if "BUSYGROUP" not in str(e):
+                    raise
+        self._groups_ready = True
+
+    def _xadd(self, client, item: dict) -> None:
+        kwargs = {"maxlen": self.maxlen, "approximate": True} if self.maxlen else {}
+        client.xadd(self.stream_for(item.get("customerId")), {self.FIELD: encode(item)}, **kwargs)
+
+    def push(self, item: dict) -> None:
+        self._xadd(self.redis, item)
+
+    def push_many(self, items: Sequence[dict]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for item in items:
+            self._xadd(pipe, item)
+        pipe.execute()
+
+    def _decode(self, stream: bytes, entry_id: bytes, fields: Optional[dict]) -> Tuple[Token, dict]:
+        raw = (fields or {}).get(self.FIELD, b"")
+        return (stream, entry_id), decode_item(raw)
+
+    def _claim_stale(self) -> None:
+        # scan on from the saved cursor: entries still held by live consumers (or just reclaimed) at the head of
+        # the pending list would otherwise hide stale entries behind them forever
+        self._last_claim = time.monotonic()
+        for stream in self.stream_keys:
+            cursor = self._claim_cursor.get(stream, "0-0")
+            for _ in range(self.CLAIM_SCANS):
+                cursor, entries, _ = self.redis.xautoclaim(stream, self.group, self.consumer, self.visibility_ms,
+                                                           cursor, count=self.CLAIM_COUNT)
+                cursor = cursor.decode("utf-8") if isinstance(cursor, bytes) else cursor
+                for entry_id, fields in entries:
+                    self._buffer.append(self._decode(stream.encode("utf-8"), entry_id, fields))
+                if entries:
+                    log.warning("reclaimed_inflight", stream=stream, count=len(entries))
+                if entries or cursor == "0-0":
+                    break
+            self._claim_cursor[stream] = cursor
+
+    def pop(self, timeout: int) -> Optional[Tuple[Token, dict]]:
+        popped = self.pop_many(1, timeout)
+        return popped[0] if popped else None
+
+    def pop_many(self, count: int, timeout: int) -> List[Tuple[Token, dict]]:
+        self.ensure_groups()
+        count = max(1, int(count))
+        if time.monotonic() - self._last_claim >= self.visibility_ms / 1000.0 / 3:
+            self._claim_stale()
+        if not self._buffer:
+            # COUNT is per stream; any surplus stays buffered for the next call
+            res = self.redis.xreadgroup(
+                self.group, self.consumer, {s: ">" for s in self.stream_keys},
+                count=count, block=int(timeout * 1000),
+            )
+            for stream, entries in res or []:
+                for entry_id, fields in entries:
+                    self._buffer.append(self._decode(stream, entry_id, fields))
+        return [self._buffer.popleft() for _ in range(min(count, len(self._buffer)))]
+
+    def ack(self, tokens: Sequence[Token]) -> None:
+        if not tokens:
+            return
+        by_stream: Dict[bytes, List[bytes]] = defaultdict(list)
+        for stream, entry_id in tokens:
+            by_stream[stream].append(entry_id)
+        pipe = self.redis.pipeline(transaction=False)
+        for stream, ids in by_stream.items():
+            pipe.xack(stream, self.group, *ids)
+        pipe.execute()
+
+    def lag(self) -> Dict[str, int]:
+        """Consumer-group backlog: entries not yet delivered (lag) and delivered but unacked (pending)."""
+        self.ensure_groups()
+        lag = pending = 0
+        for stream in self.stream_keys:
+            for g in self.redis.xinfo_groups(stream):
+                name = g["name"].decode("utf-8") if isinstance(g["name"], bytes) else g["name"]
+                if name == self.group:
+                    lag += int(g.get("lag") or 0)
+                    pending += int(g.get("pending") or 0)
+        return {"lag": lag, "pending": pending}
+
+    def depth(self) -> int:
+        return self.lag()["lag"]
+
+    def close(self) -> None:
+        pass
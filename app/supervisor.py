@@ -0,0 +1,139 @@
+from __future__ import annotations
+import multiprocessing as mp
+import os, signal, threading, time
+from typing import Dict, List, Optional
+from .config import cfg
+from .logger import flush as flush_logs, get_logger
+from . import worker
+
+log = get_logger()
+
+# fork explicitly: children start from this (connection-free) parent image
+_ctx = mp.get_context("fork")
+_stopping = False
+
+def _child_main(index: int, counts) -> None:
+    # fork copied the supervisor's handlers; children drain via the worker's shutdown flag
+    worker.install_signal_handlers()
+    worker.shutdown = False
+
+    # Redis/Mongo clients are created here, after the fork, never inherited (pools are keyed by pid)
+    # one readiness file per slot: WORKER_READY_FILE.0, .1, ...
+    ready_file = f"{cfg.WORKER_READY_FILE}.{index}" if cfg.WORKER_READY_FILE else ""
+    if cfg.WORKER_ENGINE == "async":
+        import asyncio
+        from .async_worker import AsyncWorker
+        w = AsyncWorker(cfg.REDIS_URL, cfg.QUEUE_KEY, ready_file=ready_file)
+    else:
+        w = worker.Worker(cfg.REDIS_URL, cfg.QUEUE_KEY, ready_file=ready_file)
+    server = None
+    if cfg.METRICS_ENABLED:
+        # one scrape target per slot: METRICS_PORT+1, +2, ... (stable across restarts)
+        server = worker.start_http_server(w.metrics.registry, cfg.METRICS_PORT + 1 + index, cfg.METRICS_ADDR,
+                                          ready=lambda: w.ready)
+
+    # counts[index] is cumulative across restarts of this slot
+    base = counts[index]
+    done = threading.Event()
+
+    def report():
+        while not done.wait(1.0):
+            counts[index] = base + w.processed
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        if cfg.WORKER_ENGINE == "async":
+            asyncio.run(w.run(max_messages=cfg.WORKER_MAX_MESSAGES))
+        else:
+            w.run(max_messages=cfg.WORKER_MAX_MESSAGES)
+    finally:
+        done.set()
+        counts[index] = base + w.processed
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        flush_logs()  # multiprocessing children exit via os._exit, skipping atexit
+
+def _handle_signal(signum, frame):
+    global _stopping
+    _stopping = True
+    log.info("signal_received", signum=signum)
+
+def supervise(processes: Optional[int] = None, stats_interval_sec: Optional[float] = None) -> Dict[str, int]:
+    """
+    Run `processes` worker children (default: CPU count), restart any that crash,
+    forward SIGTERM/SIGINT so each child drains, and log aggregate throughput.
+    Returns processed/restart totals once every child has exited.
+    """
+    n = processes or cfg.SUPERVISOR_PROCESSES or os.cpu_count() or 1
+    interval = stats_interval_sec or cfg.SUPERVISOR_STATS_INTERVAL_SEC
+    counts = _ctx.Array("Q", n, lock=False)
+    children: List[Optional[mp.Process]] = [None] * n
+    restart_at: Dict[int, float] = {}
+    restarts = 0
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    def start(i: int) -> None:
+        p = _ctx.Process(target=_child_main, args=(i, counts), name=f"worker-{i}")
+        p.start()
+        children[i] = p
+        log.info("child_started", index=i, pid=p.pid)
+
+    for i in range(n):
+        start(i)
+
+    last_total, last_ts = 0, time.monotonic()
+    forwarded = False
+    while True:
+        if _stopping and not forwarded:
+            for p in children:
+                if p is not None and p.is_alive():
+                    os.kill(p.pid, signal.SIGTERM)
+            forwarded = True
+
+        now = time.monotonic()
+        for i, p in enumerate(children):
+            if i in restart_at:
+                # crashed slot; restart at most once per second to avoid a hot crash loop
+                if _stopping:
+                    del restart_at[i]
+                elif now >= restart_at[i]:
+                    del restart_at[i]
+                    restarts += 1
+                    start(i)
+                continue
+            if p is None or p.is_alive():
+                continue
+            p.join()
+            children[i] = None
+            if p.exitcode != 0 and not _stopping:
+                log.error("child_crashed", index=i, pid=p.pid, exitcode=p.exitcode)
+                restart_at[i] = now + 1.0
+            else:
+                log.info("child_exited", index=i, pid=p.pid, exitcode=p.exitcode)
+
+        finished = not restart_at and all(p is None for p in children)
+        if now - last_ts >= interval or finished:
+            total = sum(counts)
+            log.info(
+                "supervisor_stats",
+                processed=total,
+                rate=round((total - last_total) / max(now - last_ts, 1e-9), 1),
+                per_child=list(counts),
+                alive=sum(1 for p in children if p is not None),
+                restarts=restarts,
+            )
+            last_total, last_ts = total, now
+
+        if finished:
+            break
+        time.sleep(0.2)
+
+    return {"processed": sum(counts), "restarts": restarts}
+
+if __name__ == "__main__":
+    log.info("supervisor_start", processes=cfg.SUPERVISOR_PROCESSES or os.cpu_count(), engine=cfg.WORKER_ENGINE)
+    supervise()
+    log.info("supervisor_exit")
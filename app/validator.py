@@ -1,6 +1,15 @@
 from __future__ import annotations
 from typing import Dict, Any, Tuple
-from .models import CustomerRecord
+
+_model = None
+
+def load_model():
+    # pydantic + the model cost ~150 ms to import; the fast path rarely needs them, so load on first use
+    global _model
+    if _model is None:
+        from .models import CustomerRecord
+        _model = CustomerRecord
+    return _model
 
 def validate_record(raw: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
     """
@@ -8,7 +17,7 @@ def validate_record(raw: Dict[str, Any]) -> Tuple[bool, Dict[str, Any]]:
     On error, payload is: {status:"error", customerId:..., reason:...}
     """
     try:
-        rec = CustomerRecord.model_validate(raw)
+        rec = load_model().model_validate(raw)
         return True, rec.model_dump()
     except Exception as e:
         customer_id = raw.get("customerId", None)
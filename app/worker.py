@@ -1,72 +1,368 @@
 from __future__ import annotations
 import os, signal, sys, time
-from typing import Optional
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.errors import PyMongoError
 from redis import Redis
 from .config import cfg
+from .connections import redis_client
 from .logger import get_logger
-from .queue_client import QueueClient
-from .validator import validate_record
+from .queue_client import make_queue
+from .validator import load_model, validate_record
+from .fast_validator import validate_record_fast
 from .rate_limiter import RateLimiter
-from .db import MongoDAO
+from .limit_policy import make_policy
+from .dead_letter import DeadLetterQueue, make_dlq
+from .autoscaler import Autoscaler, make_autoscaler
+from .db import BulkMongoWriter, MongoDAO
+from .metrics import NullMetrics, WorkerMetrics, start_http_server
 
 log = get_logger()
 shutdown = False
+_validate = validate_record_fast if cfg.VALIDATOR_MODE == "fast" else validate_record
 
 def _handle_sigterm(signum, frame):
     global shutdown
     shutdown = True
     log.info("signal_received", signum=signum)
 
-signal.signal(signal.SIGTERM, _handle_sigterm)
-signal.signal(signal.SIGINT, _handle_sigterm)
+def install_signal_handlers() -> None:
+    """SIGTERM/SIGINT drain the run loop. Entry points call this; importing the module has no side effects."""
+    signal.signal(signal.SIGTERM, _handle_sigterm)
+    signal.signal(signal.SIGINT, _handle_sigterm)
+
+def write_ready_file(path: str, ready: bool) -> None:
+    """Readiness for exec probes (`test -f`): the file exists while the worker is ready."""
+    if not path:
+        return
+    if ready:
+        with open(path, "w") as f:
+            f.write(str(os.getpid()))
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+_NULL_METRICS = NullMetrics()
+
+def make_metrics():
+    # the autoscaler reads insert latency from the stage histograms, even when nothing scrapes them
+    return WorkerMetrics() if cfg.METRICS_ENABLED or cfg.AUTOSCALE_ENABLED else _NULL_METRICS
+
+def check_item(item: dict, metrics=_NULL_METRICS) -> Tuple[bool, Dict[str, Any]]:
+    """Parse-error guard + validation, logging rejects. Shared by the sync and async engines."""
+    # guard parse errors
+    if item.get("__parse_error__"):
+        log.error("parse_error", status="error", reason="Invalid JSON", raw=item.get("__raw__"))
+        metrics.outcome("parse_error")
+        return False, item
+
+    t0 = perf_counter()
+    ok, payload = _validate(item)
+    metrics.observe("validate", perf_counter() - t0)
+    if not ok:
+        log.error("validation_failed", **payload)
+        metrics.outcome("validation_failed")
+    return ok, payload
+
+def register_gauges(metrics, queue_depth, ratelimiter: RateLimiter, dao: MongoDAO, engine) -> None:
+    """Scrape-time gauges and counters (running totals read on scrape); nothing here runs per message."""
+    metrics.gauge("ingest_queue_depth", "Queue length (list) or consumer-group lag (streams)", queue_depth)
+    metrics.counter("ingest_processed_total", "Messages handled by this process", lambda: engine.processed)
+    metrics.counter("ingest_duplicates_total", "Inserts that hit an existing _id", lambda: dao.duplicates)
+    metrics.counter("ratelimit_local_cache_hits_total", "Requests rejected by the local blocked-customer cache",
+                    lambda: ratelimiter.cache_stats()["hits"])
+    metrics.counter("ratelimit_local_cache_misses_total", "Local cache lookups that went to Redis",
+                    lambda: ratelimiter.cache_stats()["misses"])
+    policy = ratelimiter.policy
+    if policy is not None:
+        metrics.gauge("ratelimit_policy_overrides", "Customers with a limit override", lambda: len(policy))
+        metrics.counter("ratelimit_policy_reloads_total", "Limit policy snapshots loaded", lambda: policy.reloads)
+
+def register_dlq_gauges(metrics, dlq: DeadLetterQueue) -> None:
+    metrics.gauge("ingest_dlq_delayed", "Records waiting in the delay ZSET", lambda: dlq.depth()["delayed"])
+    metrics.gauge("ingest_dlq_dead", "Records in the dead-letter list", lambda: dlq.depth()["dead"])
+    metrics.counter("ingest_dlq_moved_total", "Delayed records re-enqueued by this process", lambda: dlq.moved)
+
+def defer_rejected(dlq: DeadLetterQueue, ratelimiter: RateLimiter, metrics,
+                   rejected: List[Tuple[dict, str, int]]) -> None:
+    """Rate-limited (item, customer_id, retry_at_ms) -> delay ZSET, due when the customer has room again."""
+    delayed, dead = dlq.defer_rate_limited(rejected, ratelimiter.limits)
+    metrics.outcome("deferred", delayed)
+    metrics.outcome("dead_lettered", dead)
+
+def retry_failed(dlq: DeadLetterQueue, metrics, items: List[dict], error: Exception) -> None:
+    """Records whose write failed -> delay ZSET with exponential backoff."""
+    log.error("insert_failed", status="error", reason=str(error), count=len(items))
+    delayed, dead = dlq.retry_failed(items, type(error).__name__)
+    metrics.outcome("retry_scheduled", delayed)
+    metrics.outcome("dead_lettered", dead)
 
 class Worker:
-    def __init__(self, redis_url: str, queue_key: str):
-        self.redis = Redis.from_url(redis_url, decode_responses=False)
-        self.queue = QueueClient(self.redis, queue_key)
-        self.dao = MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
-        self.ratelimiter = RateLimiter(self.redis, cfg.RATE_LIMIT_LIMIT, cfg.RATE_LIMIT_WINDOW_SEC)
+    def __init__(self, redis_url: str, queue_key: str, redis: Optional[Redis] = None, dao: Optional[MongoDAO] = None,
+                 metrics=None, ready_file: Optional[str] = None):
+        self._created = perf_counter()
+        # redis/dao can be injected (benchmarks, local stand-ins); default is this process's shared pools
+        self.redis = redis if redis is not None else redis_client(redis_url)
+        self.dao = dao if dao is not None else MongoDAO(cfg.MONGO_URI, cfg.MONGO_DB, cfg.MONGO_COLLECTION)
+        # per-customer limit overrides, reloaded in a background thread
+        self.policy = make_policy(self.redis)
+        self.ratelimiter = RateLimiter(
+            self.redis, cfg.RATE_LIMIT_LIMIT, cfg.RATE_LIMIT_WINDOW_SEC,
+            algorithm=cfg.RATE_LIMIT_ALGORITHM,
+            local_cache_size=cfg.RATE_LIMIT_CACHE_SIZE,
+            local_cache_ttl_ms=cfg.RATE_LIMIT_CACHE_TTL_MS,
+            local_cache_accuracy_ms=cfg.RATE_LIMIT_CACHE_ACCURACY_MS,
+            policy=self.policy,
+        )
+        self.metrics = metrics if metrics is not None else make_metrics()
+        # fair backend: customers the limiter already knows are blocked are rejected before validation
+        self.queue = make_queue(self.redis, queue_key, ratelimiter=self.ratelimiter, on_reject=self._reject)
+        self.processed = 0  # lifetime message count (read by the supervisor)
+        register_gauges(self.metrics, self.queue.depth, self.ratelimiter, self.dao, self)
+        # rate-limited / failed records wait in a delay ZSET instead of being dropped
+        self.dlq: Optional[DeadLetterQueue] = make_dlq(self.redis, queue_key)
+        if self.dlq is not None:
+            register_dlq_gauges(self.metrics, self.dlq)
+        # write-behind: accepted records are logged as ingested and acked when their bulk write lands,
+        # or go to the DLQ (if on) when it fails
+        self.writer: Optional[BulkMongoWriter] = None
+        if cfg.MONGO_BUFFER_DOCS > 0:
+            self.writer = BulkMongoWriter(self.dao, cfg.MONGO_BUFFER_DOCS, cfg.MONGO_BUFFER_MAX_AGE_MS,
+                                          cfg.MONGO_BUFFER_MAX_BYTES, on_flush=self._on_flush,
+                                          on_error=self._on_flush_error if self.dlq is not None else None)
+            self.metrics.gauge("ingest_write_buffer", "Records accepted but not yet written",
+                               lambda: self.writer.pending)
+        # records per pop; set again by run(), adjusted while running by the autoscaler (if on)
+        self.batch_size = max(1, cfg.WORKER_BATCH_SIZE)
+        self.autoscaler: Optional[Autoscaler] = make_autoscaler(self, "batch_size", self.queue.depth, self.metrics)
+        self.ready = False  # set by startup(), cleared when run() stops; served as /ready
+        self.ready_file = cfg.WORKER_READY_FILE if ready_file is None else ready_file
+        self.startup_ms: Dict[str, float] = {}
+        self.first_message_ms: Optional[float] = None
+
+    def startup(self) -> Dict[str, float]:
+        """
+        Connect before the first pop so the first message does not pay for handshakes: PING Redis, ping Mongo and,
+        with VALIDATOR_MODE=full, load the pydantic model. Idempotent; run() calls it. Returns ms per step.
+        """
+        if self.ready:
+            return self.startup_ms
+        t0 = perf_counter()
+        self.redis.ping()
+        t1 = perf_counter()
+        self.dao.client.admin.command("ping")
+        t2 = perf_counter()
+        if cfg.VALIDATOR_MODE == "full":
+            load_model()
+        t3 = perf_counter()
+        self.startup_ms = {"redis_ms": round((t1 - t0) * 1000, 1), "mongo_ms": round((t2 - t1) * 1000, 1),
+                           "validator_ms": round((t3 - t2) * 1000, 1),
+                           "since_init_ms": round((t3 - self._created) * 1000, 1)}
+        self.ready = True
+        write_ready_file(self.ready_file, True)
+        log.info("worker_ready", **self.startup_ms)
+        return self.startup_ms
+
+    def _first_message(self) -> None:
+        self.first_message_ms = round((perf_counter() - self._created) * 1000, 1)
+        log.info("first_message", since_init_ms=self.first_message_ms)
+
+    def _reject(self, customer_id: str, items: List[dict]) -> None:
+        for _ in items:
+            log.error("rate_limited", status="error", customerId=customer_id, reason="Rate limit exceeded")
+        self.metrics.outcome("rate_limited", len(items))
+        if self.dlq is not None:
+            retry_at = self.ratelimiter.blocked_until(customer_id)
+            self._defer([(item, customer_id, retry_at) for item in items])
+
+    def _defer(self, rejected: List[Tuple[dict, str, int]]) -> None:
+        defer_rejected(self.dlq, self.ratelimiter, self.metrics, rejected)
+
+    def _retry(self, items: List[dict], error: Exception) -> None:
+        retry_failed(self.dlq, self.metrics, items, error)
+
+    def _on_flush(self, contexts: List[Tuple[Any, str, dict]], ids: List[str], seconds: float) -> None:
+        self.metrics.observe("insert", seconds)
+        for (_, customer_id, _), _id in zip(contexts, ids):
+            log.info("ingested", status="success", customerId=customer_id, _id=_id)
+        self.metrics.outcome("ingested", len(ids))
+        self.queue.ack([token for token, _, _ in contexts])
+
+    def _on_flush_error(self, contexts: List[Tuple[Any, str, dict]], error: Exception) -> None:
+        # the whole flush is retried; records that did land come back as duplicates
+        self._retry([item for _, _, item in contexts], error)
+        self.queue.ack([token for token, _, _ in contexts])
 
     def process_one(self) -> Optional[bool]:
+        t0 = perf_counter()
         popped = self.queue.pop(timeout=cfg.WORKER_POLL_TIMEOUT_SEC)
+        self.metrics.observe("pop", perf_counter() - t0)
         if popped is None:
             return None  # timeout / idle
-        key, item = popped
-
-        # guard parse errors
-        if item.get("__parse_error__"):
-            log.error("parse_error", status="error", reason="Invalid JSON", raw=item.get("__raw__"))
-            return False
+        token, item = popped
+        res = self._handle_one(item, token)
+        # reliable backends: drop from the in-flight list only once handled (exceptions leave it for redelivery)
+        if not (res and self.writer is not None):  # buffered records are acked by _on_flush
+            self.queue.ack([token])
+        return res
 
-        ok, payload = validate_record(item)
+    def _handle_one(self, item: dict, token: Any = None) -> bool:
+        m = self.metrics
+        ok, payload = check_item(item, m)
         if not ok:
-            log.error("validation_failed", **payload)
             return False
 
         customer_id = item.get("customerId")
 
         # rate limiting based on processing time (ingest time)
-        allowed = self.ratelimiter.allow(customer_id)
+        t0 = perf_counter()
+        allowed, retry_at = self.ratelimiter.check(customer_id)
+        m.observe("rate_limit", perf_counter() - t0)
         if not allowed:
             log.error("rate_limited", status="error", customerId=customer_id, reason="Rate limit exceeded")
+            m.outcome("rate_limited")
+            if self.dlq is not None:
+                self._defer([(item, customer_id, retry_at)])
             return False
 
+        if self.writer is not None:
+            self.writer.add(payload, (token, customer_id, item))
+            return True
+
         # insert
-        _id = self.dao.insert_record(payload)
+        t0 = perf_counter()
+        try:
+            _id = self.dao.insert_record(payload)
+        except PyMongoError as e:  # duplicates never get here (the DAO treats them as success)
+            if self.dlq is None:
+                raise
+            self._retry([item], e)
+            return False
+        m.observe("insert", perf_counter() - t0)
         log.info("ingested", status="success", customerId=customer_id, _id=_id)
+        m.outcome("ingested")
         return True
 
-    def run(self, max_messages: int = 0):
+    def process_batch(self, n: int) -> Optional[List[bool]]:
+        """
+        Batched pop -> validate -> rate-limit -> insert.
+        Returns one result per popped message (same meaning as process_one), or None when idle.
+        """
+        m = self.metrics
+        t0 = perf_counter()
+        popped = self.queue.pop_many(n, timeout=cfg.WORKER_POLL_TIMEOUT_SEC)
+        m.observe("pop", perf_counter() - t0)
+        if not popped:
+            return None  # timeout / idle
+        results = [False] * len(popped)
+
+        valid = []
+        for i, (_, item) in enumerate(popped):
+            ok, payload = check_item(item, m)
+            if ok:
+                valid.append((i, item.get("customerId"), payload))
+
+        # rate limiting based on processing time (ingest time), one round trip for the batch
+        now_ms = int(time.time() * 1000)
+        t0 = perf_counter()
+        decisions = self.ratelimiter.check_many([(customer_id, now_ms) for _, customer_id, _ in valid])
+        m.observe("rate_limit", perf_counter() - t0)
+
+        allowed = []
+        rejected = []
+        for (i, customer_id, payload), (ok, retry_at) in zip(valid, decisions):
+            if not ok:
+                log.error("rate_limited", status="error", customerId=customer_id, reason="Rate limit exceeded")
+                m.outcome("rate_limited")
+                rejected.append((popped[i][1], customer_id, retry_at))
+                continue
+            allowed.append((i, customer_id, payload))
+        if rejected and self.dlq is not None:
+            self._defer(rejected)
+
+        if self.writer is not None:
+            for i, customer_id, payload in allowed:
+                self.writer.add(payload, (popped[i][0], customer_id, popped[i][1]))
+                results[i] = True
+            self.queue.ack([token for (token, _), ok in zip(popped, results) if not ok])
+            return results
+
+        # insert
+        t0 = perf_counter()
+        try:
+            ids = self.dao.insert_many([payload for _, _, payload in allowed])
+        except PyMongoError as e:
+            if self.dlq is None:
+                raise
+            # the whole batch is retried; records that did land come back as duplicates
+            self._retry([popped[i][1] for i, _, _ in allowed], e)
+            self.queue.ack([token for token, _ in popped])
+            return results
+        m.observe("insert", perf_counter() - t0)
+        for (i, customer_id, _), _id in zip(allowed, ids):
+            log.info("ingested", status="success", customerId=customer_id, _id=_id)
+            results[i] = True
+        m.outcome("ingested", len(ids))
+        self.queue.ack([token for token, _ in popped])
+        return results
+
+    def run(self, max_messages: int = 0, batch_size: Optional[int] = None):
+        self.batch_size = max(1, batch_size or cfg.WORKER_BATCH_SIZE)
         processed = 0
-        while not shutdown:
-            res = self.process_one()
-            if res is not None:
-                processed += 1
-            if max_messages and processed >= max_messages:
-                break
+        self.startup()
+        if self.dlq is not None:
+            self.dlq.start(self.queue, cfg.DLQ_MOVE_INTERVAL_MS)
+        if self.autoscaler is not None:
+            self.autoscaler.start(cfg.AUTOSCALE_INTERVAL_MS)
+        try:
+            while not shutdown:
+                batch_size = self.batch_size
+                if batch_size > 1:
+                    n = min(batch_size, max_messages - processed) if max_messages else batch_size
+                    res = self.process_batch(n)
+                    if res is not None:
+                        processed += len(res)
+                        self.processed += len(res)
+                else:
+                    res = self.process_one()
+                    if res is not None:
+                        processed += 1
+                        self.processed += 1
+                if processed and self.first_message_ms is None:
+                    self._first_message()
+                if max_messages and processed >= max_messages:
+                    break
+        finally:
+            self.ready = False
+            write_ready_file(self.ready_file, False)
+            if self.autoscaler is not None:
+                self.autoscaler.close()
+            # signal/limit/crash: write (and ack) whatever is still buffered before exit
+            if self.writer is not None:
+                self.writer.close()
+            if self.dlq is not None:
+                self.dlq.close()
+            self.queue.close()
+            if self.policy is not None:
+                self.policy.close()
 
 if __name__ == "__main__":
-    log.info("worker_start", redis=cfg.REDIS_URL, queue=cfg.QUEUE_KEY)
-    w = Worker(cfg.REDIS_URL, cfg.QUEUE_KEY)
-    w.run(max_messages=cfg.WORKER_MAX_MESSAGES)
+    install_signal_handlers()
+    log.info("worker_start", redis=cfg.REDIS_URL, queue=cfg.QUEUE_KEY, batch_size=cfg.WORKER_BATCH_SIZE,
+             engine=cfg.WORKER_ENGINE)
+    if cfg.WORKER_ENGINE == "async":
+        import asyncio
+        from .async_worker import AsyncWorker
+        w = AsyncWorker(cfg.REDIS_URL, cfg.QUEUE_KEY)
+    else:
+        w = Worker(cfg.REDIS_URL, cfg.QUEUE_KEY)
+    if cfg.METRICS_ENABLED:
+        start_http_server(w.metrics.registry, cfg.METRICS_PORT, cfg.METRICS_ADDR, ready=lambda: w.ready)
+        log.info("metrics_listening", port=cfg.METRICS_PORT)
+    if cfg.WORKER_ENGINE == "async":
+        asyncio.run(w.run(max_messages=cfg.WORKER_MAX_MESSAGES))
+    else:
+        w.run(max_messages=cfg.WORKER_MAX_MESSAGES)
     log.info("worker_exit")
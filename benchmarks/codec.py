@@ -0,0 +1,83 @@
+"""
+Queue codec throughput on the real record shape (generator.generate_record).
+
+For every codec in app.codec.CODECS whose dependency is installed it reports:
+  - encode/sec and decode/sec (one record at a time, as push_many/pop_many do)
+  - decode+validate/sec with the fast validator, i.e. the worker's per-record CPU before the write
+  - bytes/record on the wire
+
+Usage:
+  python -m benchmarks.codec [--records 100000] [--customers 1000] [--json out.json]
+No Redis or Mongo needed.
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import Any, Dict, List
+
+from app import codec
+from app.fast_validator import validate_record_fast
+from benchmarks.common import dump_json, run_meta
+from generator.generator import generate_record
+
+
+def bench_one(name: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    encode = codec.get_encoder(name)
+    decode = codec.decode
+
+    t0 = time.perf_counter()
+    raws = [encode(r) for r in records]
+    t_encode = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    items = [decode(raw) for raw in raws]
+    t_decode = time.perf_counter() - t0
+    assert items == records, f"{name}: roundtrip mismatch"
+
+    t0 = time.perf_counter()
+    for raw in raws:
+        validate_record_fast(decode(raw))
+    t_both = time.perf_counter() - t0
+
+    n = len(records)
+    return {
+        "codec": name,
+        "encode_per_sec": round(n / t_encode, 1),
+        "decode_per_sec": round(n / t_decode, 1),
+        "decode_validate_per_sec": round(n / t_both, 1),
+        "bytes_per_record": round(sum(len(raw) for raw in raws) / n, 1),
+    }
+
+
+def available() -> List[str]:
+    out = []
+    for name in codec.CODECS:
+        try:
+            codec.get_encoder(name)
+        except ValueError:
+            continue  # optional dependency not installed
+        out.append(name)
+    return out
+
+
+def main(argv: List[str] | None = None) -> List[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=100000)
+    ap.add_argument("--customers", type=int, default=1000)
+    ap.add_argument("--json", default=None, help="write results to this file")
+    args = ap.parse_args(argv)
+
+    records = [generate_record(str(i % args.customers), 0.0) for i in range(args.records)]
+    results = [bench_one(name, records) for name in available()]
+
+    print(f"{'codec':<9}{'encode/s':>12}{'decode/s':>12}{'dec+val/s':>12}{'B/rec':>8}")
+    for r in results:
+        print(f"{r['codec']:<9}{r['encode_per_sec']:>12}{r['decode_per_sec']:>12}"
+              f"{r['decode_validate_per_sec']:>12}{r['bytes_per_record']:>8}")
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": results})
+    return results
+
+
+if __name__ == "__main__":
+    main()
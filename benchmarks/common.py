@@ -0,0 +1,74 @@
+from __future__ import annotations
+import json
+import math
+import platform
+import subprocess
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.config import cfg
+
+
+def clients(backend: str) -> Tuple[Any, Any]:
+    """(redis, mongo) clients: in-process stand-ins for "fake", REDIS_URL/MONGO_URI for "live"."""
+    if backend == "fake":
+        try:
+            import fakeredis
+            import mongomock
+        except ImportError as e:
+            raise SystemExit(f"--backend fake needs the optional bench deps ({e}); pip install -r requirements-bench.txt")
+        return fakeredis.FakeRedis(), mongomock.MongoClient()
+    from redis import Redis
+    from pymongo import MongoClient
+    return Redis.from_url(cfg.REDIS_URL, decode_responses=False), MongoClient(cfg.MONGO_URI)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0..100); 0.0 for no samples."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    # rank ceil(q/100 * n); q * n first, so whole products stay exact (7 / 100.0 * 100 > 7)
+    k = max(0, min(len(ordered) - 1, math.ceil(q * len(ordered) / 100.0) - 1))
+    return ordered[k]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def run_meta(**params: Any) -> Dict[str, Any]:
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": params,
+    }
+
+
+def dump_json(path: str, payload: Dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump(payload, f, indent=2, sort_keys=True)
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any], keys: List[str]) -> List[str]:
+    """Human-readable deltas for numeric `keys` (dotted paths) between two result files."""
+    def get(d: Dict[str, Any], path: str):
+        for part in path.split("."):
+            if not isinstance(d, dict) or part not in d:
+                return None
+            d = d[part]
+        return d
+
+    lines = []
+    for key in keys:
+        a, b = get(old, key), get(new, key)
+        if not isinstance(a, (int, float)) or not isinstance(b, (int, float)):
+            continue
+        delta = (b - a) / a * 100.0 if a else 0.0
+        lines.append(f"{key:<40}{a:>14.3f}{b:>14.3f}{delta:>+9.1f}%")
+    return lines
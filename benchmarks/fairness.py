@@ -0,0 +1,119 @@
+"""
+Noisy-neighbor benchmark: how long quiet customers wait behind a flooding one, per queue backend.
+
+One customer pushes --noisy-records at once, then --quiet-customers customers push --quiet-records each.
+A real `Worker` drains everything under a per-customer limit of --rate-limit per minute, with the limiter's
+local blocked cache on. For each backend (list FIFO vs fair DRR) it reports:
+  - quiet customers: p50/p99/max time from push to their insert (or rejection)
+  - total time to drain the queue, and how many noisy records were validated vs rejected up front
+
+Usage:
+  python -m benchmarks.fairness [--backend fake|live] [--noisy-records 20000] [--json out.json]
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+import time
+from typing import Any, Dict, List
+
+from app import worker as worker_mod
+from app.config import cfg
+from app.db import MongoDAO
+from app.logger import flush as flush_logs
+from app.queue_client import make_queue
+from app.rate_limiter import RateLimiter
+from app.worker import Worker
+from generator.generator import generate_record
+from benchmarks.common import clients, dump_json, percentile, run_meta
+
+QUEUE_KEY = "bench:ingest:queue"
+MONGO_DB = "ingestion_bench"
+NOISY = "noisy"
+BACKENDS = ("list", "fair")
+
+
+def _cleanup(redis, mongo) -> None:
+    for key in redis.scan_iter("bench:*"):
+        redis.delete(key)
+    mongo.drop_database(MONGO_DB)
+
+
+def bench_one(redis, mongo, backend: str, args: argparse.Namespace) -> Dict[str, Any]:
+    _cleanup(redis, mongo)
+    dao = MongoDAO(cfg.MONGO_URI, MONGO_DB, cfg.MONGO_COLLECTION, client=mongo)
+    w = Worker(cfg.REDIS_URL, QUEUE_KEY, redis=redis, dao=dao)
+    w.ratelimiter = RateLimiter(redis, args.rate_limit, 60, prefix="bench:rate",
+                                local_cache_size=10000, local_cache_ttl_ms=60000)
+    w.queue = make_queue(redis, QUEUE_KEY, backend=backend, ratelimiter=w.ratelimiter, on_reject=w._reject)
+
+    quiet = [f"q{i}" for i in range(args.quiet_customers)]
+    w.queue.push_many([generate_record(NOISY, 0.0) for _ in range(args.noisy_records)])
+    w.queue.push_many([generate_record(c, 0.0) for _ in range(args.quiet_records) for c in quiet])
+    total = args.noisy_records + args.quiet_records * len(quiet)
+
+    # when did each quiet record finish (inserted, or popped and rate limited)?
+    finished: List[float] = []
+    seen_noisy = {"validated": 0}
+    check = worker_mod.check_item
+
+    def tracking_check(item, metrics=worker_mod._NULL_METRICS):
+        if item.get("customerId") == NOISY:
+            seen_noisy["validated"] += 1
+        else:
+            finished.append(time.perf_counter())
+        return check(item, metrics)
+
+    worker_mod.check_item = tracking_check
+    t0 = time.perf_counter()
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            while w.queue.depth() > 0:
+                w.process_batch(args.batch_size)
+            flush_logs()
+    finally:
+        worker_mod.check_item = check
+    elapsed = time.perf_counter() - t0
+    waits = [t - t0 for t in finished]
+    return {
+        "backend": backend,
+        "records": total,
+        "drain_s": round(elapsed, 3),
+        "quiet_p50_ms": round(percentile(waits, 50) * 1000, 2),
+        "quiet_p99_ms": round(percentile(waits, 99) * 1000, 2),
+        "quiet_max_ms": round(max(waits, default=0.0) * 1000, 2),
+        "noisy_validated": seen_noisy["validated"],
+        "noisy_rejected_up_front": args.noisy_records - seen_noisy["validated"],
+    }
+
+
+def main(argv: List[str] | None = None) -> List[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=("fake", "live"), default="fake")
+    ap.add_argument("--noisy-records", type=int, default=20000)
+    ap.add_argument("--quiet-customers", type=int, default=20)
+    ap.add_argument("--quiet-records", type=int, default=5)
+    ap.add_argument("--rate-limit", type=int, default=100, help="per customer per minute")
+    ap.add_argument("--batch-size", type=int, default=100)
+    ap.add_argument("--json", default=None, help="write results to this file")
+    args = ap.parse_args(argv)
+
+    redis, mongo = clients(args.backend)
+    results = []
+    try:
+        for backend in BACKENDS:
+            results.append(bench_one(redis, mongo, backend, args))
+    finally:
+        _cleanup(redis, mongo)
+
+    print(f"{'backend':<8}{'drain_s':>9}{'quiet_p50':>11}{'quiet_p99':>11}{'quiet_max':>11}{'noisy_valid':>13}{'rejected':>10}")
+    for r in results:
+        print(f"{r['backend']:<8}{r['drain_s']:>9}{r['quiet_p50_ms']:>11}{r['quiet_p99_ms']:>11}{r['quiet_max_ms']:>11}"
+              f"{r['noisy_validated']:>13}{r['noisy_rejected_up_front']:>10}")
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": results})
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Compare _id formats and index layouts: index sizes and insert throughput.
+
+For every combination of MONGO_ID_FORMAT (hex, binary) and MONGO_INDEX_LAYOUT (customer, compound) it inserts
+--records records with MongoDAO.insert_many and reports:
+  - inserts/sec
+  - per-index size and total index size (collStats), plus bytes of index per document
+
+Usage:
+  python -m benchmarks.id_layout [--records 200000] [--batch-size 1000] [--json out.json]
+Needs a live MongoDB at MONGO_URI; uses DB `ingestion_bench`, dropped afterwards.
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import Any, Dict, List
+
+from pymongo import MongoClient
+
+from app.config import cfg
+from app.db import ID_FORMATS, INDEX_LAYOUTS, MongoDAO
+from benchmarks.common import dump_json, run_meta
+
+MONGO_DB = "ingestion_bench"
+
+
+def bench_one(client: MongoClient, id_format: str, index_layout: str, records: int, batch_size: int,
+              customers: int) -> Dict[str, Any]:
+    client.drop_database(MONGO_DB)
+    dao = MongoDAO(cfg.MONGO_URI, MONGO_DB, cfg.MONGO_COLLECTION, client=client,
+                   id_format=id_format, index_layout=index_layout)
+    t0 = time.perf_counter()
+    for start in range(0, records, batch_size):
+        dao.insert_many([
+            {"customerId": str(i % customers), "name": "Bench", "email": f"u{i}@example.com",
+             "createdAt": f"2024-03-26T12:{(i // 60) % 60:02d}:{i % 60:02d}Z"}
+            for i in range(start, min(records, start + batch_size))
+        ])
+    elapsed = time.perf_counter() - t0
+    stats = client[MONGO_DB].command("collStats", cfg.MONGO_COLLECTION)
+    return {
+        "id_format": id_format,
+        "index_layout": index_layout,
+        "inserts_per_sec": round(records / elapsed, 1),
+        "index_sizes": stats.get("indexSizes", {}),
+        "total_index_bytes": stats.get("totalIndexSize", 0),
+        "index_bytes_per_doc": round(stats.get("totalIndexSize", 0) / max(1, records), 2),
+        "avg_obj_bytes": stats.get("avgObjSize", 0),
+    }
+
+
+def main(argv: List[str] | None = None) -> List[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=200000)
+    ap.add_argument("--batch-size", type=int, default=1000)
+    ap.add_argument("--customers", type=int, default=1000)
+    ap.add_argument("--json", default=None, help="write results to this file")
+    args = ap.parse_args(argv)
+
+    client = MongoClient(cfg.MONGO_URI)
+    results = []
+    try:
+        for id_format in ID_FORMATS:
+            for index_layout in INDEX_LAYOUTS:
+                results.append(bench_one(client, id_format, index_layout, args.records, args.batch_size,
+                                         args.customers))
+    finally:
+        client.drop_database(MONGO_DB)
+
+    print(f"{'id':<8}{'indexes':<10}{'inserts/sec':>13}{'index_bytes':>13}{'idx_B/doc':>11}{'obj_B':>8}  per index")
+    for r in results:
+        print(f"{r['id_format']:<8}{r['index_layout']:<10}{r['inserts_per_sec']:>13}{r['total_index_bytes']:>13}"
+              f"{r['index_bytes_per_doc']:>11}{r['avg_obj_bytes']:>8}  {r['index_sizes']}")
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": results})
+    return results
+
+
+if __name__ == "__main__":
+    main()
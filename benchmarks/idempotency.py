@@ -0,0 +1,101 @@
+"""
+Compare MongoDAO idempotency modes under replayed traffic.
+
+For every duplicate ratio and mode (insert, upsert, each with and without the local seen-id cache) it writes
+--records records, of which the given fraction are replays of records already written, and reports:
+  - records/sec (log output included, sent to /dev/null)
+  - duplicates counted by the DAO (should equal the number of replays in every mode)
+
+Usage:
+  python -m benchmarks.idempotency [--ratios 0,0.1,0.5,0.9] [--records 20000] [--batch-size 100] [--json out.json]
+Needs a live MongoDB at MONGO_URI; uses DB `ingestion_bench`, dropped afterwards.
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from pymongo import MongoClient
+
+from app.config import cfg
+from app.db import WRITE_MODES, MongoDAO
+from app.logger import flush as flush_logs
+from benchmarks.common import dump_json, run_meta
+
+MONGO_DB = "ingestion_bench"
+SEEN_CACHE_SIZE = 100000
+
+
+def _records(n: int, dup_ratio: float) -> List[Dict[str, Any]]:
+    """n records; each is a replay of an earlier one with probability dup_ratio."""
+    out: List[Dict[str, Any]] = []
+    for i in range(n):
+        if out and random.random() < dup_ratio:
+            out.append(random.choice(out))
+        else:
+            out.append({"customerId": str(i % 100), "name": "Bench", "email": f"u{i}@example.com",
+                        "createdAt": "2024-03-26T12:00:00Z"})
+    return out
+
+
+def bench_one(client: MongoClient, records: List[Dict[str, Any]], mode: str, cache: bool,
+              batch_size: int) -> Dict[str, Any]:
+    client.drop_database(MONGO_DB)
+    dao = MongoDAO(cfg.MONGO_URI, MONGO_DB, cfg.MONGO_COLLECTION, client=client, write_mode=mode,
+                   seen_cache_size=SEEN_CACHE_SIZE if cache else 0)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        t0 = time.perf_counter()
+        if batch_size > 1:
+            for i in range(0, len(records), batch_size):
+                dao.insert_many(records[i:i + batch_size])
+        else:
+            for record in records:
+                dao.insert_record(record)
+        flush_logs()
+        elapsed = time.perf_counter() - t0
+    return {
+        "mode": mode,
+        "seen_cache": cache,
+        "records_per_sec": round(len(records) / elapsed, 1),
+        "duplicates": dao.duplicates,
+        "stored": dao.col.count_documents({}),
+    }
+
+
+def main(argv: List[str] | None = None) -> List[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ratios", default="0,0.1,0.5,0.9")
+    ap.add_argument("--records", type=int, default=20000)
+    ap.add_argument("--batch-size", type=int, default=100, help="1 = insert_record per record")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default=None, help="write results to this file")
+    args = ap.parse_args(argv)
+
+    client = MongoClient(cfg.MONGO_URI)
+    results = []
+    try:
+        for ratio in (float(x) for x in args.ratios.split(",") if x.strip()):
+            random.seed(args.seed)
+            records = _records(args.records, ratio)
+            for mode in WRITE_MODES:
+                for cache in (False, True):
+                    res = bench_one(client, records, mode, cache, args.batch_size)
+                    res["dup_ratio"] = ratio
+                    results.append(res)
+    finally:
+        client.drop_database(MONGO_DB)
+
+    print(f"{'dup_ratio':<10}{'mode':<8}{'cache':>6}{'records/sec':>14}{'duplicates':>12}{'stored':>9}")
+    for r in results:
+        print(f"{r['dup_ratio']:<10}{r['mode']:<8}{str(r['seen_cache']):>6}{r['records_per_sec']:>14}"
+              f"{r['duplicates']:>12}{r['stored']:>9}")
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": results})
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Compare the "zset" and "counter" rate limiter modes.
+
+For every limit it reports:
+  - Redis memory for one customer whose window is full (MEMORY USAGE)
+  - steady-state allow() ops/sec with the window kept full (each call prunes ~one entry)
+
+Usage:
+  python -m benchmarks.rate_limiter [--limits 5,100,1000,10000,100000] [--ops 5000] [--json out.json]
+Needs a live Redis at REDIS_URL; only keys under `bench:rate:*` are touched.
+"""
+from __future__ import annotations
+import argparse
+import time
+from typing import Any, Dict, List
+
+from redis import Redis
+
+from app.config import cfg
+from app.rate_limiter import ALGORITHMS, RateLimiter
+from benchmarks.common import dump_json, run_meta
+
+PREFIX = "bench:rate"
+WINDOW_SEC = 60
+FILL_CHUNK = 5000
+
+
+def _cleanup(redis: Redis) -> None:
+    for key in redis.scan_iter(f"{PREFIX}:*"):
+        redis.delete(key)
+
+
+def bench_one(redis: Redis, algorithm: str, limit: int, ops: int) -> Dict[str, Any]:
+    rl = RateLimiter(redis, limit=limit, window_sec=WINDOW_SEC, prefix=PREFIX, algorithm=algorithm)
+    cid = f"{algorithm}-{limit}"
+    window_ms = rl.window_ms
+    step = max(1, window_ms // limit)  # keeps the window exactly full while time advances
+    t = int(time.time() * 1000) - window_ms
+
+    # fill the window
+    filled = 0
+    while filled < limit:
+        n = min(FILL_CHUNK, limit - filled)
+        rl.allow_many([(cid, t + (filled + i) * step) for i in range(n)])
+        filled += n
+    t += filled * step
+    memory = redis.memory_usage(rl.key(cid)) or 0
+
+    start = time.perf_counter()
+    allowed = 0
+    for i in range(ops):
+        allowed += rl.allow(cid, t + i * step)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "algorithm": algorithm,
+        "limit": limit,
+        "memory_bytes": memory,
+        "ops_per_sec": round(ops / elapsed, 1),
+        "allowed_ratio": round(allowed / ops, 3),
+    }
+
+
+def main(argv: List[str] | None = None) -> List[Dict[str, Any]]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--limits", default="5,100,1000,10000,100000")
+    ap.add_argument("--ops", type=int, default=5000)
+    ap.add_argument("--json", default=None, help="write results to this file")
+    args = ap.parse_args(argv)
+
+    redis = Redis.from_url(cfg.REDIS_URL, decode_responses=False)
+    limits = [int(x) for x in args.limits.split(",") if x.strip()]
+    results = []
+    _cleanup(redis)
+    try:
+        for limit in limits:
+            for algorithm in ALGORITHMS:
+                results.append(bench_one(redis, algorithm, limit, args.ops))
+    finally:
+        _cleanup(redis)
+
+    print(f"{'algorithm':<10}{'limit':>10}{'memory_bytes':>15}{'ops/sec':>12}{'allowed':>10}")
+    for r in results:
+        print(f"{r['algorithm']:<10}{r['limit']:>10}{r['memory_bytes']:>15}{r['ops_per_sec']:>12}{r['allowed_ratio']:>10}")
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": results})
+    return results
+
+
+if __name__ == "__main__":
+    main()
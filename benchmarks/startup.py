@@ -0,0 +1,85 @@
+"""
+Cold start: time from process spawn to the first processed message.
+
+Each trial spawns a fresh interpreter that imports app.worker, builds a Worker, pushes one record and runs until it
+is processed. Phases (ms, from spawn):
+  import  interpreter start + `import app.worker`
+  init    clients + Worker() (MongoDAO checks/creates its index here)
+  first   Worker.run until the first message is handled (startup pings included)
+
+Usage:
+  python -m benchmarks.startup [--trials 5] [--backend fake|live] [--json out.json]
+With --backend live the bench DB is dropped first, so trial 1 includes the index build and later trials show a
+restart against an existing collection (what the supervisor and rolling deploys pay).
+"""
+from __future__ import annotations
+import argparse
+import json
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+from benchmarks.common import dump_json, percentile, run_meta
+
+MONGO_DB = "ingestion_bench"
+QUEUE_KEY = "bench:startup:queue"
+PHASES = ("import_ms", "init_ms", "first_ms", "total_ms")
+
+
+def child(backend: str, t0: float) -> Dict[str, float]:
+    from app import worker as worker_mod
+    t_import = time.time()
+    from app.config import cfg
+    from app.db import MongoDAO
+    from benchmarks.common import clients
+    redis, mongo = clients(backend)
+    dao = MongoDAO(cfg.MONGO_URI, MONGO_DB, cfg.MONGO_COLLECTION, client=mongo)
+    w = worker_mod.Worker(cfg.REDIS_URL, QUEUE_KEY, redis=redis, dao=dao)
+    t_init = time.time()
+    redis.delete(QUEUE_KEY)
+    redis.rpush(QUEUE_KEY, json.dumps({"customerId": f"s{t0}", "name": "Startup", "email": "startup@example.com",
+                                       "createdAt": "2024-03-26T12:00:00Z"}))
+    w.run(max_messages=1)
+    t_first = time.time()
+    return {"import_ms": (t_import - t0) * 1000, "init_ms": (t_init - t_import) * 1000,
+            "first_ms": (t_first - t_init) * 1000, "total_ms": (t_first - t0) * 1000}
+
+
+def trial(backend: str) -> Dict[str, float]:
+    t0 = time.time()
+    out = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", "--backend", backend,
+                          "--t0", repr(t0)], check=True, capture_output=True, text=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--trials", type=int, default=5)
+    ap.add_argument("--backend", choices=("fake", "live"), default="fake")
+    ap.add_argument("--json", default=None, help="write results to this file")
+    ap.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--t0", type=float, default=0.0, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(child(args.backend, args.t0)))
+        return {}
+    if args.backend == "live":
+        from benchmarks.common import clients
+        clients("live")[1].drop_database(MONGO_DB)
+
+    runs = [trial(args.backend) for _ in range(args.trials)]
+    summary = {p: {"first_trial": round(runs[0][p], 1), "p50": round(percentile([r[p] for r in runs], 50), 1)}
+               for p in PHASES}
+    print(f"{'phase':<11}{'trial 1':>10}{'p50':>10}")
+    for p in PHASES:
+        print(f"{p:<11}{summary[p]['first_trial']:>10}{summary[p]['p50']:>10}")
+    result = {"runs": runs, "summary": summary}
+    if args.json:
+        dump_json(args.json, {"meta": run_meta(**vars(args)), "results": result})
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+End-to-end benchmark of the ingestion hot path (pop -> validate -> rate-limit -> insert).
+
+Drives a real `Worker` over records from `generator.generate_record` and reports:
+  - records/sec for the whole run
+  - p50/p99 latency per stage call (pop, validate, rate_limit, insert)
+  - tracemalloc peak bytes and retained blocks per record (separate, smaller pass)
+
+Backends:
+  --backend fake  in-process stand-ins (fakeredis with Lua + mongomock; pip install -r requirements-bench.txt)
+  --backend live  REDIS_URL / MONGO_URI from config (uses DB `ingestion_bench`, dropped afterwards)
+
+Usage:
+  python -m benchmarks.worker --records 20000 --batch-size 100 --json out.json
+  python -m benchmarks.worker --json new.json --compare old.json
+  LOG_MODE=async LOG_SAMPLE=ingested=100 python -m benchmarks.worker   # logging settings come from the env
+"""
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import os
+import random
+import time
+import tracemalloc
+from typing import Any, Dict, List
+
+from app import worker as worker_mod
+from app.config import cfg
+from app.db import MongoDAO
+from app.logger import flush as flush_logs
+from app.queue_client import make_queue
+from app.worker import Worker
+from generator.generator import generate_record
+from benchmarks.common import clients, compare, dump_json, percentile, run_meta
+
+QUEUE_KEY = "bench:ingest:queue"
+MONGO_DB = "ingestion_bench"
+STAGES = ("pop", "validate", "rate_limit", "insert")
+
+
+def _timed(obj: Any, name: str, samples: List[float]) -> None:
+    """Shadow obj.name with a wrapper recording wall time per call."""
+    fn = getattr(obj, name)
+
+    def wrapped(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            samples.append(time.perf_counter() - t0)
+
+    setattr(obj, name, wrapped)
+
+
+def _cleanup(redis, mongo) -> None:
+    for key in redis.scan_iter("bench:*"):
+        redis.delete(key)
+    mongo.drop_database(MONGO_DB)
+
+
+def _fill(redis, records: int, customers: int, invalid_rate: float) -> None:
+    queue = make_queue(redis, QUEUE_KEY)
+    chunk: List[dict] = []
+    for i in range(records):
+        chunk.append(generate_record(str(random.randint(1, customers)), invalid_rate))
+        if len(chunk) == 1000:
+            queue.push_many(chunk)
+            chunk = []
+    queue.push_many(chunk)
+
+
+def _worker(redis, mongo, rate_limit: int) -> Worker:
+    dao = MongoDAO(cfg.MONGO_URI, MONGO_DB, cfg.MONGO_COLLECTION, client=mongo)
+    w = Worker(cfg.REDIS_URL, QUEUE_KEY, redis=redis, dao=dao)
+    w.ratelimiter.limit = rate_limit
+    return w
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    random.seed(args.seed)
+    redis, mongo = clients(args.backend)
+    _cleanup(redis, mongo)
+    devnull = open(os.devnull, "w")
+    samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    orig_validate = worker_mod._validate
+    try:
+        # throughput + per-stage latency
+        _fill(redis, args.records, args.customers, args.invalid_rate)
+        w = _worker(redis, mongo, args.rate_limit)
+        _timed(w.queue, "pop_many" if args.batch_size > 1 else "pop", samples["pop"])
+        _timed(w.ratelimiter, "check_many" if args.batch_size > 1 else "check", samples["rate_limit"])
+        _timed(w.dao, "insert_many" if args.batch_size > 1 else "insert_record", samples["insert"])
+        _timed(worker_mod, "_validate", samples["validate"])
+        with contextlib.redirect_stdout(devnull):  # keep log formatting cost, drop the output
+            t0 = time.perf_counter()
+            w.run(max_messages=args.records, batch_size=args.batch_size)
+            flush_logs()  # LOG_MODE=async: count the writer's backlog too
+            elapsed = time.perf_counter() - t0
+        worker_mod._validate = orig_validate
+        ingested = mongo[MONGO_DB][cfg.MONGO_COLLECTION].count_documents({})
+
+        # allocations (tracemalloc slows everything down; separate, smaller pass)
+        _cleanup(redis, mongo)
+        alloc_records = min(args.records, args.alloc_records)
+        _fill(redis, alloc_records, args.customers, args.invalid_rate)
+        w = _worker(redis, mongo, args.rate_limit)
+        with contextlib.redirect_stdout(devnull):
+            tracemalloc.start()
+            before = tracemalloc.take_snapshot()
+            w.run(max_messages=alloc_records, batch_size=args.batch_size)
+            flush_logs()
+            after = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        retained = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    finally:
+        worker_mod._validate = orig_validate
+        _cleanup(redis, mongo)
+        devnull.close()
+
+    stages = {}
+    for stage, values in samples.items():
+        stages[stage] = {
+            "calls": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 4),
+            "p99_ms": round(percentile(values, 99) * 1000, 4),
+            "total_s": round(sum(values), 4),
+        }
+    return {
+        "meta": run_meta(**vars(args)),
+        "records": args.records,
+        "ingested": ingested,
+        "elapsed_s": round(elapsed, 4),
+        "records_per_sec": round(args.records / elapsed, 1),
+        "stages": stages,
+        "alloc": {
+            "records": alloc_records,
+            "peak_bytes_per_record": round(peak / max(1, alloc_records), 1),
+            "retained_blocks_per_record": round(retained / max(1, alloc_records), 3),
+        },
+    }
+
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--backend", choices=("fake", "live"), default="fake")
+    ap.add_argument("--records", type=int, default=10000)
+    ap.add_argument("--batch-size", type=int, default=cfg.WORKER_BATCH_SIZE)
+    ap.add_argument("--customers", type=int, default=100)
+    ap.add_argument("--invalid-rate", type=float, default=cfg.GEN_INVALID_RATE)
+    ap.add_argument("--rate-limit", type=int, default=10**9, help="per-customer limit; default effectively unlimited")
+    ap.add_argument("--alloc-records", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", default=None, help="write machine-readable results here")
+    ap.add_argument("--compare", default=None, help="previous --json output to diff against")
+    args = ap.parse_args(argv)
+
+    res = run(args)
+    print(f"records/sec: {res['records_per_sec']}  ({res['records']} records, {res['ingested']} ingested, {res['elapsed_s']}s)")
+    print(f"{'stage':<12}{'calls':>8}{'p50_ms':>10}{'p99_ms':>10}{'total_s':>10}")
+    for stage, st in res["stages"].items():
+        print(f"{stage:<12}{st['calls']:>8}{st['p50_ms']:>10}{st['p99_ms']:>10}{st['total_s']:>10}")
+    print(f"alloc: {res['alloc']}")
+    if args.json:
+        dump_json(args.json, res)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        keys = ["records_per_sec", "alloc.peak_bytes_per_record", "alloc.retained_blocks_per_record"]
+        keys += [f"stages.{s}.{m}" for s in STAGES for m in ("p50_ms", "p99_ms")]
+        print(f"{'metric':<40}{'old':>14}{'new':>14}{'delta':>10}")
+        print("\n".join(compare(old, res, keys)))
+    return res
+
+
+if __name__ == "__main__":
+    main()
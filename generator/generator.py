@@ -1,5 +1,4 @@
 from __future__ import annotations
-import json
 import os
 import random
 import time
@@ -10,6 +9,7 @@ from redis import Redis
 
 from app.logger import get_logger
 from app.config import cfg
+from app.queue_client import make_queue
 
 log = get_logger()
 
@@ -128,11 +128,16 @@ def generate_record(customer_id: str, invalid_rate: float) -> dict:
 # ------------------------------
 def main():
     redis = Redis.from_url(cfg.REDIS_URL, decode_responses=False)
-    queue_key = cfg.QUEUE_KEY
+    # same backend as the worker (list RPUSH or stream XADD sharded by customerId)
+    queue = make_queue(redis, cfg.QUEUE_KEY)
 
     customers: List[str] = [c.strip() for c in cfg.GEN_CUSTOMERS.split(",") if c.strip()]
+    noisy: List[str] = [c.strip() for c in cfg.GEN_NOISY_CUSTOMERS.split(",") if c.strip()]
+    customers += [c for c in noisy if c not in customers]
     rpm = max(1, int(cfg.GEN_RPM))
     per_customer_interval = 60.0 / rpm
+    # noisy neighbors flood the queue; emitted in bursts so rates above 1 per loop tick are reachable
+    interval = {c: 60.0 / max(1, int(cfg.GEN_NOISY_RPM)) if c in noisy else per_customer_interval for c in customers}
     jitter_ms = int(cfg.GEN_JITTER_MS)
     invalid_rate = max(0.0, min(1.0, float(cfg.GEN_INVALID_RATE)))
 
@@ -145,6 +150,8 @@ def main():
         customers=customers,
         rpm=rpm,
         interval=per_customer_interval,
+        noisy=noisy,
+        noisy_rpm=cfg.GEN_NOISY_RPM if noisy else None,
         invalid_rate=invalid_rate,
     )
     next_emit = {c: time.time() for c in customers}
@@ -152,9 +159,17 @@ def main():
     while True:
         now = time.time()
         for c in customers:
+            if c in noisy:
+                # catch up on every emit due since the last tick, in one pipelined push
+                due = int((now - next_emit[c]) / interval[c]) + 1 if now >= next_emit[c] else 0
+                if due:
+                    queue.push_many([generate_record(c, invalid_rate) for _ in range(due)])
+                    next_emit[c] += due * interval[c]
+                    log.info("queued", customerId=c, count=due)
+                continue
             if now >= next_emit[c]:
                 payload = generate_record(c, invalid_rate)
-                redis.rpush(queue_key, json.dumps(payload).encode("utf-8"))
+                queue.push(payload)
 
                 jitter = random.uniform(-jitter_ms / 1000.0, jitter_ms / 1000.0) if jitter_ms > 0 else 0.0
                 next_emit[c] = now + max(0.1, per_customer_interval + jitter)
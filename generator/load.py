@@ -0,0 +1,300 @@
+"""
+Open-loop load generator: pushes records at a fixed target rate, whatever the worker does.
+
+The schedule is time-based (record n is due at n / rate seconds); when a push falls behind, the due records are sent
+in the next batch instead of being dropped or slowing the schedule, and the lag is reported. Records go out through
+the configured queue backend's push_many (one pipelined round trip per batch).
+
+Customers are drawn from a large id space (c0..c<N-1>) by one of:
+  uniform  every customer equally likely
+  zipf     rank k has weight 1/k^s (continuous approximation, O(1) memory for any N)
+  bursty   every --burst-period-sec a fresh random set of --burst-customers gets --burst-share of the traffic
+
+--steps replaces the single rate with a sequence of rate:seconds steps (e.g. a quiet period, a spike, a drain), to
+watch the worker's autoscaler react; the report then lists the achieved rate per step.
+
+Usage:
+  python -m generator.load --rate 50000 --duration 30 --customers 1000000 --distribution zipf --processes 4
+  python -m generator.load --per-customer-rate 2 --customers 5000 --duplicate-ratio 0.1 --json load.json
+  python -m generator.load --steps 500:20,20000:30,0:20,2000:20 --customers 10000
+"""
+from __future__ import annotations
+import argparse
+import json
+import multiprocessing as mp
+import random
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from redis import Redis
+
+from app.config import cfg
+from app.queue_client import make_queue
+from generator.generator import maybe_invalid_created_at, maybe_invalid_email
+
+DISTRIBUTIONS = ("uniform", "zipf", "bursty")
+# replays are drawn from this many recent records
+DUPLICATE_POOL = 10000
+
+
+def parse_steps(spec: str) -> List[Tuple[float, float]]:
+    """"500:20,20000:30" -> [(records/sec, seconds), ...]"""
+    steps = []
+    for part in spec.split(","):
+        rate, _, seconds = part.strip().partition(":")
+        steps.append((float(rate), float(seconds)))
+        if steps[-1][0] < 0 or steps[-1][1] <= 0:
+            raise ValueError(f"bad step {part!r}; expected rate:seconds with rate >= 0 and seconds > 0")
+    return steps
+
+
+class Schedule:
+    """Piecewise-constant rate: how many records are due `t` seconds into the run."""
+    def __init__(self, steps: Sequence[Tuple[float, float]]):
+        self.steps = list(steps)
+        self.total = int(round(sum(rate * seconds for rate, seconds in self.steps)))
+
+    def index(self, t: float) -> int:
+        for i, (_, seconds) in enumerate(self.steps):
+            if t < seconds:
+                return i
+            t -= seconds
+        return len(self.steps) - 1
+
+    def rate_at(self, t: float) -> float:
+        return self.steps[self.index(t)][0]
+
+    def due(self, t: float) -> float:
+        done = 0.0
+        for rate, seconds in self.steps:
+            if t < seconds:
+                return done + rate * t
+            done += rate * seconds
+            t -= seconds
+        return done
+
+
+def zipf_sampler(n: int, s: float, rng: random.Random) -> Callable[[], int]:
+    """Rank in [0, n) with P(k) ~ 1/(k+1)^s, by inverting the continuous power-law CDF."""
+    if n <= 1:
+        return lambda: 0
+    if abs(s - 1.0) < 1e-9:
+        return lambda: min(n - 1, int(n ** rng.random()) - 1)
+    a = 1.0 - s
+    top = n ** a - 1.0
+    return lambda: min(n - 1, int((top * rng.random() + 1.0) ** (1.0 / a)) - 1)
+
+
+def make_sampler(args: argparse.Namespace, rng: random.Random) -> Callable[[float], int]:
+    """customer index for a record sent `t` seconds into the run."""
+    n = args.customers
+    if args.distribution == "zipf":
+        zipf = zipf_sampler(n, args.zipf_s, rng)
+        return lambda t: zipf()
+    if args.distribution == "bursty":
+        state = {"period": -1, "hot": []}
+
+        def bursty(t: float) -> int:
+            period = int(t / args.burst_period_sec)
+            if period != state["period"]:
+                # same hot set in every process: seeded by the period, not the process
+                state["period"] = period
+                state["hot"] = random.Random(args.seed * 1000003 + period).sample(range(n), min(n, args.burst_customers))
+            if state["hot"] and rng.random() < args.burst_share:
+                return rng.choice(state["hot"])
+            return rng.randrange(n)
+        return bursty
+    return lambda t: rng.randrange(n)
+
+
+class RecordFactory:
+    """
+    Cheap records for large customer sets: identity is derived from the id (no per-customer cache), createdAt is
+    formatted once per batch and made unique with a per-process microsecond sequence.
+    """
+    def __init__(self, process_index: int, processes: int, invalid_rate: float, rng: random.Random):
+        self.offset = process_index
+        self.stride = processes
+        self.invalid_rate = invalid_rate
+        self.rng = rng
+        self.seq = 0
+
+    def batch(self, customer_ids: List[str]) -> List[Dict[str, Any]]:
+        base = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+        out = []
+        for cid in customer_ids:
+            micro = (self.seq * self.stride + self.offset) % 1000000
+            self.seq += 1
+            record = {"customerId": cid, "name": f"Load {cid}", "email": f"{cid}@load.example.com",
+                      "createdAt": f"{base}.{micro:06d}Z"}
+            if self.invalid_rate and self.rng.random() < self.invalid_rate:
+                field = self.rng.choice(["email", "createdAt", "name", "customerId"])
+                if field == "email":
+                    record["email"] = maybe_invalid_email(record["email"])
+                elif field == "createdAt":
+                    record["createdAt"] = maybe_invalid_created_at()
+                elif field == "name":
+                    record["name"] = " "
+                else:
+                    record["customerId"] = ""
+            out.append(record)
+        return out
+
+
+def run_process(queue, args: argparse.Namespace, process_index: int = 0, processes: int = 1) -> Dict[str, Any]:
+    """Push this process's share (1/processes) of the args.steps schedule; returns this process's counters."""
+    schedule = Schedule([(rate / processes, seconds) for rate, seconds in args.steps])
+    rng = random.Random(args.seed * 7919 + process_index)
+    sample = make_sampler(args, rng)
+    factory = RecordFactory(process_index, processes, args.invalid_rate, rng)
+    recent: Deque[Dict[str, Any]] = deque(maxlen=DUPLICATE_POOL)
+    per_customer: Counter = Counter()
+    step_sent = [0] * len(schedule.steps)
+    sent = duplicates = pushes = 0
+    max_lag = 0.0
+    push_time = 0.0
+
+    total = schedule.total
+    start = time.perf_counter()
+    while sent < total:
+        elapsed = time.perf_counter() - start
+        due_now = schedule.due(elapsed)
+        rate = schedule.rate_at(elapsed)
+        due = min(int(due_now) + 1, total) - sent
+        if due <= 0:
+            # sleep until the next record is due (short naps keep the schedule tight at low rates)
+            time.sleep(max(0.0, min((sent + 1 - due_now) / rate, 0.01)) if rate else 0.01)
+            continue
+        if rate:
+            max_lag = max(max_lag, (due_now - sent) / rate)
+        n = min(due, args.batch_size)
+        fresh_ids = []
+        batch: List[Dict[str, Any]] = []
+        for _ in range(n):
+            if recent and rng.random() < args.duplicate_ratio:
+                batch.append(rng.choice(recent))
+                duplicates += 1
+            else:
+                fresh_ids.append(f"c{sample(elapsed)}")
+        fresh = factory.batch(fresh_ids)
+        recent.extend(fresh)
+        batch.extend(fresh)
+        t0 = time.perf_counter()
+        queue.push_many(batch)
+        push_time += time.perf_counter() - t0
+        pushes += 1
+        sent += n
+        step_sent[schedule.index(elapsed)] += n
+        per_customer.update(r.get("customerId", "") for r in batch)
+    wall = time.perf_counter() - start
+    return {"sent": sent, "duplicates": duplicates, "pushes": pushes, "wall_s": wall, "push_s": push_time,
+            "max_lag_s": max_lag, "customers": per_customer, "step_sent": step_sent}
+
+
+def _child(index: int, processes: int, args: argparse.Namespace, results) -> None:
+    queue = make_queue(Redis.from_url(cfg.REDIS_URL, decode_responses=False), args.queue_key)
+    res = run_process(queue, args, index, processes)
+    res["customers"] = dict(res["customers"].most_common(args.top))
+    results.put(res)
+
+
+def report(args: argparse.Namespace, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    sent = sum(p["sent"] for p in parts)
+    wall = max((p["wall_s"] for p in parts), default=0.0)
+    top: Counter = Counter()
+    for p in parts:
+        top.update(p["customers"])
+    per_customer_target = args.rate / args.customers
+    return {
+        "target_rate": round(args.rate, 1),
+        "achieved_rate": round(sent / wall, 1) if wall else 0.0,
+        "achieved_pct": round(sent / wall / args.rate * 100.0, 1) if wall and args.rate else 0.0,
+        "sent": sent,
+        "duplicates": sum(p["duplicates"] for p in parts),
+        "pushes": sum(p["pushes"] for p in parts),
+        "avg_batch": round(sent / max(1, sum(p["pushes"] for p in parts)), 1),
+        "push_busy_pct": round(max((p["push_s"] / p["wall_s"] for p in parts if p["wall_s"]), default=0.0) * 100, 1),
+        "max_lag_ms": round(max((p["max_lag_s"] for p in parts), default=0.0) * 1000, 1),
+        "per_customer_target_rate": round(per_customer_target, 4),
+        "top_customers": [{"customerId": c, "rate": round(n / wall, 2) if wall else 0.0}
+                          for c, n in top.most_common(args.top)],
+        "steps": [{"target_rate": rate, "seconds": seconds,
+                   "achieved_rate": round(sum(p["step_sent"][i] for p in parts) / seconds, 1)}
+                  for i, (rate, seconds) in enumerate(args.steps)],
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rate", type=float, default=None, help="total records/sec (default: --per-customer-rate * N)")
+    ap.add_argument("--per-customer-rate", type=float, default=None, help="records/sec per customer (uniform mean)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds")
+    ap.add_argument("--steps", default=None, help="rate:seconds,... load steps (replaces --rate/--duration)")
+    ap.add_argument("--customers", type=int, default=1000)
+    ap.add_argument("--distribution", choices=DISTRIBUTIONS, default="uniform")
+    ap.add_argument("--zipf-s", type=float, default=1.1)
+    ap.add_argument("--burst-customers", type=int, default=10)
+    ap.add_argument("--burst-share", type=float, default=0.8, help="bursty: fraction of traffic to the hot set")
+    ap.add_argument("--burst-period-sec", type=float, default=5.0)
+    ap.add_argument("--duplicate-ratio", type=float, default=0.0, help="fraction of exact replays of recent records")
+    ap.add_argument("--invalid-rate", type=float, default=cfg.GEN_INVALID_RATE)
+    ap.add_argument("--batch-size", type=int, default=500, help="max records per pipelined push")
+    ap.add_argument("--processes", type=int, default=1)
+    ap.add_argument("--queue-key", default=cfg.QUEUE_KEY)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--top", type=int, default=5, help="busiest customers listed in the report")
+    ap.add_argument("--json", default=None, help="write the report to this file")
+    args = ap.parse_args(argv)
+    if args.steps is not None:
+        try:
+            args.steps = parse_steps(args.steps)
+        except ValueError as e:
+            ap.error(str(e))
+        # reported target: the mean rate over the whole run
+        args.duration = sum(seconds for _, seconds in args.steps)
+        args.rate = sum(rate * seconds for rate, seconds in args.steps) / args.duration
+    else:
+        if args.rate is None:
+            if args.per_customer_rate is None:
+                ap.error("one of --rate / --per-customer-rate / --steps is required")
+            args.rate = args.per_customer_rate * args.customers
+        args.steps = [(args.rate, args.duration)]
+    if args.rate <= 0 or args.customers <= 0:
+        ap.error("--rate and --customers must be positive")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    args = parse_args(argv)
+    processes = max(1, args.processes)
+    if processes == 1:
+        queue = make_queue(Redis.from_url(cfg.REDIS_URL, decode_responses=False), args.queue_key)
+        parts = [run_process(queue, args)]
+    else:
+        results = mp.Queue()
+        procs = [mp.Process(target=_child, args=(i, processes, args, results), daemon=True) for i in range(processes)]
+        for p in procs:
+            p.start()
+        parts = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+    out = report(args, parts)
+
+    print(f"target {out['target_rate']}/s  achieved {out['achieved_rate']}/s ({out['achieved_pct']}%)  "
+          f"sent {out['sent']}  dup {out['duplicates']}  avg batch {out['avg_batch']}  "
+          f"max lag {out['max_lag_ms']} ms  push busy {out['push_busy_pct']}%")
+    print(f"per-customer target {out['per_customer_target_rate']}/s; busiest: "
+          + ", ".join(f"{c['customerId']}={c['rate']}/s" for c in out["top_customers"]))
+    if len(out["steps"]) > 1:
+        print("steps: " + ", ".join(f"{s['target_rate']:g}/s x {s['seconds']:g}s -> {s['achieved_rate']}/s"
+                                    for s in out["steps"]))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": vars(args), "report": out}, f, indent=2, sort_keys=True)
+    return out
+
+
+if __name__ == "__main__":
+    main()
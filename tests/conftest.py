@@ -22,16 +22,18 @@ def test_cfg():
 def cleanup_redis_mongo(test_cfg):
     r = Redis.from_url(test_cfg.REDIS_URL, decode_responses=False)
     r.delete(test_cfg.QUEUE_KEY)
-    # clean rate keys
-    for key in r.scan_iter("rate:*"):
-        r.delete(key)
+    # clean rate keys and queue side keys (processing lists, heartbeats, ...)
+    for pattern in ("rate:*", f"{test_cfg.QUEUE_KEY}:*"):
+        for key in r.scan_iter(pattern):
+            r.delete(key)
 
     mc = MongoClient(test_cfg.MONGO_URI)
     mc.drop_database(test_cfg.MONGO_DB)
     yield
     r.delete(test_cfg.QUEUE_KEY)
-    for key in r.scan_iter("rate:*"):
-        r.delete(key)
+    for pattern in ("rate:*", f"{test_cfg.QUEUE_KEY}:*"):
+        for key in r.scan_iter(pattern):
+            r.delete(key)
     mc.drop_database(test_cfg.MONGO_DB)
 
 @pytest.fixture
@@ -46,5 +48,10 @@ def mongo_dao(test_cfg):
 def worker(test_cfg):
     return Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY)
 
+def record(customer_id="1", **fields):
+    """A valid queue payload for `customer_id`; keyword arguments override fields (createdAt=..., email=...)."""
+    return {"customerId": str(customer_id), "name": "A", "email": "a@example.com",
+            "createdAt": "2024-03-26T12:00:00Z", **fields}
+
 def push(redis_client, key, item):
     redis_client.rpush(key, json.dumps(item).encode("utf-8"))
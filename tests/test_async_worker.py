@@ -0,0 +1,24 @@
+import asyncio, json
+from app.async_worker import AsyncWorker
+from app.config import Config
+
+def test_async_worker_processes_valid_and_rejects_invalid(test_cfg, redis_client, mongo_dao):
+    q = Config().QUEUE_KEY
+    redis_client.rpush(q, json.dumps({
+        "customerId":"1","name":"John Doe","email":"john@example.com","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, json.dumps({
+        "customerId":"2","name":"Jane","email":"invalid.email","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, b'{"bad_json": ')
+    for ts in ("2024-03-26T12:00:00Z", "2024-03-26T12:00:30Z"):
+        redis_client.rpush(q, json.dumps({
+            "customerId":"3","name":"A","email":"a@example.com","createdAt":ts
+        }).encode("utf-8"))
+
+    w = AsyncWorker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY, concurrency=4)
+    w.ratelimiter.limit = 1
+    asyncio.run(w.run(max_messages=5))
+
+    assert w.inflight == 0
+    assert mongo_dao.col.count_documents({}) == 2
@@ -0,0 +1,35 @@
+from app.autoscaler import AIMDController, Autoscaler
+from app.metrics import WorkerMetrics
+from app.worker import Worker
+from tests.conftest import push
+
+def test_aimd_grows_on_backlog_and_backs_off_on_slow_writes():
+    c = AIMDController(8, lo=1, hi=20, step=4, decrease=0.5, latency_target_ms=50, depth_high=100, depth_low=0)
+    assert c.decide(500, 10.0) == (12, "increase")
+    assert c.decide(500, None) == (16, "increase")
+    assert c.decide(500, 10.0) == (20, "increase")
+    assert c.decide(500, 10.0) == (20, "hold")  # at the upper bound
+    assert c.decide(500, 80.0) == (10, "backoff")
+    assert c.decide(500, 80.0) == (10, "hold")  # cooldown: that sample straddled the change
+    assert c.decide(500, 80.0) == (5, "backoff")
+    c.decide(0, None)
+    assert c.decide(50, None) == (5, "hold")  # some backlog, fast writes
+    assert c.decide(0, None) == (1, "decrease")  # idle
+    assert c.decide(0, None) == (1, "hold")
+
+def test_autoscaler_drives_worker_batch_size(test_cfg, redis_client):
+    m = WorkerMetrics()
+    w = Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY, metrics=m)
+    w.batch_size = 1
+    scaler = Autoscaler(AIMDController(1, lo=1, hi=64, step=10, latency_target_ms=100, depth_high=5), w,
+                        "batch_size", w.queue.depth, m)
+    scaler.register_gauges()
+    for i in range(20):
+        push(redis_client, test_cfg.QUEUE_KEY, {"customerId": str(i), "name": "A", "email": f"a{i}@example.com",
+                                                "createdAt": "2024-03-26T12:00:00Z"})
+    assert scaler.tick() == "increase" and w.batch_size == 11
+
+    m.observe("insert", 0.3)  # Mongo slowed down
+    assert scaler.tick() == "backoff" and w.batch_size == 5
+    assert "ingest_autoscale_value 5" in m.registry.render()
+    assert "ingest_autoscale_backoff_ticks_total 1" in m.registry.render()
@@ -0,0 +1,8 @@
+from benchmarks.common import percentile
+
+def test_percentile_is_nearest_rank():
+    values = list(range(10, 0, -1))  # 1..10, unsorted
+    assert [percentile(values, q) for q in (0, 10, 50, 90, 99, 100)] == [1, 1, 5, 9, 10, 10]
+    assert percentile(range(1, 101), 7) == 7
+    assert percentile([3.0], 50) == 3.0
+    assert percentile([], 99) == 0.0
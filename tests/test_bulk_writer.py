@@ -0,0 +1,56 @@
+import dataclasses, json, time
+from app import worker as worker_mod
+from app.db import BulkMongoWriter
+from app.worker import Worker
+from tests.conftest import record
+
+def test_flushes_by_size_and_reports_duplicates(mongo_dao):
+    flushed = []
+    writer = BulkMongoWriter(mongo_dao, max_docs=3, max_age_ms=60000,
+                             on_flush=lambda ctxs, ids, sec: flushed.append((ctxs, ids)))
+    writer.add(record(1), "a")
+    writer.add(record(2), "b")
+    assert mongo_dao.col.count_documents({}) == 0
+    writer.add(record(1), "c")  # duplicate of "a": same deterministic _id
+
+    assert mongo_dao.col.count_documents({}) == 2
+    assert mongo_dao.duplicates == 1
+    ctxs, ids = flushed[0]
+    assert ctxs == ["a", "b", "c"]
+    assert ids[0] == ids[2]
+    writer.close()
+
+def test_flushes_by_age_and_on_close(mongo_dao):
+    writer = BulkMongoWriter(mongo_dao, max_docs=100, max_age_ms=20)
+    writer.add(record(1))
+    deadline = time.time() + 2
+    while mongo_dao.col.count_documents({}) == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert mongo_dao.col.count_documents({}) == 1
+
+    writer.max_age = 60
+    writer.add(record(2))
+    writer.close()
+    assert mongo_dao.col.count_documents({}) == 2
+
+def test_memory_bound_forces_flush(mongo_dao):
+    writer = BulkMongoWriter(mongo_dao, max_docs=1000, max_age_ms=60000, max_bytes=1)
+    writer.add(record(1))
+    assert writer.pending == 0
+    assert mongo_dao.col.count_documents({}) == 1
+    writer.close()
+
+def test_worker_buffers_and_flushes_on_exit(test_cfg, redis_client, mongo_dao, monkeypatch):
+    monkeypatch.setattr(worker_mod, "cfg", dataclasses.replace(test_cfg, MONGO_BUFFER_DOCS=100,
+                                                               MONGO_BUFFER_MAX_AGE_MS=60000))
+    w = Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY)
+    for i in range(3):
+        redis_client.rpush(test_cfg.QUEUE_KEY, json.dumps(record(i)).encode("utf-8"))
+    redis_client.rpush(test_cfg.QUEUE_KEY, b'{"bad_json": ')
+
+    assert [w.process_one() for _ in range(2)] == [True, True]
+    assert mongo_dao.col.count_documents({}) == 0  # buffered, not yet written
+
+    w.run(max_messages=2)  # exit path flushes what is left
+    assert w.writer.pending == 0
+    assert mongo_dao.col.count_documents({}) == 3
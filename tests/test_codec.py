@@ -0,0 +1,35 @@
+import pytest
+from app import codec
+from app.queue_client import QueueClient
+
+RECORD = {"customerId": "c1", "name": "Ann Lee", "email": "ann@example.com", "createdAt": "2024-03-26T12:00:00Z"}
+
+@pytest.mark.parametrize("name", ["json", "orjson", "compact"])
+def test_roundtrip(name):
+    encode = codec.get_encoder(name)
+    assert codec.decode(encode(RECORD)) == RECORD
+    extra = dict(RECORD, _attempt=2)
+    assert codec.decode(encode(extra)) == extra
+
+def test_msgpack_roundtrip():
+    pytest.importorskip("msgpack")
+    raw = codec.get_encoder("msgpack")(RECORD)
+    assert raw[0] == codec.MSGPACK and codec.decode(raw) == RECORD
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        codec.get_encoder("xml")
+
+@pytest.mark.parametrize("raw", [b"not json", b"[1, 2]", b"\x02{bad", b"\x01\xc1", b""])
+def test_garbage_is_a_parse_error(raw):
+    item = codec.decode(raw)
+    assert item["__parse_error__"] is True and "__raw__" in item
+
+def test_mixed_formats_drain_from_one_queue(redis_client):
+    key = "test:codec:queue"
+    redis_client.delete(key)
+    redis_client.rpush(key, *[codec.get_encoder(name)(dict(RECORD, customerId=name))
+                              for name in ("json", "orjson", "compact")], b"garbage")
+    items = [item for _, item in QueueClient(redis_client, key).pop_many(10, 1)]
+    assert [i.get("customerId") for i in items[:3]] == ["json", "orjson", "compact"]
+    assert items[3]["__parse_error__"] is True
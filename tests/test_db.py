@@ -0,0 +1,96 @@
+import pytest
+from datetime import datetime
+from app.db import MongoDAO
+from app.migrate_ids import migrate
+from tests.conftest import record
+
+@pytest.mark.parametrize("mode", ["insert", "upsert"])
+def test_duplicates_counted_in_every_mode(test_cfg, mode):
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, write_mode=mode)
+    first = dao.insert_record(record(1))
+    assert dao.insert_record(record(1)) == first
+    ids = dao.insert_many([record(1), record(2), record(2), record(3)])
+
+    assert ids[0] == first and ids[1] == ids[2]
+    assert dao.col.count_documents({}) == 3
+    assert dao.duplicates == 3  # replayed record 1 twice, record 2 repeated within the batch
+
+def test_upsert_keeps_first_write(test_cfg):
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, write_mode="upsert")
+    _id = dao.insert_record(record(1))
+    dao.insert_many([dict(record(1), name="B")])  # same deterministic _id, different body
+    assert dao.col.find_one({"_id": _id})["name"] == "A"
+
+def test_seen_cache_skips_known_ids(test_cfg):
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, seen_cache_size=100)
+    dao.insert_many([record(1), record(2)])
+    dao.col.delete_many({})  # would be re-inserted if it reached Mongo
+    dao.insert_many([record(1), record(2), record(3)])
+    assert dao.col.count_documents({}) == 1
+    assert dao.duplicates == 2
+    assert dao.seen.hits == 2
+
+def test_unknown_write_mode(test_cfg):
+    with pytest.raises(ValueError):
+        MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, write_mode="replace")
+
+def test_binary_ids_and_legacy_lookup(test_cfg):
+    legacy = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION)
+    hex_id = legacy.insert_record(record(1))
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, id_format="binary")
+    ids = dao.insert_many([record(2), record(2)])
+
+    assert len(hex_id) == 64 and len(ids[0]) == 32 and ids[0] == ids[1]
+    assert dao.duplicates == 1
+    assert dao.find_by_id(hex_id)["customerId"] == "1"
+    assert dao.find_by_id(ids[0])["customerId"] == "2"
+    assert dao.find_by_id("z" * 32) is None  # 32 chars but not hex
+    assert dao.find_record(record(1))["customerId"] == "1"
+    assert dao.find_record(record(2))["customerId"] == "2"
+
+def test_migrate_hex_ids(test_cfg):
+    legacy = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION)
+    legacy.insert_many([record(i) for i in range(5)])
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, id_format="binary")
+
+    assert migrate(dao, batch_size=2) == 5
+    assert dao.col.count_documents({"_id": {"$type": "string"}}) == 0
+    assert dao.col.count_documents({}) == 5
+    dao.insert_record(record(3))  # replay after migration is a duplicate again
+    assert dao.duplicates == 1
+
+def test_monthly_partitions_route_find_and_retire(test_cfg):
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, partition="monthly")
+    dao.insert_many([record(1, createdAt="2024-01-15T00:00:00Z"), record(2, createdAt="2024-02-15T00:00:00Z"),
+                     record(3, createdAt="2024-02-29T23:30:00-05:00")])  # 2024-03-01 in UTC
+    dao.insert_record(record(1, createdAt="2024-01-15T00:00:00Z"))  # replay routes to the same partition
+    base = test_cfg.MONGO_COLLECTION
+
+    assert dao.partitions() == [f"{base}_202401", f"{base}_202402", f"{base}_202403"]
+    assert dao.duplicates == 1
+    assert [d["customerId"] for d in dao.find()] == ["3", "2", "1"]
+    assert [d["customerId"] for d in dao.find(start=datetime(2024, 2, 1), end=datetime(2024, 2, 28))] == ["2"]
+    assert dao.find_record(record(3, createdAt="2024-02-29T23:30:00-05:00"))["customerId"] == "3"
+
+    retired = dao.apply_retention(keep=2, action="archive", now=datetime(2024, 3, 10))
+    assert retired == [f"{base}_202401"]
+    assert dao.partitions() == [f"{base}_202402", f"{base}_202403"]
+    assert f"archive_{base}_202401" in dao.db.list_collection_names()
+    assert dao.apply_retention(keep=1, action="drop", now=datetime(2024, 3, 10)) == [f"{base}_202402"]
+
+def test_partition_routing_accepts_what_validation_accepts(test_cfg):
+    dao = MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION, partition="monthly")
+    recs = [record(1, createdAt="2024-01-31T24:00:00Z"),  # 2024-02-01T00:00 UTC
+            record(2, createdAt="2024-03-31T22:00:00-05:45"),  # 2024-04-01T03:45 UTC
+            record(3, createdAt="2024-03-26T12:00:00+0530"),
+            record(4, createdAt="not a date")]  # never validated: fixed fallback, no exception mid-batch
+    assert len(dao.insert_many(recs)) == 4
+    base = test_cfg.MONGO_COLLECTION
+
+    assert dao.partitions() == [f"{base}_202402", f"{base}_202403", f"{base}_202404"]
+    assert dao.col.count_documents({}) == 1  # the unparseable one, in the base collection
+    for rec in recs:
+        assert dao.find_record(rec)["customerId"] == rec["customerId"]
+    dao.insert_many(recs)  # replays route to the same places
+    assert dao.duplicates == 4
+    assert sorted(d["customerId"] for d in dao.find()) == ["1", "2", "3", "4"]
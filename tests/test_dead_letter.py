@@ -0,0 +1,91 @@
+import dataclasses, json, time
+import pytest
+from pymongo.errors import AutoReconnect
+from app import dead_letter as dead_letter_mod, worker as worker_mod
+from app.dead_letter import ATTEMPT_FIELD, DeadLetterQueue
+from app.worker import Worker
+from tests.conftest import push, record
+
+def _delayed(redis_client, dlq):
+    return [(json.loads(m), s) for m, s in redis_client.zrange(dlq.delay_key, 0, -1, withscores=True)]
+
+def test_rate_limited_records_are_deferred_spaced_and_moved_back(test_cfg, redis_client, worker):
+    worker.dlq = dlq = DeadLetterQueue(redis_client, test_cfg.QUEUE_KEY)
+    for i in range(7):
+        push(redis_client, test_cfg.QUEUE_KEY, record("c1", email=f"u{i}@example.com"))
+    now = int(time.time() * 1000)
+    assert worker.process_batch(10) == [True] * 5 + [False] * 2  # limit 5 per 60s
+
+    delayed = _delayed(redis_client, dlq)
+    assert [e["item"][ATTEMPT_FIELD] for e, _ in delayed] == [1, 1]
+    assert {e["reason"] for e, _ in delayed} == {"rate_limited"}
+    first, second = (s for _, s in delayed)
+    assert first >= now + 60000 - 1000 and second - first == 12000  # window / limit apart
+
+    assert dlq.move_due(worker.queue) == 0  # not due yet
+    assert dlq.move_due(worker.queue, now_ms=int(second)) == 2
+    assert dlq.depth() == {"delayed": 0, "dead": 0}
+    assert [item[ATTEMPT_FIELD] for _, item in worker.queue.pop_many(10, timeout=1)] == [1, 1]
+
+def test_failed_writes_back_off_then_dead_letter(test_cfg, redis_client, worker, monkeypatch):
+    worker.dlq = dlq = DeadLetterQueue(redis_client, test_cfg.QUEUE_KEY, max_attempts=2, backoff_base_ms=1000)
+    def down(payload):
+        raise AutoReconnect("mongo down")
+    monkeypatch.setattr(worker.dao, "insert_record", down)
+
+    push(redis_client, test_cfg.QUEUE_KEY, record("c2"))
+    now = int(time.time() * 1000)
+    assert worker.process_one() is False
+    [(entry, due)] = _delayed(redis_client, dlq)
+    assert entry["reason"] == "AutoReconnect" and now + 500 <= due <= now + 1100
+
+    for attempt in (2, 3):
+        assert dlq.move_due(worker.queue, now_ms=int(due)) == 1
+        assert worker.process_one() is False
+        if attempt == 2:
+            [(_, due)] = _delayed(redis_client, dlq)
+    assert dlq.depth() == {"delayed": 0, "dead": 1}
+    assert dlq.backoff_ms(3) in range(2000, 4001)
+
+    monkeypatch.undo()
+    assert dlq.requeue_dead(worker.queue) == 1
+    assert worker.process_one() is True
+
+def test_failed_bulk_flush_goes_to_the_dlq(test_cfg, redis_client, mongo_dao, monkeypatch):
+    cfg = dataclasses.replace(test_cfg, DLQ_ENABLED=True, MONGO_BUFFER_DOCS=3, MONGO_BUFFER_MAX_AGE_MS=60000)
+    monkeypatch.setattr(worker_mod, "cfg", cfg)
+    monkeypatch.setattr(dead_letter_mod, "cfg", cfg)
+    w = Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY)
+    def down(records):
+        raise AutoReconnect("mongo down")
+    monkeypatch.setattr(w.dao, "insert_many", down)
+
+    for i in range(3):
+        push(redis_client, test_cfg.QUEUE_KEY, record(f"b{i}"))
+    assert w.process_batch(3) == [True] * 3  # accepted into the buffer; the size bound flushes (and fails)
+    delayed = _delayed(redis_client, w.dlq)
+    assert sorted(e["item"]["customerId"] for e, _ in delayed) == ["b0", "b1", "b2"]
+    assert {(e["reason"], e["item"][ATTEMPT_FIELD]) for e, _ in delayed} == {("AutoReconnect", 1)}
+    w.writer.close()  # the error was handed to the DLQ, not left to re-raise
+
+    del w.dao.insert_many  # Mongo is back
+    assert w.dlq.move_due(w.queue, now_ms=int(max(s for _, s in delayed))) == 3
+    assert w.process_batch(3) == [True] * 3
+    w.writer.close()
+    assert mongo_dao.col.count_documents({}) == 3
+
+def test_claims_are_leased(test_cfg, redis_client):
+    dlq = DeadLetterQueue(redis_client, test_cfg.QUEUE_KEY, lease_ms=5000)
+    dlq.retry_failed([record("c3")], "AutoReconnect", now_ms=0)
+
+    class Broken:
+        def push_many(self, items):
+            raise ConnectionError("push failed")
+    with pytest.raises(ConnectionError):
+        dlq.move_due(Broken(), now_ms=10000)
+    assert dlq.move_due(Broken(), now_ms=12000) == 0  # leased to the first mover
+    ok = []
+    class Sink:
+        def push_many(self, items):
+            ok.extend(items)
+    assert dlq.move_due(Sink(), now_ms=15000) == 1 and ok[0]["customerId"] == "c3"
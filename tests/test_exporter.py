@@ -0,0 +1,59 @@
+import time
+from datetime import datetime, timezone
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+from app.exporter import Exporter, load_checkpoint, to_timestamps
+from tests.conftest import record
+
+def _now():
+    time.sleep(0.002)  # Mongo stores ms: keep the window end past the last ingestedAt
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+def _files(root, ext="parquet"):
+    return sorted(p for p in root.rglob(f"*.{ext}"))
+
+def test_createdat_vectorized_and_fallback():
+    utc = pa.timestamp("us", tz="UTC")
+    arr = to_timestamps(["2024-03-26T12:00:00Z", "2024-03-26T12:00:00+02:00", "2024-03-26T12:00:00.5", None])
+    assert arr.type == utc
+    assert [v.isoformat() if v else None for v in arr.to_pylist()] == [
+        "2024-03-26T12:00:00+00:00", "2024-03-26T10:00:00+00:00", "2024-03-26T12:00:00.500000+00:00", None]
+    arr = to_timestamps(["2024-03-26", "not a date"])  # date-only does not cast: per-value fallback
+    assert arr.type == utc and arr.to_pylist()[0].isoformat() == "2024-03-26T00:00:00+00:00"
+    assert arr.to_pylist()[1] is None
+
+def test_incremental_export_and_resume(tmp_path, mongo_dao):
+    mongo_dao.insert_many([record(i) for i in range(5)] + [record(5, createdAt="2024-03-26T14:00:00+02:00")])
+    out = Exporter(mongo_dao, str(tmp_path), batch_size=4, lag_sec=0).run_once(now=_now())
+    assert (out["files"], out["rows"]) == (1, 6)
+    table = pq.read_table(_files(tmp_path)[0])
+    assert table.num_rows == 6 and table.schema.field("createdAt").type == pa.timestamp("us", tz="UTC")
+    created = {r["customerId"]: r["createdAt"] for r in table.to_pylist()}
+    assert created["5"] == created["0"]  # +02:00 converted to UTC
+
+    exporter = Exporter(mongo_dao, str(tmp_path), batch_size=4, lag_sec=0)  # resumes from the checkpoint
+    assert exporter.run_once(now=_now())["rows"] == 0
+    assert len(_files(tmp_path)) == 1
+
+    time.sleep(0.002)
+    mongo_dao.insert_many([record(i) for i in range(10, 13)])
+    out = exporter.run_once(now=_now())
+    assert (out["files"], out["rows"]) == (1, 3)
+    assert sum(pq.read_table(p).num_rows for p in _files(tmp_path)) == 9
+    assert load_checkpoint(str(tmp_path / "_checkpoint.json")).isoformat() == out["watermark"]
+
+def test_lag_holds_back_recent_and_arrow_format(tmp_path, mongo_dao):
+    mongo_dao.insert_many([record(i) for i in range(3)])
+    assert Exporter(mongo_dao, str(tmp_path), fmt="arrow", lag_sec=3600).run_once()["rows"] == 0
+
+    out = Exporter(mongo_dao, str(tmp_path), fmt="arrow", lag_sec=0).run_once(now=_now())
+    assert out["rows"] == 3
+    with ipc.open_file(_files(tmp_path, "arrow")[0]) as f:
+        assert f.read_all().num_rows == 3
+
+def test_unknown_format(mongo_dao, tmp_path):
+    with pytest.raises(ValueError):
+        Exporter(mongo_dao, str(tmp_path), fmt="csv")
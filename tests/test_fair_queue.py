@@ -0,0 +1,41 @@
+from collections import Counter
+from app.fair_queue import FairQueueClient, parse_weights
+from app.rate_limiter import RateLimiter
+from tests.conftest import record
+
+def test_noisy_customer_does_not_starve_others(test_cfg, redis_client):
+    q = FairQueueClient(redis_client, test_cfg.QUEUE_KEY, quantum=2)
+    q.push_many([record("noisy") for _ in range(200)])
+    q.push_many([record(c) for c in ("a", "b", "c") for _ in range(2)])
+
+    first = [item["customerId"] for _, item in q.pop_many(8, timeout=1)]
+    assert Counter(first) == {"noisy": 2, "a": 2, "b": 2, "c": 2}
+    assert q.depth() == 198
+    rest = q.pop_many(500, timeout=1)
+    assert len(rest) == 198 and q.depth() == 0
+    assert redis_client.scard(q.active_key) == 0
+
+def test_weights_shape_the_share(test_cfg, redis_client):
+    q = FairQueueClient(redis_client, test_cfg.QUEUE_KEY, weights=parse_weights("vip=3,bad=x"), quantum=1)
+    q.push_many([record(c) for _ in range(40) for c in ("vip", "std")])
+
+    got = Counter()
+    for _ in range(8):
+        got.update(item["customerId"] for _, item in q.pop_many(1, timeout=1))
+    assert got == {"vip": 6, "std": 2}
+
+def test_blocked_customers_rejected_before_validation(test_cfg, redis_client):
+    rl = RateLimiter(redis_client, limit=1, window_sec=60, local_cache_size=100, local_cache_ttl_ms=60000)
+    assert rl.allow("noisy") is True
+    assert rl.allow("noisy") is False  # now cached as blocked
+    rejected = []
+    q = FairQueueClient(redis_client, test_cfg.QUEUE_KEY, ratelimiter=rl,
+                        on_reject=lambda cid, items: rejected.extend(items))
+    q.push_many([record("noisy") for _ in range(150)] + [record("quiet")])
+
+    popped = q.pop_many(10, timeout=1)
+    while len(rejected) < 150:
+        popped += q.pop_many(10, timeout=1)
+    assert [item["customerId"] for _, item in popped] == ["quiet"]
+    assert {item["customerId"] for item in rejected} == {"noisy"}
+    assert q.depth() == 0
@@ -0,0 +1,59 @@
+import random
+import pytest
+from app.fast_validator import validate_record_fast
+from app.validator import validate_record
+from generator.generator import generate_record, maybe_invalid_email, maybe_invalid_created_at
+
+EMAIL_PIECES = ["a", "Z", "john", ".", "..", "-", "_", "+", "@", "@@", "xn--", "ab--", "é", "ü", "例", " ",
+                "example", "Example", "COM", "com", "test", "localhost", "1", "123", "c1", "!", "'", "\"", "x" * 70]
+DATE_SAMPLES = ["2024-03-26T12:00:00Z", "2024-03-26T12:00:00", "2024-03-26T12:00", "2024-03-26T12:00:00.123456Z",
+                "2024-03-26T12:00:00+05:30", "2024-03-26T12:00:00-00:00", "2024-03-26", "2024-0326",
+                "2024-02-30T00:00:00Z", "2024-03-26T24:00:00Z", "2024-03-26 12:00:00", "2024-03-26T12:00:00.1234567Z",
+                "2024-03-26T12:00:00+2400", "20240326T120000Z", "not-a-date", "", "2024-13-45T12:00:00Z",
+                "2024-03-26T12:00:00+03:69", "2024-03-26T12:00:00-25:00"]
+
+def _fuzz_email(rnd):
+    if rnd.random() < 0.3:
+        return maybe_invalid_email("")
+    parts = [rnd.choice(EMAIL_PIECES) for _ in range(rnd.randint(1, 4))]
+    parts.append("@")
+    parts += [rnd.choice(EMAIL_PIECES) for _ in range(rnd.randint(1, 3))]
+    if rnd.random() < 0.7:
+        parts += [".", rnd.choice(["com", "COM", "io", "c", "test", "local", "1", "a1", "org"])]
+    return "".join(parts)
+
+def _fuzz_date(rnd):
+    s = f"{rnd.randint(0, 9999):04d}-{rnd.randint(0, 19):02d}-{rnd.randint(0, 39):02d}T{rnd.randint(0, 29):02d}:{rnd.randint(0, 69):02d}"
+    if rnd.random() < 0.7:
+        s += f":{rnd.randint(0, 69):02d}"
+    if rnd.random() < 0.3:
+        s += "." + str(rnd.randint(0, 9999999))[:rnd.randint(1, 7)]
+    return s + rnd.choice(["", "Z", f"+{rnd.randint(0, 29):02d}:{rnd.randint(0, 69):02d}"])
+
+def _fuzz_record(rnd):
+    rec = generate_record(str(rnd.randint(1, 50)), invalid_rate=0.2)
+    roll = rnd.random()
+    if roll < 0.5:
+        rec["email"] = _fuzz_email(rnd)
+    elif roll < 0.6:
+        rec["createdAt"] = rnd.choice(DATE_SAMPLES + [maybe_invalid_created_at()])
+    elif roll < 0.7:
+        rec["createdAt"] = _fuzz_date(rnd)
+    elif roll < 0.8:
+        rec[rnd.choice(["customerId", "name", "email", "createdAt"])] = rnd.choice([None, 1, "", " ", b"x", ["a"]])
+    elif roll < 0.85:
+        del rec[rnd.choice(list(rec))]
+    return rec
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fast_validator_matches_full_validator(seed):
+    rnd = random.Random(seed)
+    random.seed(seed)  # generate_record uses the global RNG
+    accepted = 0
+    for _ in range(1000):
+        rec = _fuzz_record(rnd)
+        expected = validate_record(dict(rec))
+        assert validate_record_fast(dict(rec)) == expected, rec
+        accepted += expected[0]
+    # the corpus must exercise both outcomes
+    assert 0 < accepted < 1000
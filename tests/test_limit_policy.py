@@ -0,0 +1,70 @@
+import json, time
+import pytest
+from app.limit_policy import LimitPolicy, main as policy_cli, parse_limits
+from app.rate_limiter import RateLimiter
+
+KEY = "test:limits:policy"
+
+@pytest.fixture
+def policy(redis_client):
+    redis_client.delete(KEY)
+    yield LimitPolicy("redis", redis=redis_client, key=KEY)
+    redis_client.delete(KEY)
+
+def test_parse_limits():
+    assert parse_limits("1000/60") == (1000, 60000)
+    assert parse_limits(" 5 ") == (5, None)
+    with pytest.raises(ValueError):
+        parse_limits("ten/60")
+
+def test_redis_tiers_and_inline_overrides(redis_client, policy):
+    redis_client.hset(KEY, mapping={"version": 1, "tier:gold": "10/60", "tier:bad": "x",
+                                    "customer:g1": "gold", "customer:s1": "1/2", "customer:b1": "bad"})
+    assert policy.reload() is True
+    assert policy.snapshot() == {"g1": (10, 60000), "s1": (1, 2000)}
+    assert policy.reload() is False  # version unchanged: only the HGET probe
+
+@pytest.mark.parametrize("algorithm", ["zset", "counter"])
+def test_overrides_apply_in_batches(redis_client, policy, algorithm):
+    redis_client.hset(KEY, mapping={"version": 1, "tier:gold": "4/60", "customer:g1": "gold", "customer:s1": "1"})
+    policy.reload()
+    rl = RateLimiter(redis_client, limit=2, window_sec=60, algorithm=algorithm, policy=policy)
+    now = int(time.time() * 1000)
+    res = rl.allow_many([(c, now) for c in ("g1", "s1", "d1") for _ in range(5)])
+    assert res == [True] * 4 + [False] + [True] + [False] * 4 + [True] * 2 + [False] * 3
+
+def test_reload_clears_local_blocks(redis_client, policy):
+    redis_client.hset(KEY, mapping={"version": 1, "customer:c1": "1"})
+    policy.reload()
+    rl = RateLimiter(redis_client, limit=5, window_sec=60, policy=policy,
+                     local_cache_size=100, local_cache_ttl_ms=60000)
+    assert rl.allow("c1") is True
+    assert rl.allow("c1") is False and rl.is_blocked("c1")
+
+    policy_cli(["--key", KEY, "assign", "c1", "3"])
+    assert policy.reload() is True and policy.version == "2"
+    assert rl.allow("c1") is True  # not stuck on the cached block
+    assert not rl.is_blocked("c1")
+
+def test_file_source(tmp_path):
+    path = tmp_path / "limits.json"
+    path.write_text(json.dumps({"version": 7, "tiers": {"vip": "100/10"}, "customers": {"a": "vip"}}))
+    policy = LimitPolicy("file", path=str(path)).start()
+    try:
+        assert policy.version == "7" and policy.get("a") == (100, 10000)
+        assert policy.get("b") is None
+    finally:
+        policy.close()
+
+def test_missing_file_keeps_last_snapshot(tmp_path):
+    path = tmp_path / "limits.json"
+    path.write_text(json.dumps({"version": 1, "customers": {"a": "5/10"}}))
+    policy = LimitPolicy("file", path=str(path))
+    assert policy.reload() is True
+    path.rename(tmp_path / "limits.json.old")  # e.g. a deploy that replaces the file non-atomically
+    with pytest.raises(FileNotFoundError):
+        policy.reload()  # the refresher logs limit_policy_reload_failed
+    assert policy.get("a") == (5, 10000) and policy.version == "1"
+
+    path.write_text(json.dumps({"version": 2, "customers": {"a": "6/10"}}))
+    assert policy.reload() is True and policy.get("a") == (6, 10000)
@@ -0,0 +1,33 @@
+from collections import Counter
+import random
+from app.queue_client import QueueClient
+from generator.load import Schedule, parse_args, report, run_process, zipf_sampler
+
+def test_zipf_sampler_is_skewed_and_in_range():
+    sample = zipf_sampler(100000, 1.1, random.Random(1))
+    draws = Counter(sample() for _ in range(20000))
+    assert min(draws) >= 0 and max(draws) < 100000
+    assert draws.most_common(1)[0][0] == 0
+    assert draws[0] > 10 * draws.get(50, 0)
+
+def test_open_loop_hits_target_with_replays(test_cfg, redis_client):
+    args = parse_args(["--rate", "2000", "--duration", "0.5", "--customers", "50", "--distribution", "bursty",
+                       "--duplicate-ratio", "0.2", "--invalid-rate", "0", "--batch-size", "100"])
+    q = QueueClient(redis_client, test_cfg.QUEUE_KEY)
+    part = run_process(q, args)
+
+    assert part["sent"] == 1000 == q.depth()
+    assert 100 < part["duplicates"] < 300
+    out = report(args, [part])
+    assert out["sent"] == 1000 and out["achieved_pct"] > 80
+    assert out["top_customers"][0]["rate"] > out["per_customer_target_rate"]
+
+def test_load_steps_schedule(test_cfg, redis_client):
+    args = parse_args(["--steps", "2000:0.25,0:0.25,1000:0.5", "--customers", "10", "--invalid-rate", "0"])
+    assert args.duration == 1.0 and args.rate == 1000
+    sched = Schedule(args.steps)
+    assert sched.total == 1000 and sched.due(0.375) == 500 and sched.rate_at(0.375) == 0
+
+    part = run_process(QueueClient(redis_client, test_cfg.QUEUE_KEY), args)
+    assert part["sent"] == 1000 and part["step_sent"][1] < 50  # the pause step sends (almost) nothing
+    assert [s["target_rate"] for s in report(args, [part])["steps"]] == [2000, 0, 1000]
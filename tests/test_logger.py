@@ -0,0 +1,45 @@
+import json
+import pytest
+import structlog
+from app import logger
+
+@pytest.fixture
+def restore_logging():
+    yield
+    logger.configure(force=True)
+
+def _lines(out):
+    return [json.loads(line) for line in out.splitlines() if line.strip()]
+
+def test_parse_sample_ignores_bad_entries():
+    assert logger.parse_sample("ingested=10, rate_limited=x,=3,other=1") == {"ingested": 10}
+
+def test_sampling_keeps_one_in_n_and_all_errors(capsys, restore_logging):
+    logger.configure(mode="sync", sample="ingested=5,rate_limited=5", force=True)
+    log = structlog.get_logger()
+    for i in range(10):
+        log.info("ingested", n=i)
+        log.error("rate_limited", n=i)
+
+    lines = _lines(capsys.readouterr().out)
+    ingested = [l for l in lines if l["event"] == "ingested"]
+    assert [l["n"] for l in ingested] == [0, 5]
+    assert all(l["sample_rate"] == 5 for l in ingested)
+    assert len([l for l in lines if l["event"] == "rate_limited"]) == 10
+
+def test_async_mode_writes_everything_in_order(capsys, restore_logging):
+    logger.configure(mode="async", sample="", force=True)
+    log = structlog.get_logger()
+    for i in range(1000):
+        log.info("ingested", n=i)
+    logger.flush()
+
+    lines = _lines(capsys.readouterr().out)
+    assert [l["n"] for l in lines] == list(range(1000))
+
+def test_get_logger_configures_once(monkeypatch):
+    calls = []
+    monkeypatch.setattr(structlog, "configure", lambda **kw: calls.append(kw))
+    logger.get_logger()
+    logger.get_logger()
+    assert calls == []
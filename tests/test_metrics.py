@@ -0,0 +1,51 @@
+import json
+from app.config import Config
+from app.metrics import Registry, WorkerMetrics
+from app.worker import Worker
+
+def test_registry_renders_prometheus_text():
+    reg = Registry()
+    c = reg.counter("things_total", "Things", ["kind"])
+    c.labels("a").inc()
+    c.labels("a").inc(2)
+    reg.gauge("depth", "Depth", lambda: 7)
+    reg.counter("seen_total", "Seen", fn=lambda: 11)
+    h = reg.histogram("lat_seconds", "Latency", buckets=(0.1, 1.0))
+    h.observe(0.05)
+    h.observe(0.5)
+    h.observe(5)
+
+    text = reg.render()
+    assert 'things_total{kind="a"} 3' in text
+    assert "depth 7" in text
+    assert "# TYPE seen_total counter\nseen_total 11" in text
+    assert 'lat_seconds_bucket{le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{le="1.0"} 2' in text
+    assert 'lat_seconds_bucket{le="+Inf"} 3' in text
+    assert "lat_seconds_count 3" in text
+
+def test_worker_records_outcomes_and_stages(test_cfg, redis_client, mongo_dao):
+    q = Config().QUEUE_KEY
+    m = WorkerMetrics()
+    w = Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY, metrics=m)
+    w.ratelimiter.limit = 1
+    redis_client.rpush(q, json.dumps({
+        "customerId":"1","name":"John Doe","email":"john@example.com","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, json.dumps({
+        "customerId":"1","name":"John Doe","email":"john@example.com","createdAt":"2024-03-26T12:00:30Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, json.dumps({
+        "customerId":"2","name":"Jane","email":"invalid.email","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, b'{"bad_json": ')
+
+    w.run(max_messages=4)
+
+    text = m.registry.render()
+    for outcome in ("ingested", "rate_limited", "validation_failed", "parse_error"):
+        assert f'ingest_records_total{{outcome="{outcome}"}} 1' in text
+    assert 'ingest_stage_seconds_count{stage="insert"} 1' in text
+    assert 'ingest_stage_seconds_count{stage="pop"} 4' in text
+    assert "ingest_queue_depth 0" in text
+    assert "# TYPE ingest_processed_total counter\ningest_processed_total 4" in text
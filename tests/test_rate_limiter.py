@@ -1,4 +1,5 @@
 import time
+import pytest
 from redis import Redis
 from app.rate_limiter import RateLimiter
 
@@ -20,3 +21,56 @@ def test_rate_resets_after_window(redis_client):
     assert rl.allow(cid, t0+20) is False
     # move beyond window
     assert rl.allow(cid, t0+1100) is True
+
+def test_allow_many_same_millisecond(redis_client):
+    rl = RateLimiter(redis_client, limit=3, window_sec=60)
+    now = int(time.time()*1000)
+    res = rl.allow_many([("custC", now)] * 5 + [("custD", now), ("", now)])
+    # same-ms requests must each count against the window
+    assert res == [True, True, True, False, False, True, False]
+
+def test_allow_many_matches_sequential_allow(redis_client):
+    base = int(time.time()*1000)
+    reqs = [(f"mix{i % 4}", base + i * 40) for i in range(120)]
+    seq = RateLimiter(redis_client, limit=3, window_sec=1, prefix="rate:seq")
+    expected = [seq.allow(cid, ts) for cid, ts in reqs]
+    assert True in expected and False in expected
+
+    batch = RateLimiter(redis_client, limit=3, window_sec=1, prefix="rate:batch")
+    assert batch.allow_many(reqs) == expected
+
+    # cluster-safe path: one script call per hash slot, same decisions
+    slotted = RateLimiter(redis_client, limit=3, window_sec=1, prefix="rate:slot")
+    slotted.cluster = True
+    assert slotted.allow_many(reqs) == expected
+
+def test_counter_mode_limits_and_recovers(redis_client):
+    rl = RateLimiter(redis_client, limit=3, window_sec=1, algorithm="counter")
+    cid = "custE"
+    t0 = (int(time.time()*1000) // 1000) * 1000  # align to a window boundary
+    assert [rl.allow(cid, t0 + i) for i in range(4)] == [True, True, True, False]
+    # halfway through the next window the previous one still weighs 3 * 0.5
+    assert rl.allow_many([(cid, t0 + 1500)] * 3) == [True, True, False]
+    # two windows later nothing is left
+    assert rl.allow(cid, t0 + 3000) is True
+    assert redis_client.type(rl.key(cid)) == b"hash"
+
+def test_unknown_algorithm_rejected(redis_client):
+    with pytest.raises(ValueError):
+        RateLimiter(redis_client, limit=1, window_sec=1, algorithm="nope")
+
+def test_local_cache_rejects_blocked_customer_without_redis(redis_client):
+    rl = RateLimiter(redis_client, limit=2, window_sec=1, local_cache_size=10, local_cache_ttl_ms=60000)
+    cid = "custF"
+    t0 = int(time.time()*1000)
+    assert rl.allow(cid, t0) is True
+    assert rl.allow(cid, t0 + 10) is True
+    assert rl.allow(cid, t0 + 20) is False  # script reports retry_at = t0 + 1000
+    redis_client.delete(rl.key(cid))        # any Redis call would now allow
+    assert rl.allow(cid, t0 + 500) is False
+    assert rl.allow_many([(cid, t0 + 600), ("custG", t0 + 600)]) == [False, True]
+    assert rl.cache_stats()["hits"] == 2
+    # past the free-up time the script is consulted again: the stale entry is a miss, not a local rejection
+    misses = rl.cache_stats()["misses"]
+    assert rl.allow(cid, t0 + 1000) is True
+    assert rl.cache_stats() == {"hits": 2, "misses": misses + 1, "size": 0}
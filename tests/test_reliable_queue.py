@@ -0,0 +1,35 @@
+import json, time
+from app.reliable_queue import ReliableQueueClient
+from tests.conftest import record
+
+def test_unacked_entries_are_reclaimed(test_cfg, redis_client):
+    q = test_cfg.QUEUE_KEY
+    for i in range(3):
+        redis_client.rpush(q, json.dumps(record(i)).encode("utf-8"))
+
+    crashed = ReliableQueueClient(redis_client, q, visibility_timeout_sec=60, consumer_id="crashed")
+    popped = crashed.pop_many(10, timeout=1)
+    assert [item["customerId"] for _, item in popped] == ["0", "1", "2"]
+    crashed.ack([popped[0][0]])
+    crashed.close()
+    assert redis_client.llen(q) == 0
+    assert redis_client.llen(crashed.processing_key) == 2
+
+    # heartbeat expires -> another consumer puts the unacked entries back, in order
+    redis_client.delete(crashed.heartbeat_key)
+    other = ReliableQueueClient(redis_client, q, visibility_timeout_sec=60, consumer_id="other")
+    assert other.reclaim_stale() == 2
+    other.close()
+    assert [json.loads(r)["customerId"] for r in redis_client.lrange(q, 0, -1)] == ["1", "2"]
+    assert redis_client.llen(crashed.processing_key) == 0
+
+def test_own_stale_entries_requeued_after_visibility_timeout(test_cfg, redis_client):
+    q = test_cfg.QUEUE_KEY
+    redis_client.rpush(q, json.dumps(record(1)).encode("utf-8"))
+    rq = ReliableQueueClient(redis_client, q, visibility_timeout_sec=0.001, consumer_id="self")
+    assert rq.pop(timeout=1) is not None
+    time.sleep(0.01)
+    assert rq.reclaim_stale() == 1
+    rq.close()
+    assert redis_client.llen(q) == 1
+    assert redis_client.llen(rq.processing_key) == 0
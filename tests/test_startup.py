@@ -0,0 +1,45 @@
+import subprocess, sys, urllib.error, urllib.request
+import pytest
+from app.db import MongoDAO
+from app.metrics import Registry, start_http_server
+from app.worker import Worker
+from tests.conftest import push
+
+def test_import_has_no_side_effects():
+    code = ("import signal, sys, app.worker; "
+            "print(signal.getsignal(signal.SIGTERM) is signal.SIG_DFL, 'pydantic' in sys.modules)")
+    out = subprocess.check_output([sys.executable, "-c", code], text=True).split()
+    assert out == ["True", "False"]  # no signal handlers, pydantic not loaded
+
+def test_existing_index_is_not_recreated(test_cfg, mongo_dao, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("create_index called for an existing index")
+    monkeypatch.setattr(type(mongo_dao.col), "create_index", fail)
+    MongoDAO(test_cfg.MONGO_URI, test_cfg.MONGO_DB, test_cfg.MONGO_COLLECTION)
+
+def test_run_reports_ready_and_first_message(test_cfg, redis_client, tmp_path):
+    ready = tmp_path / "ready"
+    w = Worker(test_cfg.REDIS_URL, test_cfg.QUEUE_KEY, ready_file=str(ready))
+    assert not w.ready
+    assert set(w.startup()) == {"redis_ms", "mongo_ms", "validator_ms", "since_init_ms"}
+    assert w.ready and ready.exists()
+
+    push(redis_client, test_cfg.QUEUE_KEY, {"customerId": "1", "name": "John Doe", "email": "john@example.com",
+                                            "createdAt": "2024-03-26T12:00:00Z"})
+    w.run(max_messages=1)
+    assert w.first_message_ms is not None
+    assert not w.ready and not ready.exists()  # stopping workers report not ready
+
+def test_ready_endpoint():
+    state = {"ready": False}
+    server = start_http_server(Registry(), 0, "127.0.0.1", ready=lambda: state["ready"])
+    url = f"http://127.0.0.1:{server.server_address[1]}/ready"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as e:
+            urllib.request.urlopen(url)
+        assert e.value.code == 503
+        state["ready"] = True
+        assert urllib.request.urlopen(url).status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
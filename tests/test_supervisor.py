@@ -0,0 +1,94 @@
+import json, os, signal, subprocess, sys, threading
+from tests.conftest import push, record
+
+class Supervisor:
+    """`python -m app.supervisor` in a subprocess, with its JSON log events collected from stdout."""
+    def __init__(self, test_cfg, **env):
+        env = dict(os.environ, REDIS_URL=test_cfg.REDIS_URL, QUEUE_KEY=test_cfg.QUEUE_KEY,
+                   MONGO_URI=test_cfg.MONGO_URI, MONGO_DB=test_cfg.MONGO_DB,
+                   MONGO_COLLECTION=test_cfg.MONGO_COLLECTION, LOG_MODE="sync", LOG_SAMPLE="",
+                   SUPERVISOR_PROCESSES="2", SUPERVISOR_STATS_INTERVAL_SEC="1", WORKER_POLL_TIMEOUT_SEC="1",
+                   **{k: str(v) for k, v in env.items()})
+        self.proc = subprocess.Popen([sys.executable, "-m", "app.supervisor"], env=env, stdout=subprocess.PIPE,
+                                     text=True, start_new_session=True)
+        self.events = []
+        self._cond = threading.Condition()
+        self._reader = threading.Thread(target=self._read, daemon=True)
+        self._reader.start()
+
+    def _read(self):
+        for line in self.proc.stdout:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            with self._cond:
+                self.events.append(event)
+                self._cond.notify_all()
+
+    def named(self, name):
+        with self._cond:
+            return [e for e in self.events if e.get("event") == name]
+
+    def wait_for(self, name, n=1, timeout=20.0, **match):
+        def found():
+            return [e for e in self.named(name) if all(e.get(k) == v for k, v in match.items())]
+        with self._cond:
+            assert self._cond.wait_for(lambda: len(found()) >= n, timeout), \
+                f"no {n} x {name} {match}; events: {[e.get('event') for e in self.events]}"
+        return found()
+
+    def finish(self, timeout=30.0):
+        try:
+            assert self.proc.wait(timeout) == 0
+        except subprocess.TimeoutExpired:
+            raise AssertionError(f"still running; events: {[e.get('event') for e in self.events]}")
+        finally:
+            self.close()
+        self._reader.join(5)  # the last lines, up to EOF
+        return self.named("supervisor_stats")[-1]
+
+    def close(self):
+        try:
+            os.killpg(self.proc.pid, signal.SIGKILL)  # children too, if the supervisor is stuck
+        except ProcessLookupError:
+            pass
+        self.proc.wait()
+
+def _push(redis_client, test_cfg, ids):
+    for i in ids:
+        push(redis_client, test_cfg.QUEUE_KEY, record(f"s{i}"))
+
+def test_crashed_children_restart_and_counts_accumulate(test_cfg, redis_client):
+    sup = Supervisor(test_cfg, WORKER_MAX_MESSAGES=2)
+    try:
+        pids = [e["pid"] for e in sup.wait_for("child_started", 2)]
+        sup.wait_for("worker_ready", 2)
+        _push(redis_client, test_cfg, [0])
+        sup.wait_for("supervisor_stats", processed=1)  # reported to the parent before the kill
+        for pid in pids:
+            os.kill(pid, signal.SIGKILL)
+        sup.wait_for("child_crashed", 2)
+        sup.wait_for("child_started", 4)
+        sup.wait_for("worker_ready", 4)
+        _push(redis_client, test_cfg, range(1, 5))  # each new child exits after WORKER_MAX_MESSAGES=2
+        stats = sup.finish()
+    finally:
+        sup.close()
+    assert (stats["processed"], stats["restarts"]) == (5, 2)  # the slot that crashed after 1 kept it: 1+2 and 2
+    assert sorted(stats["per_child"]) == [2, 3]
+    assert {e["exitcode"] for e in sup.named("child_crashed")} == {-signal.SIGKILL}
+
+def test_sigterm_drains_children_and_exits(test_cfg, redis_client):
+    sup = Supervisor(test_cfg)
+    try:
+        sup.wait_for("worker_ready", 2)
+        _push(redis_client, test_cfg, range(3))
+        sup.wait_for("supervisor_stats", processed=3)
+        sup.proc.send_signal(signal.SIGTERM)
+        stats = sup.finish(timeout=15)
+    finally:
+        sup.close()
+    assert (stats["processed"], stats["restarts"], stats["alive"]) == (3, 0, 0)
+    assert [e["exitcode"] for e in sup.named("child_exited")] == [0, 0]
+    assert not sup.named("child_crashed") and sup.named("supervisor_exit")
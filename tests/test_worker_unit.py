@@ -30,3 +30,23 @@ def test_worker_processes_valid_and_rejects_invalid(worker, redis_client, mongo_
 
     # Check DB has 2 successful (cust 1 and first cust 3)
     assert mongo_dao.col.count_documents({}) == 2
+
+def test_worker_batch_matches_single_path(worker, redis_client, mongo_dao):
+    q = Config().QUEUE_KEY
+    redis_client.rpush(q, json.dumps({
+        "customerId":"1","name":"John Doe","email":"john@example.com","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, json.dumps({
+        "customerId":"2","name":"Jane","email":"invalid.email","createdAt":"2024-03-26T12:00:00Z"
+    }).encode("utf-8"))
+    redis_client.rpush(q, b'{"bad_json": ')
+    for ts in ("2024-03-26T12:00:00Z", "2024-03-26T12:00:30Z"):
+        redis_client.rpush(q, json.dumps({
+            "customerId":"3","name":"A","email":"a@example.com","createdAt":ts
+        }).encode("utf-8"))
+
+    worker.ratelimiter.limit = 1
+    results = worker.process_batch(10)
+
+    assert results == [True, False, False, True, False]
+    assert mongo_dao.col.count_documents({}) == 2